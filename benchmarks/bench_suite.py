@@ -0,0 +1,358 @@
+"""
+Suíte de benchmarks sobre versões ampliadas dos datasets de dados_teste.
+
+Para cada dataset base, gera versões com N linhas (amostragem com reposição,
+com ruído nas colunas decimais e identificadores renumerados) e, se pedido,
+versões largas (colunas repetidas), em CSV, Excel e XML. Cada medição roda
+em um processo novo, para que o pico de memória (RSS) de uma não contamine
+a outra. Os resultados são gravados em JSON, com o commit, para comparar
+execuções de commits diferentes.
+
+Uso:
+    python benchmarks/bench_suite.py --linhas 1e4 1e5 1e6
+    python benchmarks/bench_suite.py --linhas 1e5 --largura 1 10 --formatos csv --saida antes.json
+    python benchmarks/bench_suite.py --comparar antes.json depois.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import multiprocessing
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(RAIZ, "src"))
+
+DADOS_TESTE = os.path.join(RAIZ, "dados_teste")
+DIRETORIO_GERADOS = os.path.join(RAIZ, ".cache", "benchmarks")
+
+# Linhas geradas por vez (os arquivos grandes nunca ficam inteiros na memória)
+BLOCO_LINHAS = 1_000_000
+# Limite de linhas de uma planilha do Excel (menos o cabeçalho)
+EXCEL_MAX_LINHAS = 1_048_575
+
+ALVOS = {
+    "csv": ["process_csv", "process_adaptive", "load_dataframe"],
+    "excel": ["process_excel", "process_adaptive"],
+    "xml": ["process_xml", "process_adaptive"],
+}
+EXTENSOES = {"csv": ".csv", "excel": ".xlsx", "xml": ".xml"}
+
+
+def carregar_bases(nomes=None):
+    """Lê os CSVs de dados_teste (todos ou os indicados pelo nome sem extensão)."""
+    bases = {}
+    for arquivo in sorted(os.listdir(DADOS_TESTE)):
+        nome, extensao = os.path.splitext(arquivo)
+        if extensao == ".csv" and (not nomes or nome in nomes):
+            bases[nome] = pd.read_csv(os.path.join(DADOS_TESTE, arquivo))
+    return bases
+
+
+def ampliar(base, linhas, largura, semente=42):
+    """
+    Gera blocos de uma versão ampliada do dataset.
+
+    Args:
+        base (pandas.DataFrame): Dataset original
+        linhas (int): Linhas da versão ampliada
+        largura (int): Quantas vezes as colunas são repetidas (sufixos _2, _3, ...)
+        semente (int): Semente do gerador aleatório
+
+    Yields:
+        pandas.DataFrame: Blocos de até BLOCO_LINHAS linhas
+    """
+    rng = np.random.default_rng(semente)
+    # Colunas inteiras sem repetição (ex.: IDs) são renumeradas, para continuarem únicas
+    identificadores = [
+        col for col in base.columns
+        if pd.api.types.is_integer_dtype(base[col]) and base[col].is_unique and len(base) > 1
+    ]
+    decimais = [col for col in base.columns if pd.api.types.is_float_dtype(base[col])]
+
+    for inicio in range(0, linhas, BLOCO_LINHAS):
+        tamanho = min(BLOCO_LINHAS, linhas - inicio)
+        bloco = base.iloc[rng.integers(0, len(base), tamanho)].reset_index(drop=True)
+        for col in identificadores:
+            bloco[col] = np.arange(inicio, inicio + tamanho) + int(base[col].min())
+        for col in decimais:
+            bloco[col] = (bloco[col] * rng.normal(1.0, 0.01, tamanho)).round(4)
+        if largura > 1:
+            copias = [bloco] + [bloco.add_suffix(f"_{k}") for k in range(2, largura + 1)]
+            bloco = pd.concat(copias, axis=1)
+        yield bloco
+
+
+def _nome_tag(coluna):
+    """Nome de coluna como tag XML válida."""
+    tag = "".join(c if c.isalnum() or c in "_-." else "_" for c in str(coluna)) or "coluna"
+    return tag if tag[0].isalpha() or tag[0] == "_" else f"c_{tag}"
+
+
+def _escapar(valores):
+    return valores.str.replace("&", "&amp;").str.replace("<", "&lt;").str.replace(">", "&gt;")
+
+
+def escrever_csv(blocos, caminho):
+    with open(caminho, "w", encoding="utf-8", newline="") as f:
+        for i, bloco in enumerate(blocos):
+            bloco.to_csv(f, header=i == 0, index=False)
+
+
+def escrever_xml(blocos, caminho):
+    """Um elemento <registro> por linha, uma tag por coluna (valores nulos ficam de fora)."""
+    with open(caminho, "w", encoding="utf-8") as f:
+        f.write("<dados>\n")
+        for bloco in blocos:
+            linhas = pd.Series("<registro>", index=bloco.index)
+            for col in bloco.columns:
+                tag = _nome_tag(col)
+                valores = bloco[col]
+                texto = f"<{tag}>" + _escapar(valores.astype(str)) + f"</{tag}>"
+                linhas = linhas + texto.where(valores.notna(), "")
+            f.write("\n".join(linhas + "</registro>"))
+            f.write("\n")
+        f.write("</dados>\n")
+
+
+def escrever_excel(blocos, caminho):
+    """Planilha gravada em modo write-only do openpyxl (memória constante)."""
+    from openpyxl import Workbook
+
+    livro = Workbook(write_only=True)
+    planilha = livro.create_sheet("dados")
+    for i, bloco in enumerate(blocos):
+        if i == 0:
+            planilha.append([str(col) for col in bloco.columns])
+        valores = bloco.astype(object).where(bloco.notna(), None)
+        for linha in valores.itertuples(index=False, name=None):
+            planilha.append(linha)
+    livro.save(caminho)
+
+
+ESCRITORES = {"csv": escrever_csv, "excel": escrever_excel, "xml": escrever_xml}
+
+
+def gerar_arquivo(nome, base, linhas, largura, formato):
+    """
+    Gera (ou reaproveita, se já existir) a versão ampliada em um formato.
+
+    Returns:
+        str: Caminho do arquivo gerado
+    """
+    os.makedirs(DIRETORIO_GERADOS, exist_ok=True)
+    caminho = os.path.join(DIRETORIO_GERADOS, f"{nome}-{linhas}x{largura}{EXTENSOES[formato]}")
+    if not os.path.exists(caminho):
+        temporario = caminho + ".tmp" + EXTENSOES[formato]
+        ESCRITORES[formato](ampliar(base, linhas, largura), temporario)
+        os.replace(temporario, caminho)
+    return caminho
+
+
+def _executar_alvo(alvo, caminho):
+    """Chama a função medida; retorna (segundos, linhas lidas). Roda no processo de medição."""
+    from data_processors.adaptive_processor import process_adaptive
+
+    if alvo == "process_adaptive":
+        inicio = time.perf_counter()
+        df = process_adaptive(caminho)
+        return time.perf_counter() - inicio, len(df)
+
+    if alvo == "load_dataframe":
+        from data_processors.csv_processor import process_csv
+        from langchain_analyzer import DataFrameAnalyzer
+
+        # A leitura fica fora da medição: só o perfil e o contexto do LLM contam
+        with open(caminho, "rb") as f:
+            df = process_csv(f)
+        analisador = DataFrameAnalyzer(llm=None)
+        inicio = time.perf_counter()
+        analisador.load_dataframe(df)
+        return time.perf_counter() - inicio, len(df)
+
+    from data_processors.csv_processor import process_csv
+    from data_processors.excel_processor import process_excel
+    from data_processors.xml_processor import process_xml
+
+    funcao = {"process_csv": process_csv, "process_excel": process_excel, "process_xml": process_xml}[alvo]
+    with open(caminho, "rb") as f:
+        inicio = time.perf_counter()
+        df = funcao(f)
+        return time.perf_counter() - inicio, len(df)
+
+
+def _rss_mb():
+    """RSS atual do processo em MB (Linux); None em outros sistemas."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _processo_medicao(alvo, caminho, conexao):
+    """Processo de medição: importa o necessário, mede o alvo e devolve os números pelo pipe."""
+    import resource
+
+    # Nada de cache nem de processos auxiliares: só o custo do próprio alvo
+    os.environ["DATASET_STORE_ENABLED"] = "false"
+    os.environ["CODE_EXECUTION_MODE"] = "local"
+    try:
+        import langchain_analyzer  # noqa: F401  (importações fora da medição)
+        import data_processors.adaptive_processor  # noqa: F401
+        rss_base = _rss_mb()
+        segundos, linhas = _executar_alvo(alvo, caminho)
+        # ru_maxrss vem em KB no Linux
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+        conexao.send({"segundos": segundos, "linhas_lidas": linhas, "pico_rss_mb": pico, "rss_base_mb": rss_base})
+    except BaseException as e:
+        conexao.send({"erro": f"{type(e).__name__}: {e}"})
+
+
+def medir(alvo, caminho, tempo_maximo):
+    """
+    Mede um alvo em um processo novo (spawn), com tempo máximo.
+
+    Returns:
+        dict: segundos, linhas_lidas, pico_rss_mb e rss_base_mb, ou erro
+    """
+    contexto = multiprocessing.get_context("spawn")
+    receptor, emissor = contexto.Pipe(duplex=False)
+    processo = contexto.Process(target=_processo_medicao, args=(alvo, caminho, emissor))
+    processo.start()
+    emissor.close()
+    try:
+        if receptor.poll(tempo_maximo):
+            return receptor.recv()
+        return {"erro": f"Tempo máximo de {tempo_maximo} s excedido"}
+    except EOFError:
+        return {"erro": f"O processo de medição terminou com código {processo.exitcode}"}
+    finally:
+        if processo.is_alive():
+            processo.kill()
+        processo.join()
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _chave(resultado):
+    return (resultado["dataset"], resultado["linhas"], resultado["largura"], resultado["formato"], resultado["alvo"])
+
+
+def comparar(caminho_antes, caminho_depois, limite):
+    """
+    Compara dois arquivos de resultados e aponta regressões de tempo e de memória.
+
+    Returns:
+        int: 1 se alguma medição piorou mais que o limite, senão 0
+    """
+    with open(caminho_antes, encoding="utf-8") as f:
+        antes = json.load(f)
+    with open(caminho_depois, encoding="utf-8") as f:
+        depois = json.load(f)
+    print(f"antes:  {antes.get('commit')} ({antes.get('data')})")
+    print(f"depois: {depois.get('commit')} ({depois.get('data')})\n")
+
+    anteriores = {_chave(r): r for r in antes["resultados"]}
+    regressoes = 0
+    print(f"{'medição':<58}{'tempo (s)':>20}{'razão':>8}{'pico RSS (MB)':>22}{'razão':>8}")
+    for resultado in depois["resultados"]:
+        anterior = anteriores.get(_chave(resultado))
+        if anterior is None or "erro" in anterior or "erro" in resultado:
+            continue
+        razao_tempo = resultado["segundos"] / max(anterior["segundos"], 1e-9)
+        razao_rss = resultado["pico_rss_mb"] / max(anterior["pico_rss_mb"], 1e-9)
+        piorou = razao_tempo > limite or razao_rss > limite
+        regressoes += piorou
+        nome = "/".join(str(parte) for parte in _chave(resultado))
+        print(
+            f"{nome:<58}{anterior['segundos']:>9.2f} -> {resultado['segundos']:<8.2f}{razao_tempo:>8.2f}"
+            f"{anterior['pico_rss_mb']:>10.0f} -> {resultado['pico_rss_mb']:<8.0f}{razao_rss:>8.2f}"
+            f"{'  <- regressão' if piorou else ''}"
+        )
+    print(f"\n{regressoes} regressões acima de {limite:.2f}x")
+    return 1 if regressoes else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de leitura e perfil sobre os dados_teste ampliados")
+    parser.add_argument("--linhas", nargs="+", default=["1e4", "1e5", "1e6"],
+                        help="Tamanhos gerados (até 1e8; aceita notação científica)")
+    parser.add_argument("--largura", nargs="+", type=int, default=[1],
+                        help="Repetições das colunas (ex.: 1 10 para incluir versões largas)")
+    parser.add_argument("--formatos", nargs="+", default=list(ALVOS), choices=list(ALVOS))
+    parser.add_argument("--datasets", nargs="+", help="Datasets de dados_teste (nome sem extensão); padrão: todos")
+    parser.add_argument("--alvos", nargs="+", help="Funções medidas; padrão: todas as do formato")
+    parser.add_argument("--excel-max-linhas", type=float, default=1e5,
+                        help="Maior tamanho gerado em Excel (gravar planilhas grandes é lento)")
+    parser.add_argument("--tempo-maximo", type=float, default=1800, help="Segundos por medição")
+    parser.add_argument("--saida", help="Arquivo JSON dos resultados (padrão: .cache/benchmarks/resultados-<commit>.json)")
+    parser.add_argument("--comparar", nargs=2, metavar=("ANTES", "DEPOIS"), help="Compara dois arquivos de resultados")
+    parser.add_argument("--limite", type=float, default=1.10, help="Razão a partir da qual a comparação aponta regressão")
+    args = parser.parse_args()
+
+    if args.comparar:
+        sys.exit(comparar(*args.comparar, args.limite))
+
+    commit = _commit_atual()
+    saida = args.saida or os.path.join(DIRETORIO_GERADOS, f"resultados-{(commit or 'sem-commit')[:12]}.json")
+    relatorio = {
+        "commit": commit,
+        "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "resultados": [],
+    }
+
+    bases = carregar_bases(args.datasets)
+    tamanhos = [int(float(valor)) for valor in args.linhas]
+    print(f"{'medição':<58}{'tempo (s)':>10}{'pico RSS (MB)':>15}{'linhas':>12}")
+    for nome, base in bases.items():
+        for linhas in tamanhos:
+            for largura in args.largura:
+                for formato in args.formatos:
+                    if formato == "excel" and linhas > min(args.excel_max_linhas, EXCEL_MAX_LINHAS):
+                        continue
+                    caminho = gerar_arquivo(nome, base, linhas, largura, formato)
+                    for alvo in ALVOS[formato]:
+                        if args.alvos and alvo not in args.alvos:
+                            continue
+                        resultado = {
+                            "dataset": nome, "linhas": linhas, "largura": largura, "formato": formato,
+                            "alvo": alvo, "bytes_arquivo": os.path.getsize(caminho),
+                        }
+                        resultado.update(medir(alvo, caminho, args.tempo_maximo))
+                        relatorio["resultados"].append(resultado)
+
+                        rotulo = "/".join(str(parte) for parte in _chave(resultado))
+                        if "erro" in resultado:
+                            print(f"{rotulo:<58}  erro: {resultado['erro']}")
+                        else:
+                            print(f"{rotulo:<58}{resultado['segundos']:>10.2f}"
+                                  f"{resultado['pico_rss_mb']:>15.0f}{resultado['linhas_lidas']:>12}")
+
+                        # Grava a cada medição: uma execução longa interrompida não perde o que já foi medido
+                        os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+                        with open(saida, "w", encoding="utf-8") as f:
+                            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+
+    print(f"\nResultados gravados em {saida}")
+
+
+if __name__ == "__main__":
+    main()
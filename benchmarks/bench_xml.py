@@ -0,0 +1,141 @@
+"""
+Benchmark da leitura de XML: implementação original (ElementTree com um
+dicionário por registro), streaming com dicionários por linha e streaming
+com o ColumnarBuilder usado por process_xml. Mede também um XML de
+esquema largo (muitas tags e poucos registros), em que o custo por coluna
+domina.
+
+Uso:
+    python benchmarks/bench_xml.py --registros 200000
+    python benchmarks/bench_xml.py --sem-legado --tags-largo 2000 --registros-largo 10
+"""
+
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+import xml.etree.ElementTree as ET
+from io import BytesIO
+
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from data_processors.xml_processor import iter_xml_records, process_xml
+
+
+def gerar_xml(registros, colunas_opcionais=3):
+    """Gera um XML de exportação com registros de 8 campos (alguns opcionais)."""
+    partes = ["<exportacao><registros>"]
+    for i in range(registros):
+        opcionais = "".join(
+            f"<extra{j}>valor {i % 97}</extra{j}>" for j in range(colunas_opcionais) if (i + j) % 4 == 0
+        )
+        partes.append(
+            f"<registro id='{i}'><nome>Cliente {i}</nome><cidade>Cidade {i % 50}</cidade>"
+            f"<valor>{i * 1.5:.2f}</valor><data>2024-01-{i % 28 + 1:02d}</data>{opcionais}</registro>"
+        )
+    partes.append("</registros></exportacao>")
+    return "".join(partes).encode("utf-8")
+
+
+def gerar_xml_largo(registros, tags):
+    """Gera um XML com muitas tags por registro (esquema largo), cada registro com metade delas."""
+    partes = ["<exportacao>"]
+    for i in range(registros):
+        campos = "".join(f"<campo{j}>{i}-{j}</campo{j}>" for j in range(tags) if (i + j) % 2 == 0)
+        partes.append(f"<registro>{campos}</registro>")
+    partes.append("</exportacao>")
+    return "".join(partes).encode("utf-8")
+
+
+def processar_legado(file):
+    """Implementação original de process_xml (ElementTree, findall('.//*') e lista de dicionários)."""
+    root = ET.parse(BytesIO(file.read())).getroot()
+    records = root.findall('.//*') or list(root)
+    data = []
+    for record in records:
+        row = {}
+        if record.text and record.text.strip():
+            row[record.tag] = record.text.strip()
+        for child in record:
+            row[child.tag] = child.text.strip() if child.text else ''
+        for attr, value in record.attrib.items():
+            row[f"{record.tag}_{attr}"] = value
+        if row:
+            data.append(row)
+    df = pd.DataFrame(data)
+    df.columns = df.columns.astype(str).str.strip()
+    return df.replace('', pd.NA).dropna(how='all')
+
+
+def processar_dicionarios(file):
+    """Streaming com iterparse, mas um dicionário por linha e pd.DataFrame(lista)."""
+    return pd.DataFrame(list(iter_xml_records(file)))
+
+
+def processar_colunar(file):
+    """Streaming com iterparse direto para os buffers por coluna (process_xml)."""
+    return process_xml(file)
+
+
+def medir(funcao, conteudo):
+    """
+    Executa a função duas vezes: uma para o tempo e outra, com tracemalloc
+    (que deixa o Python mais lento), para a memória.
+
+    Returns:
+        tuple: (segundos, pico de memória Python em MB, memória Arrow em MB, linhas)
+    """
+    inicio = time.perf_counter()
+    df = funcao(BytesIO(conteudo))
+    segundos = time.perf_counter() - inicio
+    linhas = len(df)
+    del df
+
+    arrow_antes = pa.total_allocated_bytes()
+    tracemalloc.start()
+    df = funcao(BytesIO(conteudo))
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    arrow = pa.total_allocated_bytes() - arrow_antes
+    return segundos, pico / 1e6, arrow / 1e6, linhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da leitura de XML")
+    parser.add_argument("--registros", type=int, default=200_000)
+    parser.add_argument("--sem-legado", action="store_true", help="Não executa a implementação original (lenta)")
+    parser.add_argument("--tags-largo", type=int, default=800, help="Tags por registro no XML de esquema largo")
+    parser.add_argument("--registros-largo", type=int, default=5, help="Registros no XML de esquema largo")
+    args = parser.parse_args()
+
+    conteudo = gerar_xml(args.registros)
+    print(f"XML gerado: {args.registros} registros, {len(conteudo) / 1e6:.1f} MB\n")
+
+    implementacoes = [
+        ("legado (ElementTree + dicionários)", processar_legado),
+        ("streaming + dicionários", processar_dicionarios),
+        ("streaming + colunar", processar_colunar),
+    ]
+    if args.sem_legado:
+        implementacoes = implementacoes[1:]
+
+    print(f"{'implementação':<36}{'tempo (s)':>10}{'pico Python (MB)':>18}{'Arrow (MB)':>12}{'linhas':>10}")
+    for nome, funcao in implementacoes:
+        segundos, pico, arrow, linhas = medir(funcao, conteudo)
+        print(f"{nome:<36}{segundos:>10.2f}{pico:>18.1f}{arrow:>12.1f}{linhas:>10}")
+
+    largo = gerar_xml_largo(args.registros_largo, args.tags_largo)
+    print(f"\nXML de esquema largo: {args.tags_largo} tags, {args.registros_largo} registros, "
+          f"{len(largo) / 1e6:.2f} MB\n")
+    print(f"{'implementação':<36}{'tempo (s)':>10}{'pico Python (MB)':>18}{'Arrow (MB)':>12}{'linhas':>10}")
+    for nome, funcao in implementacoes:
+        segundos, pico, arrow, linhas = medir(funcao, largo)
+        print(f"{nome:<36}{segundos:>10.2f}{pico:>18.1f}{arrow:>12.1f}{linhas:>10}")
+
+
+if __name__ == "__main__":
+    main()
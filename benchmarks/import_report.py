@@ -0,0 +1,207 @@
+"""
+Relatório do tempo de importação dos módulos da aplicação.
+
+Cada medição roda em um interpretador novo com `python -X importtime`, para
+que módulos já carregados por uma não barateiem a outra. Sem argumentos,
+mede as importações de topo do src/main.py (o que toda execução fria do
+Streamlit paga antes de desenhar a página) e lista os pacotes mais pesados;
+com --modulos, mede os módulos indicados. --provedor mede também a primeira
+criação do cliente do provedor de IA e o reaproveitamento nas execuções
+seguintes.
+
+Uso:
+    python benchmarks/import_report.py
+    python benchmarks/import_report.py --modulos langchain_analyzer ai_providers --top 15
+    python benchmarks/import_report.py --provedor --saida importacoes.json
+"""
+
+import os
+import re
+import ast
+import sys
+import json
+import argparse
+import platform
+import subprocess
+from collections import defaultdict
+from datetime import datetime, timezone
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SRC = os.path.join(RAIZ, "src")
+sys.path.insert(0, SRC)
+
+# Linhas do -X importtime: "import time:      self [us] |  cumulative | imported package"
+LINHA_IMPORTTIME = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+# Mede a criação do cliente do provedor (primeira chamada) e o reaproveitamento (segunda)
+CODIGO_PROVEDOR = """
+import json, time
+inicio = time.perf_counter()
+from ai_providers import get_ai_provider
+importacao = time.perf_counter()
+get_ai_provider("{provedor}")
+criacao = time.perf_counter()
+get_ai_provider("{provedor}")
+reuso = time.perf_counter()
+print(json.dumps({{
+    "importacao_ms": (importacao - inicio) * 1000,
+    "primeira_criacao_ms": (criacao - importacao) * 1000,
+    "reaproveitamento_ms": (reuso - criacao) * 1000,
+}}))
+"""
+
+
+def importacoes_da_app(caminho=os.path.join(SRC, "main.py")):
+    """
+    Módulos importados no topo do main.py (importações dentro de funções ou
+    de condicionais ficam de fora: só custam quando usadas).
+
+    Returns:
+        list: Nomes dos módulos, na ordem do arquivo
+    """
+    with open(caminho, encoding="utf-8") as f:
+        arvore = ast.parse(f.read())
+    modulos = []
+    for no in arvore.body:
+        if isinstance(no, ast.Import):
+            nomes = [alias.name for alias in no.names]
+        elif isinstance(no, ast.ImportFrom) and no.module and not no.level:
+            nomes = [no.module]
+        else:
+            continue
+        modulos += [nome for nome in nomes if nome not in modulos]
+    return modulos
+
+
+def _ambiente():
+    ambiente = dict(os.environ)
+    ambiente["PYTHONPATH"] = os.pathsep.join(filter(None, [SRC, ambiente.get("PYTHONPATH")]))
+    return ambiente
+
+
+def medir_importacao(modulo):
+    """
+    Importa um módulo em um interpretador novo com -X importtime.
+
+    Returns:
+        dict: 'cumulativo_ms' do módulo, 'total_ms' (soma dos tempos próprios de
+            tudo o que foi importado, inclusive a inicialização do Python) e
+            'pacotes' ({pacote de topo: ms próprios}); ou 'erro'
+    """
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=SRC, env=_ambiente(), capture_output=True, text=True,
+    )
+    pacotes = defaultdict(float)
+    cumulativo = None
+    total = 0.0
+    for linha in processo.stderr.splitlines():
+        casamento = LINHA_IMPORTTIME.match(linha)
+        if not casamento:
+            continue
+        proprio, acumulado, _, nome = casamento.groups()
+        total += int(proprio) / 1000
+        pacotes[nome.split(".")[0]] += int(proprio) / 1000
+        if nome == modulo:
+            cumulativo = int(acumulado) / 1000
+    if processo.returncode != 0:
+        return {"erro": processo.stderr.strip().splitlines()[-1] if processo.stderr.strip() else "falhou"}
+    return {"cumulativo_ms": cumulativo or 0.0, "total_ms": total, "pacotes": dict(pacotes)}
+
+
+def medir_provedor(provedor):
+    """
+    Tempo de importar ai_providers, de criar o cliente e de reaproveitá-lo.
+    Sem chave configurada, usa uma chave fictícia (a criação não acessa a rede).
+
+    Returns:
+        dict: Tempos em ms, ou 'erro'
+    """
+    ambiente = _ambiente()
+    ambiente.setdefault("OPENAI_API_KEY", "chave-ficticia")
+    ambiente.setdefault("DEEPSEEK_API_KEY", "chave-ficticia")
+    ambiente["AI_PROVIDER_PRELOAD"] = "false"
+    processo = subprocess.run(
+        [sys.executable, "-c", CODIGO_PROVEDOR.format(provedor=provedor)],
+        cwd=SRC, env=ambiente, capture_output=True, text=True,
+    )
+    if processo.returncode != 0:
+        return {"erro": processo.stderr.strip().splitlines()[-1] if processo.stderr.strip() else "falhou"}
+    return json.loads(processo.stdout.strip().splitlines()[-1])
+
+
+def _melhor(medicoes, chave):
+    validas = [medicao for medicao in medicoes if "erro" not in medicao]
+    return min(validas, key=lambda medicao: medicao[chave]) if validas else medicoes[0]
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de importação dos módulos da aplicação")
+    parser.add_argument("--modulos", nargs="+", help="Módulos medidos; padrão: importações de topo do main.py")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Medições por módulo (vale a mais rápida)")
+    parser.add_argument("--top", type=int, default=10, help="Pacotes mais pesados listados")
+    parser.add_argument("--provedor", action="store_true", help="Mede também a criação do cliente do provedor de IA")
+    parser.add_argument("--saida", help="Arquivo JSON dos resultados")
+    args = parser.parse_args()
+
+    modulos = args.modulos or importacoes_da_app()
+    relatorio = {
+        "commit": _commit_atual(),
+        "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "modulos": {},
+    }
+
+    print(f"{'módulo':<40}{'cumulativo (ms)':>18}")
+    for modulo in modulos:
+        resultado = _melhor([medir_importacao(modulo) for _ in range(args.repeticoes)], "total_ms")
+        relatorio["modulos"][modulo] = resultado
+        if "erro" in resultado:
+            print(f"{modulo:<40}  erro: {resultado['erro']}")
+        else:
+            print(f"{modulo:<40}{resultado['cumulativo_ms']:>18.0f}")
+
+    # Todos os módulos juntos: o custo real de uma execução fria (dependências compartilhadas contam uma vez)
+    juntos = ", ".join(modulos)
+    conjunto = _melhor([medir_importacao(juntos) for _ in range(args.repeticoes)], "total_ms")
+    relatorio["conjunto"] = conjunto
+    if "erro" in conjunto:
+        print(f"\nconjunto: erro: {conjunto['erro']}")
+    else:
+        print(f"\n{'conjunto (inclui a inicialização do Python)':<40}{conjunto['total_ms']:>18.0f}")
+        print(f"\n{'pacote':<40}{'próprio (ms)':>18}")
+        pesados = sorted(conjunto["pacotes"].items(), key=lambda item: item[1], reverse=True)
+        for pacote, ms in pesados[:args.top]:
+            print(f"{pacote:<40}{ms:>18.0f}")
+
+    if args.provedor:
+        relatorio["provedores"] = {}
+        print(f"\n{'provedor':<12}{'importação (ms)':>18}{'criação (ms)':>16}{'reuso (ms)':>14}")
+        for provedor in ("api", "local"):
+            resultado = _melhor([medir_provedor(provedor) for _ in range(args.repeticoes)], "primeira_criacao_ms")
+            relatorio["provedores"][provedor] = resultado
+            if "erro" in resultado:
+                print(f"{provedor:<12}  erro: {resultado['erro']}")
+            else:
+                print(f"{provedor:<12}{resultado['importacao_ms']:>18.0f}{resultado['primeira_criacao_ms']:>16.0f}"
+                      f"{resultado['reaproveitamento_ms']:>14.3f}")
+
+    if args.saida:
+        os.makedirs(os.path.dirname(os.path.abspath(args.saida)), exist_ok=True)
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados gravados em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
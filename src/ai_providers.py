@@ -1,6 +1,10 @@
 import os
+import time
+import threading
 from typing import Dict, Any
 
+from config import get_ai_client_config
+
 # Mapeamento de modelos para alternativas compatíveis com PandasAI
 MODEL_MAPPING = {
     "gpt-4": "gpt-3.5-turbo",
@@ -32,6 +36,7 @@ def get_ai_config(provider_type: str) -> Dict[str, Any]:
                 "api_key": os.getenv("DEEPSEEK_API_KEY", ""),
                 "model": os.getenv("DEEPSEEK_MODEL", "deepseek-chat"),
                 "temperature": float(os.getenv("DEEPSEEK_TEMPERATURE", "0.7")),
+                "base_url": os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com"),
             }
         else:
             raise ValueError(f"Tipo de API não suportado: {api_type}")
@@ -40,61 +45,209 @@ def get_ai_config(provider_type: str) -> Dict[str, Any]:
         return {
             "model": os.getenv("OLLAMA_MODEL", "mistral"),
             "host": os.getenv("OLLAMA_HOST", "http://localhost:11434"),
+            # Mantém o modelo carregado entre perguntas: o KV cache do prefixo comum é reaproveitado
+            "keep_alive": os.getenv("OLLAMA_KEEP_ALIVE", "30m"),
         }
     
     else:
         raise ValueError(f"Tipo de provedor não suportado: {provider_type}")
 
+# Clientes de IA do processo, um por configuração (sobrevivem aos reruns do Streamlit)
+_providers = {}
+_providers_lock = threading.Lock()
+_preloaded = set()  # Tipos de provedor já pré-carregados (uma tentativa por processo)
+_http_client = None
+
+
+def _shared_http_client():
+    """
+    Cliente HTTP síncrono compartilhado pelos clientes compatíveis com a API
+    da OpenAI, com um pool de conexões keep-alive (sem novo handshake TLS a
+    cada pergunta).
+    """
+    global _http_client
+    if _http_client is None:
+        # Importa aqui para evitar carregar dependências desnecessárias
+        import httpx
+        
+        config = get_ai_client_config()
+        _http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=config["max_connections"],
+                max_keepalive_connections=config["max_keepalive_connections"],
+                # O padrão do httpx (5 s) fecha a conexão entre uma pergunta e a seguinte
+                keepalive_expiry=config["keepalive_seconds"],
+            ),
+            timeout=httpx.Timeout(config["timeout"], connect=10.0),
+        )
+    return _http_client
+
+
+def _create_ai_provider(provider_type, api_type, config):
+    """Cria o cliente LangChain de uma configuração (chamado uma vez por configuração)."""
+    # Importa aqui: o LangChain só é carregado quando o primeiro cliente é criado
+    from token_usage import TokenUsageHandler
+    
+    if provider_type == "api":
+        # Importa aqui para evitar carregar dependências desnecessárias
+        from langchain_openai import ChatOpenAI
+        
+        if api_type not in ("openai", "deepseek"):
+            raise ValueError(f"Tipo de API não suportado: {api_type}")
+        
+        # O DeepSeek expõe uma API compatível com a da OpenAI; os dois compartilham o pool de conexões.
+        # stream_usage: as respostas em streaming também informam os tokens
+        return ChatOpenAI(
+            api_key=config["api_key"],
+            model=config["model"],
+            temperature=config["temperature"],
+            base_url=config.get("base_url"),
+            stream_usage=True,
+            http_client=_shared_http_client(),
+            callbacks=[TokenUsageHandler(config["model"])]
+        )
+    
+    elif provider_type == "local":
+        # Importa aqui para evitar carregar dependências desnecessárias
+        from langchain_ollama import OllamaLLM
+        
+        client_config = get_ai_client_config()
+        # Cria e retorna o cliente Ollama (cliente HTTP próprio, também com keep-alive)
+        return OllamaLLM(
+            model=config["model"],
+            base_url=config["host"],
+            keep_alive=config["keep_alive"],
+            client_kwargs={"timeout": client_config["timeout"]},
+            callbacks=[TokenUsageHandler(config["model"])]
+        )
+    
+    else:
+        raise ValueError(f"Tipo de provedor não suportado: {provider_type}")
+
+
+def _provider_entry(provider_type):
+    """
+    Entrada do registro de clientes para a configuração atual, criando o
+    cliente na primeira vez.
+    
+    Args:
+        provider_type (str): Tipo de provedor de IA ('api' ou 'local')
+        
+    Returns:
+        dict: Cliente, provedor, modelo, tempo de criação e usos
+    """
+    config = get_ai_config(provider_type)
+    api_type = os.getenv("API_TYPE", "openai").lower() if provider_type == "api" else None
+    key = (provider_type, api_type, tuple(sorted(config.items())))
+    
+    with _providers_lock:
+        entry = _providers.get(key)
+        if entry is None:
+            start = time.perf_counter()
+            client = _create_ai_provider(provider_type, api_type, config)
+            entry = _providers[key] = {
+                "cliente": client,
+                "provedor": api_type or "ollama",
+                "modelo": config["model"],
+                "criacao_ms": (time.perf_counter() - start) * 1000,
+                "usos": 0,
+            }
+        return entry
+
+
 def get_ai_provider(provider_type="api"):
     """
     Obtém o provedor de IA apropriado com base na configuração.
     
+    O cliente é criado uma única vez por configuração (tipo, API, modelo,
+    chave, temperatura) e reaproveitado nos reruns e entre as sessões; mudar
+    a configuração cria um novo cliente.
+    
     Args:
         provider_type (str): Tipo de provedor de IA ('api' ou 'local')
         
     Returns:
         object: Instância configurada do provedor de IA
     """
-    # Obtém a configuração para o tipo de provedor especificado
+    entry = _provider_entry(provider_type)
+    with _providers_lock:
+        entry["usos"] += 1
+    return entry["cliente"]
+
+
+def preload_ai_provider(provider_type="api"):
+    """
+    Cria o cliente em segundo plano (importando o LangChain e o SDK do
+    provedor) enquanto a página é exibida, para que a primeira pergunta não
+    pague esse custo. Não faz nada se o cliente já existe ou se a
+    configuração AI_PROVIDER_PRELOAD estiver desativada.
+    
+    Args:
+        provider_type (str): Tipo de provedor de IA ('api' ou 'local')
+    """
+    with _providers_lock:
+        if (not get_ai_client_config()["preload"] or provider_type in _preloaded
+                or any(key[0] == provider_type for key in _providers)):
+            return
+        _preloaded.add(provider_type)
+    
+    def preload():
+        try:
+            _provider_entry(provider_type)
+        except Exception as e:
+            # O erro aparece de novo (para o usuário) na primeira pergunta
+            print(f"Não foi possível pré-carregar o provedor de IA: {e}")
+    
+    threading.Thread(target=preload, name="ai-provider-preload", daemon=True).start()
+
+
+def get_provider_stats():
+    """
+    Estatísticas dos clientes de IA criados pelo processo.
+    
+    Returns:
+        list: Um dicionário por cliente (provedor, modelo, tempo de criação e usos)
+    """
+    with _providers_lock:
+        return [
+            {name: value for name, value in entry.items() if name != "cliente"}
+            for entry in _providers.values()
+        ]
+
+def get_embeddings_provider(provider_type="api"):
+    """
+    Obtém o modelo de embeddings correspondente ao provedor de IA.
+    
+    Args:
+        provider_type (str): Tipo de provedor de IA ('api' ou 'local')
+        
+    Returns:
+        object: Instância configurada do modelo de embeddings
+    """
     config = get_ai_config(provider_type)
     
     if provider_type == "api":
-        # Determina qual API usar (OpenAI ou DeepSeek)
         api_type = os.getenv("API_TYPE", "openai").lower()
         
         if api_type == "openai":
             # Importa aqui para evitar carregar dependências desnecessárias
-            from langchain_openai import ChatOpenAI
+            from langchain_openai import OpenAIEmbeddings
             
-            # Cria e retorna o cliente OpenAI para LangChain
-            return ChatOpenAI(
+            return OpenAIEmbeddings(
                 api_key=config["api_key"],
-                model=config["model"],
-                temperature=config["temperature"]
-            )
-            
-        elif api_type == "deepseek":
-            # Importa aqui para evitar carregar dependências desnecessárias
-            from langchain_community.llms import DeepSeek
-            
-            # Cria e retorna o cliente DeepSeek
-            return DeepSeek(
-                api_key=config["api_key"],
-                model_name=config["model"],
-                temperature=config["temperature"]
+                model=os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
             )
         else:
-            raise ValueError(f"Tipo de API não suportado: {api_type}")
+            raise ValueError(f"Embeddings não suportados para a API: {api_type}")
     
     elif provider_type == "local":
         # Importa aqui para evitar carregar dependências desnecessárias
-        from langchain_community.llms import Ollama
+        from langchain_community.embeddings import OllamaEmbeddings
         
-        # Cria e retorna o cliente Ollama
-        return Ollama(
+        return OllamaEmbeddings(
             model=config["model"],
             base_url=config["host"]
         )
     
     else:
-        raise ValueError(f"Tipo de provedor não suportado: {provider_type}")
\ No newline at end of file
+        raise ValueError(f"Tipo de provedor não suportado: {provider_type}")
@@ -0,0 +1,160 @@
+"""
+Registro de analisadores por dataset, para reaproveitar o perfil dos dados
+entre perguntas e reruns do Streamlit.
+"""
+
+import hashlib
+from collections import OrderedDict
+
+import pandas as pd
+
+# Quantidade de datasets mantidos por sessão
+MAX_DATASETS = 4
+
+
+# Linhas usadas na verificação de identidade do frame marcado
+IDENTITY_SAMPLE_ROWS = 32
+
+
+def _identity(df):
+    """
+    Identidade barata de um DataFrame: id do objeto e hash de algumas linhas
+    espaçadas (o id sozinho pode ser reaproveitado por outro frame).
+    """
+    step = max(1, len(df) // IDENTITY_SAMPLE_ROWS)
+    try:
+        sample = pd.util.hash_pandas_object(df.iloc[::step], index=False).to_numpy().tobytes()
+    except TypeError:
+        sample = b""
+    return f"{id(df)}|{hashlib.blake2b(sample, digest_size=8).hexdigest()}"
+
+
+def tag_fingerprint(df, fingerprint):
+    """
+    Guarda a impressão digital em df.attrs, junto com a identidade do frame.
+
+    Frames derivados (df.fillna(0), df[df.x > 0]) herdam df.attrs; a
+    identidade faz dataset_fingerprint ignorar o valor herdado.
+
+    Args:
+        df (pandas.DataFrame): Dados
+        fingerprint (str): Impressão digital (ex.: hash do arquivo original)
+
+    Returns:
+        pandas.DataFrame: O próprio df
+    """
+    df.attrs["fingerprint"] = fingerprint
+    df.attrs["fingerprint_identidade"] = _identity(df)
+    return df
+
+
+def dataset_fingerprint(df):
+    """
+    Calcula a impressão digital de um DataFrame.
+
+    Usa o hash do conteúdo original quando o DataFrame veio do cache de
+    uploads (df.attrs["fingerprint"], marcado por tag_fingerprint) e ainda é
+    o mesmo objeto; caso contrário (por exemplo, um frame derivado que herdou
+    df.attrs), calcula um hash vetorizado das linhas e o guarda em df.attrs
+    para as próximas chamadas.
+
+    Args:
+        df (pandas.DataFrame): Dados
+
+    Returns:
+        str: Impressão digital do dataset
+    """
+    shape_key = f"{df.shape}|{list(df.columns)}"
+    cached = df.attrs.get("fingerprint")
+    if cached is not None and df.attrs.get("fingerprint_identidade") == _identity(df):
+        return hashlib.blake2b(f"{cached}|{shape_key}".encode("utf-8"), digest_size=20).hexdigest()
+
+    hasher = hashlib.blake2b(digest_size=20)
+    hasher.update(shape_key.encode("utf-8"))
+    hasher.update(str(list(df.dtypes.astype(str))).encode("utf-8"))
+    try:
+        row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        hasher.update(row_hashes.tobytes())
+    except TypeError:
+        # Colunas com objetos não hasheáveis (listas, dicts)
+        hasher.update(df.to_csv(index=False).encode("utf-8"))
+
+    tag_fingerprint(df, hasher.hexdigest())
+    return dataset_fingerprint(df)
+
+
+class AnalyzerRegistry:
+    """
+    Mantém um DataFrameAnalyzer por dataset (LRU), com o perfil já calculado.
+
+    Trocar de formato de saída, de prompt ou de provedor de IA não refaz o
+    perfil dos dados; só um dataset novo cria um analisador novo.
+    """
+
+    def __init__(self, max_datasets=MAX_DATASETS, response_cache=None):
+        """
+        Inicializa o registro.
+
+        Args:
+            max_datasets (int): Quantidade máxima de analisadores mantidos
+            response_cache (ResponseCache, optional): Cache de respostas atribuído aos analisadores
+        """
+        self.max_datasets = max_datasets
+        self.response_cache = response_cache
+        self._analyzers = OrderedDict()
+
+    def get(self, llm, output_format="texto", df=None, summary=None, fingerprint=None, factory=None):
+        """
+        Retorna o analisador do dataset, criando-o apenas na primeira vez.
+
+        Args:
+            llm: Modelo de linguagem LangChain atual
+            output_format (str): Formato de saída desejado
+            df (pandas.DataFrame, optional): Dados a analisar
+            summary (StreamingSummary, optional): Resumo de leitura em streaming
+            fingerprint (str, optional): Impressão digital já conhecida do dataset
+            factory (callable, optional): Função (llm, output_format) que cria e carrega
+                                          o analisador (ex.: SQLTableAnalyzer); exige fingerprint
+
+        Returns:
+            DataFrameAnalyzer: Analisador pronto para perguntas
+        """
+        if fingerprint is None:
+            if df is None:
+                raise ValueError("Informe um DataFrame ou a impressão digital do dataset.")
+            fingerprint = dataset_fingerprint(df)
+
+        analyzer = self._analyzers.get(fingerprint)
+        if analyzer is None:
+            if factory is not None:
+                analyzer = factory(llm, output_format)
+            else:
+                # Importa aqui: o LangChain só é carregado quando o primeiro analisador é criado
+                from langchain_analyzer import DataFrameAnalyzer
+                
+                analyzer = DataFrameAnalyzer(llm, output_format)
+                if summary is not None:
+                    analyzer.load_summary(summary)
+                else:
+                    analyzer.load_dataframe(df)
+            analyzer.fingerprint = fingerprint
+            analyzer.response_cache = self.response_cache
+
+            self._analyzers[fingerprint] = analyzer
+            while len(self._analyzers) > self.max_datasets:
+                self._analyzers.popitem(last=False)
+        else:
+            self._analyzers.move_to_end(fingerprint)
+            # Apenas atualiza o provedor; o perfil dos dados é mantido
+            analyzer.llm = llm
+
+        # Restaura o system prompt padrão do formato (um prompt personalizado é reaplicado pelo chamador)
+        analyzer.set_output_format(output_format)
+        return analyzer
+
+    def clear(self):
+        """Remove todos os analisadores."""
+        self._analyzers.clear()
+
+    def __len__(self):
+        return len(self._analyzers)
@@ -0,0 +1,300 @@
+"""
+Análise em lote: envia muitas perguntas sobre o mesmo dataset ao provedor
+de IA de forma concorrente, com limite de concorrência e novas tentativas.
+"""
+
+import time
+import random
+import asyncio
+import argparse
+import json
+import sys
+
+from config import get_batch_config
+from response_cache import get_model_name
+from code_executor import CodeRunResult
+
+
+def is_rate_limit_error(error):
+    """
+    Verifica se um erro do provedor indica limite de requisições (HTTP 429).
+
+    Args:
+        error (Exception): Erro levantado pelo cliente
+
+    Returns:
+        bool: True se for um erro de limite de requisições
+    """
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status == 429:
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return "ratelimit" in text or "rate limit" in text or "too many requests" in text or "429" in text
+
+
+def is_transient_error(error):
+    """Erros de rede/tempo esgotado que valem uma nova tentativa."""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError, TimeoutError)):
+        return True
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int) and status >= 500:
+        return True
+    name = type(error).__name__.lower()
+    return "timeout" in name or "connection" in name or "unavailable" in name
+
+
+def _retry_after(error):
+    """Lê o cabeçalho Retry-After da resposta, quando o provedor o envia."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class _RateLimitGate:
+    """
+    Pausa compartilhada: quando uma pergunta recebe 429, todas as outras
+    esperam o mesmo intervalo antes de enviar novas requisições.
+    """
+
+    def __init__(self):
+        self._resume_at = 0.0
+
+    def pause(self, seconds):
+        self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    async def wait(self):
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class _RequestFailed(Exception):
+    """Erro final de uma pergunta, com a quantidade de tentativas realmente feitas."""
+
+    def __init__(self, error, attempts):
+        super().__init__(str(error))
+        self.error = error
+        self.attempts = attempts
+
+
+async def _invoke_with_retries(chain, inputs, gate, max_retries, backoff_base, backoff_max):
+    """
+    Chama a cadeia com novas tentativas e espera exponencial com jitter.
+
+    Raises:
+        _RequestFailed: Com o erro original e o número de tentativas (1 em erros que não são repetidos)
+    """
+    attempt = 0
+    while True:
+        await gate.wait()
+        try:
+            return await chain.ainvoke(inputs), attempt + 1
+        except Exception as e:
+            rate_limited = is_rate_limit_error(e)
+            if attempt >= max_retries or not (rate_limited or is_transient_error(e)):
+                raise _RequestFailed(e, attempt + 1) from e
+
+            delay = _retry_after(e) or min(backoff_max, backoff_base * 2 ** attempt)
+            delay *= 1 + random.random() * 0.25
+            if rate_limited:
+                gate.pause(delay)
+            else:
+                await asyncio.sleep(delay)
+            attempt += 1
+
+
+async def analyze_batch(analyzer, questions, output_format="texto", concurrency=None, max_retries=None,
+                        use_native_batch=False, execute_code=False):
+    """
+    Envia várias perguntas sobre o dataset do analisador de forma concorrente.
+
+    Os resultados são entregues à medida que terminam (não na ordem das
+    perguntas); use a chave 'indice' para reordená-los.
+
+    Args:
+        analyzer (DataFrameAnalyzer): Analisador com o dataset já carregado
+        questions (list): Perguntas a enviar
+        output_format (str): 'texto' (chat) ou 'markdown'
+        concurrency (int, optional): Máximo de requisições simultâneas. Padrão vem da configuração.
+        max_retries (int, optional): Novas tentativas por pergunta em erros de limite ou de rede
+        use_native_batch (bool): Usa o batch nativo do LangChain/provedor (abatch) em vez de chamadas individuais
+        execute_code (bool): Executa os blocos de código das respostas em modo texto
+
+    Yields:
+        dict: {'indice', 'pergunta', 'resposta', 'resultado', 'erro', 'tentativas', 'duracao', 'cache', 'blocos'}
+    """
+    config = get_batch_config()
+    concurrency = concurrency or config["concurrency"]
+    max_retries = config["max_retries"] if max_retries is None else max_retries
+
+    if output_format == "markdown":
+        chain = analyzer._markdown_chain()
+    else:
+        output_format = "texto"
+        chain = analyzer._chat_chain()
+    make_inputs = analyzer._prompt_inputs
+
+    cache = analyzer.response_cache
+    if cache is not None and analyzer.fingerprint is None:
+        from analyzer_registry import dataset_fingerprint
+        analyzer.fingerprint = dataset_fingerprint(analyzer.df)
+    model = get_model_name(analyzer.llm)
+
+    # exec e matplotlib não são seguros entre threads: um bloco de código por vez
+    code_lock = asyncio.Lock()
+
+    def cache_key(query):
+        return (analyzer.fingerprint, output_format, analyzer.system_prompt, model, query)
+
+    async def finish(index, query, response, attempts, started, from_cache=False, error=None):
+        result = None
+        if error is None:
+            if cache is not None and not from_cache:
+                # SQLite e, com a busca semântica, o embedding da pergunta (rede): fora do event loop
+                await asyncio.to_thread(cache.put, *cache_key(query), response)
+            if execute_code and output_format == "texto":
+                async with code_lock:
+                    result = await asyncio.to_thread(analyzer._process_result, response, query)
+        return {
+            "indice": index,
+            "pergunta": query,
+            "resposta": response,
+            "resultado": result,
+            "erro": None if error is None else str(error),
+            "tentativas": attempts,
+            "duracao": time.perf_counter() - started,
+            "cache": from_cache,
+            # Tempo e memória de cada bloco de código executado
+            "blocos": result.timings() if isinstance(result, CodeRunResult) else None,
+        }
+
+    # Perguntas já respondidas antes saem direto do cache; as buscas rodam em threads, em paralelo
+    lookup_semaphore = asyncio.Semaphore(concurrency)
+
+    async def lookup(query):
+        if cache is None:
+            return None
+        async with lookup_semaphore:
+            return await asyncio.to_thread(cache.get, *cache_key(query))
+
+    started = time.perf_counter()
+    cached_responses = await asyncio.gather(*(lookup(query) for query in questions))
+    pending = []
+    for index, (query, cached) in enumerate(zip(questions, cached_responses)):
+        if cached is not None:
+            yield await finish(index, query, cached, 0, started, from_cache=True)
+        else:
+            pending.append((index, query))
+
+    if use_native_batch:
+        # Envia em lotes do tamanho da concorrência; cada lote é uma chamada batch do provedor
+        for start in range(0, len(pending), concurrency):
+            group = pending[start:start + concurrency]
+            started = time.perf_counter()
+            responses = await chain.abatch(
+                [make_inputs(query) for _, query in group],
+                config={"max_concurrency": concurrency},
+                return_exceptions=True,
+            )
+            for (index, query), response in zip(group, responses):
+                if isinstance(response, Exception):
+                    yield await finish(index, query, None, 1, started, error=response)
+                else:
+                    yield await finish(index, query, response, 1, started)
+        return
+
+    semaphore = asyncio.Semaphore(concurrency)
+    gate = _RateLimitGate()
+
+    async def run(index, query):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response, attempts = await _invoke_with_retries(
+                    chain, make_inputs(query), gate, max_retries,
+                    config["backoff_base"], config["backoff_max"],
+                )
+            except _RequestFailed as e:
+                return await finish(index, query, None, e.attempts, started, error=e.error)
+            except Exception as e:
+                # Falhou antes de chegar ao provedor (ex.: montagem do prompt)
+                return await finish(index, query, None, 0, started, error=e)
+            return await finish(index, query, response, attempts, started)
+
+    tasks = [asyncio.create_task(run(index, query)) for index, query in pending]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def run_batch(analyzer, questions, **options):
+    """
+    Versão síncrona de analyze_batch, para scripts e tarefas agendadas.
+
+    Args:
+        analyzer (DataFrameAnalyzer): Analisador com o dataset já carregado
+        questions (list): Perguntas a enviar
+        **options: Opções repassadas a analyze_batch
+
+    Returns:
+        list: Resultados na ordem das perguntas
+    """
+    async def collect():
+        return [item async for item in analyze_batch(analyzer, questions, **options)]
+
+    results = asyncio.run(collect())
+    return sorted(results, key=lambda item: item["indice"])
+
+
+def main():
+    """Executa um lote de perguntas (uma por linha) sobre um arquivo de dados."""
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    from ai_providers import get_ai_provider
+    from analyzer_registry import AnalyzerRegistry
+    from data_processors.adaptive_processor import process_adaptive
+    from data_processors.dataset_store import load_file
+    from response_cache import get_response_cache
+
+    parser = argparse.ArgumentParser(description="Análise em lote de perguntas sobre um dataset")
+    parser.add_argument("dados", help="Arquivo CSV, Excel ou XML")
+    parser.add_argument("perguntas", help="Arquivo texto com uma pergunta por linha")
+    parser.add_argument("--saida", default="-", help="Arquivo JSON Lines de saída (padrão: saída padrão)")
+    parser.add_argument("--provedor", default="api", choices=["api", "local"])
+    parser.add_argument("--formato", default="texto", choices=["texto", "markdown"])
+    parser.add_argument("--concorrencia", type=int, default=None)
+    parser.add_argument("--batch-nativo", action="store_true")
+    args = parser.parse_args()
+
+    with open(args.perguntas, encoding="utf-8") as f:
+        questions = [line.strip() for line in f if line.strip()]
+
+    # Reaproveita a cópia colunar do catálogo se o arquivo não mudou
+    df = load_file(args.dados, process_adaptive)
+    registry = AnalyzerRegistry(response_cache=get_response_cache())
+    analyzer = registry.get(get_ai_provider(args.provedor), args.formato, df=df)
+
+    async def consume(output):
+        async for item in analyze_batch(
+            analyzer, questions, output_format=args.formato,
+            concurrency=args.concorrencia, use_native_batch=args.batch_nativo,
+        ):
+            item.pop("resultado", None)
+            output.write(json.dumps(item, ensure_ascii=False) + "\n")
+            output.flush()
+
+    if args.saida == "-":
+        asyncio.run(consume(sys.stdout))
+    else:
+        with open(args.saida, "w", encoding="utf-8") as output:
+            asyncio.run(consume(output))
+
+
+if __name__ == "__main__":
+    main()
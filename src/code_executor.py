@@ -0,0 +1,1071 @@
+"""
+Execução isolada do código Python gerado pelo LLM.
+
+Cada bloco roda em um processo auxiliar, com limites de tempo de CPU e de
+memória e um tempo máximo de relógio; um processo que estoura os limites é
+encerrado e substituído, sem travar o servidor do Streamlit nem as outras
+sessões. O DataFrame é gravado uma vez em Arrow IPC (em /dev/shm, quando
+disponível) e mapeado em memória pelos processos, sem cópia; DataFrames,
+figuras e valores produzidos pelo código voltam pelo pipe, bloco a bloco.
+
+Os blocos de uma mesma resposta rodam em sequência em um único namespace
+(CodeSession), como as células de um notebook: variáveis criadas em um
+bloco ficam disponíveis nos seguintes.
+
+Os processos ficam aquecidos entre execuções: bibliotecas já importadas e
+os datasets recentes já abertos, identificados pela impressão digital.
+"""
+
+import io
+import os
+import ast
+import json
+import time
+import atexit
+import pickle
+import hashlib
+import signal
+import tempfile
+import threading
+import traceback
+import contextlib
+from collections import OrderedDict, deque
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from config import get_code_execution_config, get_visualization_config
+
+try:
+    import resource  # Limites de CPU e memória (só em sistemas POSIX)
+except ImportError:
+    resource = None
+
+# Datasets mantidos exportados para os processos (os menos usados são apagados)
+MAX_EXPORTED_DATASETS = 8
+
+# Execuções consideradas nas estatísticas de latência
+LATENCY_WINDOW = 200
+
+FIGURE_FORMATS = ("png", "svg")
+
+# O pyplot guarda as figuras em estado global: na execução local, um bloco por vez
+_pyplot_lock = threading.Lock()
+
+
+class FigureResult:
+    """
+    Figura renderizada em memória: bytes PNG ou SVG (matplotlib) ou o JSON
+    de uma figura do plotly. Nada é gravado em disco.
+    """
+
+    def __init__(self, figure_format, data):
+        """
+        Args:
+            figure_format (str): 'png', 'svg' ou 'plotly'
+            data (bytes ou str): Imagem renderizada ou JSON do plotly
+        """
+        self.format = figure_format
+        self.data = data
+
+    def to_plotly(self):
+        """Reconstrói a figura do plotly a partir do JSON."""
+        import plotly.io as pio
+        return pio.from_json(self.data)
+
+    def __repr__(self):
+        return f"FigureResult({self.format!r}, {len(self.data)} bytes)"
+
+
+class BlockResult:
+    """Saídas de um bloco de código, com o tempo de relógio e a variação de memória da execução."""
+
+    def __init__(self, index, code, outputs, duration, memory, error=None, from_cache=False):
+        """
+        Args:
+            index (int): Posição do bloco na resposta (a partir de 0)
+            code (str): Código do bloco
+            outputs (list): Saídas (tipo, valor): ("figura", FigureResult), ("dataframe", DataFrame),
+                ("valor", escalar ou coleção) ou ("texto", saída do print)
+            duration (float): Tempo de relógio da execução, em segundos
+            memory (int): Variação da memória privada do processo durante o bloco, em bytes
+            error (str, optional): Mensagem de erro, se o bloco falhou
+            from_cache (bool): Saídas reaproveitadas do cache, sem executar o bloco
+        """
+        self.index = index
+        self.code = code
+        self.outputs = outputs
+        self.duration = duration
+        self.memory = memory
+        self.error = error
+        self.from_cache = from_cache
+
+    def summary(self):
+        """Resumo do bloco (sem as saídas), para tabelas e logs."""
+        return {
+            "bloco": self.index + 1,
+            "duracao_ms": round(self.duration * 1000, 1),
+            "memoria_mb": round(self.memory / 1e6, 1),
+            "saidas": [kind for kind, _ in self.outputs],
+            "erro": self.error,
+            "cache": self.from_cache,
+        }
+
+    def __repr__(self):
+        status = f"erro={self.error!r}" if self.error else f"{len(self.outputs)} saídas"
+        return f"BlockResult({self.index + 1}, {status}, {self.duration * 1000:.0f} ms)"
+
+
+class CodeRunResult:
+    """Resultado de todos os blocos de código de uma resposta."""
+
+    def __init__(self, blocks, response=None):
+        """
+        Args:
+            blocks (list): BlockResult de cada bloco, na ordem da resposta
+            response (str, optional): Resposta original do LLM
+        """
+        self.blocks = blocks
+        self.response = response
+
+    @property
+    def outputs(self):
+        """Todas as saídas, na ordem em que foram produzidas."""
+        return [output for block in self.blocks for output in block.outputs]
+
+    @property
+    def errors(self):
+        """Blocos que falharam."""
+        return [block for block in self.blocks if block.error]
+
+    @property
+    def duration(self):
+        return sum(block.duration for block in self.blocks)
+
+    def timings(self):
+        """Tempo e memória de cada bloco (ver BlockResult.summary)."""
+        return [block.summary() for block in self.blocks]
+
+    def __repr__(self):
+        return f"CodeRunResult({len(self.blocks)} blocos, {len(self.outputs)} saídas, {len(self.errors)} erros)"
+
+
+def _to_ipc(df):
+    """Serializa um DataFrame em um stream Arrow IPC (None se os tipos não forem compatíveis)."""
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=None)
+    except (pa.ArrowException, TypeError, ValueError):
+        return None
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _from_ipc(data):
+    """Lê um DataFrame de um stream Arrow IPC (os metadados do pandas restauram os tipos originais)."""
+    return pa.ipc.open_stream(data).read_all().to_pandas()
+
+
+def _namespace(df):
+    """
+    Variáveis disponíveis para o código gerado (as mesmas da execução local).
+
+    O `df` é uma cópia rasa: colunas criadas ou removidas pelo código ficam
+    só nesta sessão (com copy-on-write, nos processos auxiliares, alterações
+    de valores também).
+    """
+    import matplotlib.pyplot as plt
+    return {
+        "__builtins__": __builtins__, "__name__": "__llm__", "df": df.copy(deep=False), "pd": pd, "plt": plt, "os": os,
+    }
+
+
+def _disable_plotly_show():
+    """fig.show() abriria um navegador no servidor; a figura é capturada pelo namespace."""
+    try:
+        from plotly.basedatatypes import BaseFigure
+    except ImportError:
+        return None
+    BaseFigure.show = lambda self, *args, **kwargs: None
+    return BaseFigure
+
+
+def _render_matplotlib(figure, figure_format):
+    """Renderiza uma figura pela própria figura (API orientada a objetos), sem o estado do pyplot."""
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format=figure_format, bbox_inches="tight")
+    return buffer.getvalue()
+
+
+def _scalar(value):
+    """Converte escalares (inclusive os do numpy) em tipos do Python; None para os demais valores."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (bool, int, float, str)):
+        return value
+    return None
+
+
+def _json_default(value):
+    scalar = _scalar(value)
+    if scalar is not None:
+        return scalar
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"{type(value).__name__} não é serializável")
+
+
+def _collection(value):
+    """
+    Converte coleções (listas, tuplas, dicts, conjuntos, arrays e Index) em
+    estruturas do JSON; None para os demais valores.
+
+    Raises:
+        TypeError, ValueError: A coleção contém valores que o JSON não representa
+    """
+    if isinstance(value, (np.ndarray, pd.Index)):
+        value = value.tolist()
+    if not isinstance(value, (list, tuple, dict, set, frozenset)):
+        return None
+    return json.loads(json.dumps(value, default=_json_default))
+
+
+def _exec_block(code, namespace):
+    """Executa o bloco e retorna o valor da última expressão, como em um notebook (None se não houver)."""
+    tree = ast.parse(code, "<bloco>")
+    last = None
+    if tree.body and isinstance(tree.body[-1], ast.Expr):
+        last = ast.Expression(tree.body.pop().value)
+    exec(compile(tree, "<bloco>", "exec"), namespace)
+    if last is None:
+        return None
+    return eval(compile(last, "<bloco>", "eval"), namespace)
+
+
+def run_block(code, namespace, figure_format):
+    """
+    Executa um bloco no namespace e coleta tudo o que ele produziu.
+
+    As figuras do pyplot são desligadas do estado global logo após o bloco e
+    renderizadas depois, fora da trava do pyplot. Figuras do plotly e o
+    result_df só contam se foram criados ou reatribuídos pelo próprio bloco.
+
+    Args:
+        code (str): Código Python
+        namespace (dict): Variáveis compartilhadas pelos blocos da resposta
+        figure_format (str): 'png' ou 'svg'
+
+    Returns:
+        list: Saídas (tipo, valor): ("figura", (formato, dados)), ("dataframe", DataFrame),
+            ("valor", escalar ou coleção) ou ("texto", saída do print)
+    """
+    import matplotlib.pyplot as plt
+
+    before = dict(namespace)
+    printed = io.StringIO()
+    with _pyplot_lock:
+        try:
+            with contextlib.redirect_stdout(printed):
+                value = _exec_block(code, namespace)
+            figures = [plt.figure(number) for number in plt.get_fignums()]
+        finally:
+            # Fechar só remove as figuras do pyplot; o objeto da figura continua renderizável
+            plt.close("all")
+
+    outputs = []
+    if printed.getvalue():
+        outputs.append(("texto", printed.getvalue()))
+    outputs.extend(("figura", (figure_format, _render_matplotlib(figure, figure_format))) for figure in figures)
+
+    base = _disable_plotly_show()
+    if base is not None:
+        plotly_figures = [
+            item for name, item in namespace.items() if isinstance(item, base) and before.get(name) is not item
+        ]
+        if isinstance(value, base) and all(value is not item for item in plotly_figures):
+            plotly_figures.append(value)
+        outputs.extend(("figura", ("plotly", figure.to_json())) for figure in plotly_figures)
+
+    result_df = namespace.get("result_df")
+    if isinstance(result_df, pd.DataFrame) and before.get("result_df") is not result_df:
+        outputs.append(("dataframe", result_df))
+
+    if isinstance(value, pd.Series):
+        value = value.to_frame()
+    if isinstance(value, pd.DataFrame):
+        if value is not result_df:
+            outputs.append(("dataframe", value))
+    elif _scalar(value) is not None:
+        outputs.append(("valor", _scalar(value)))
+    else:
+        try:
+            collection = _collection(value)
+        except (TypeError, ValueError):
+            outputs.append(("texto", repr(value)))
+        else:
+            if collection is not None:
+                outputs.append(("valor", collection))
+    return outputs
+
+
+def run_blocks(blocks, namespace, figure_format=None, cpu_seconds=None):
+    """
+    Executa os blocos em sequência no mesmo namespace. Um bloco que falha não
+    interrompe os seguintes.
+
+    Usado tanto dentro dos processos auxiliares quanto na execução local.
+
+    Args:
+        blocks (list): Códigos Python
+        namespace (dict): Variáveis compartilhadas pelos blocos
+        figure_format (str, optional): 'png' ou 'svg'. Padrão vem da configuração.
+        cpu_seconds (int, optional): Tempo máximo de CPU por bloco (só nos processos auxiliares)
+
+    Yields:
+        dict: {'saidas', 'duracao', 'memoria', 'erro'} de cada bloco, assim que ele termina
+    """
+    figure_format = figure_format or get_visualization_config()["figure_format"]
+    if figure_format not in FIGURE_FORMATS:
+        raise ValueError(f"Formato de figura inválido: {figure_format} (use {', '.join(FIGURE_FORMATS)})")
+
+    for code in blocks:
+        start = time.perf_counter()
+        memory = _private_memory()
+        outputs, error = [], None
+        if cpu_seconds:
+            _set_cpu_limit(cpu_seconds)
+        try:
+            outputs = run_block(code, namespace, figure_format)
+        except _CPULimitExceeded:
+            error = f"Limite de {cpu_seconds} s de CPU excedido"
+        except MemoryError:
+            error = "Limite de memória excedido"
+        except (Exception, SystemExit) as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            if cpu_seconds:
+                _set_cpu_limit(None)
+        yield {
+            "saidas": outputs,
+            "duracao": time.perf_counter() - start,
+            "memoria": _private_memory() - memory,
+            "erro": error,
+        }
+
+
+def _unpack_outputs(outputs):
+    """Converte as saídas vindas de run_blocks (ou do pipe) nos objetos entregues à interface."""
+    unpacked = []
+    for kind, value in outputs:
+        if kind == "figura":
+            unpacked.append(("figura", FigureResult(*value)))
+        elif kind == "arrow":
+            unpacked.append(("dataframe", _from_ipc(value)))
+        else:
+            unpacked.append((kind, value))
+    return unpacked
+
+
+def _block_results(blocks, reports, error=None, first_index=0):
+    """
+    Monta os BlockResult dos blocos enviados. Se a execução foi interrompida
+    (tempo limite, processo encerrado), o bloco em andamento recebe o erro e
+    os seguintes ficam marcados como não executados.
+    """
+    results = []
+    for offset, code in enumerate(blocks):
+        if offset < len(reports):
+            report = reports[offset]
+            try:
+                outputs, block_error = _unpack_outputs(report["saidas"]), report["erro"]
+            except Exception as e:
+                # Uma saída que não pode ser lida de volta derruba só o seu bloco
+                outputs, block_error = [], f"Resultado não pode ser lido: {type(e).__name__}: {e}"
+            results.append(BlockResult(
+                first_index + offset, code, outputs, report["duracao"], report["memoria"], block_error,
+            ))
+        else:
+            message = error if offset == len(reports) else "Não executado: a execução foi interrompida em um bloco anterior"
+            results.append(BlockResult(first_index + offset, code, [], 0.0, 0, message or "Não executado"))
+    return results
+
+
+class _CPULimitExceeded(Exception):
+    pass
+
+
+def _on_cpu_limit(signum, frame):
+    raise _CPULimitExceeded()
+
+
+def _set_cpu_limit(seconds):
+    """Ajusta o limite flexível de CPU para `seconds` além do já consumido (None remove)."""
+    if resource is None:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if seconds is None:
+        soft = hard
+    else:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = int(usage.ru_utime + usage.ru_stime + seconds) + 1
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+    # Só o limite flexível muda: o rígido não poderia ser aumentado de volta
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _private_memory():
+    """Memória privada do processo em bytes (residente menos as páginas compartilhadas, como o dataset mapeado)."""
+    try:
+        with open("/proc/self/statm") as f:
+            _, resident, shared = (int(value) for value in f.read().split()[:3])
+        return (resident - shared) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        if resource is None:
+            return 0
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _load_dataset(path):
+    """
+    Abre um dataset exportado. O arquivo IPC é mapeado em memória, e os
+    metadados do pandas gravados no schema restauram os tipos originais
+    (categorias, booleanos, datas), os mesmos que a sessão vê. Sem consolidar
+    os blocos, as colunas numéricas sem nulos continuam apontando para o
+    arquivo mapeado, sem cópia.
+    """
+    if path.endswith(".arrow"):
+        table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        return table.to_pandas(split_blocks=True)
+    return pd.read_pickle(path)
+
+
+def _worker_main(conn, memory_bytes, max_resident):
+    """
+    Laço do processo auxiliar: recebe tarefas pelo pipe e devolve as saídas.
+
+    As bibliotecas usadas pelo código gerado são importadas antes da primeira
+    tarefa, e os datasets ficam abertos entre tarefas (LRU por impressão digital).
+
+    Args:
+        conn: Ponta do pipe do processo auxiliar
+        memory_bytes (int): Limite de memória do processo (0 sem limite)
+        max_resident (int): Datasets mantidos abertos no processo
+    """
+    # Sessões recebem cópias rasas do dataset residente: com copy-on-write, nenhuma alteração
+    # feita pelo código gerado chega ao dataset compartilhado com as próximas sessões
+    pd.set_option("mode.copy_on_write", True)
+
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401
+    try:
+        import plotly.express  # noqa: F401
+        import plotly.graph_objects  # noqa: F401
+    except ImportError:
+        pass
+
+    if resource is not None:
+        if memory_bytes:
+            # RLIMIT_DATA conta heap e mapeamentos anônimos; o dataset mapeado do arquivo fica de fora
+            resource.setrlimit(resource.RLIMIT_DATA, (memory_bytes, memory_bytes))
+        signal.signal(signal.SIGXCPU, _on_cpu_limit)
+
+    datasets = OrderedDict()  # impressão digital -> DataFrame mapeado
+    session = None  # namespace da sessão aberta (blocos de uma mesma resposta)
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+
+        # Ações: "carregar" (só abre o dataset), "iniciar" (novo namespace de sessão),
+        # "continuar" (blocos seguintes da sessão) e "encerrar" (descarta o namespace)
+        action, dataset_key, path, blocks, cpu_seconds = task
+        start = time.perf_counter()
+        loaded = False
+        error = None
+        try:
+            if action == "encerrar":
+                session = None
+            else:
+                df = datasets.get(dataset_key)
+                if df is None:
+                    df = _load_dataset(path)
+                    loaded = True
+                    datasets[dataset_key] = df
+                    while len(datasets) > max_resident:
+                        datasets.popitem(last=False)
+                else:
+                    datasets.move_to_end(dataset_key)
+
+                if action == "iniciar" or (action == "continuar" and session is None):
+                    session = _namespace(df)
+                if action != "carregar":
+                    for report in run_blocks(blocks, session, cpu_seconds=cpu_seconds):
+                        _send_report(conn, report)
+        except MemoryError:
+            error = "Limite de memória excedido"
+        except BaseException as e:
+            error = f"{type(e).__name__}: {str(e) or traceback.format_exc(limit=1)}"
+
+        info = {
+            "residentes": list(datasets),
+            "carregou": loaded,
+            "duracao": time.perf_counter() - start,
+            "memoria_privada": _private_memory(),
+        }
+        conn.send(("fim", error, info))
+
+
+def _send_report(conn, report):
+    """Envia o relatório de um bloco; DataFrames vão em Arrow IPC quando os tipos permitem."""
+    outputs = []
+    for kind, value in report["saidas"]:
+        data = _to_ipc(value) if kind == "dataframe" else None
+        outputs.append(("arrow", data) if data is not None else (kind, value))
+    try:
+        conn.send(("bloco", dict(report, saidas=outputs)))
+    except (pickle.PicklingError, TypeError, AttributeError) as e:
+        # result_df com objetos que não podem ser serializados
+        conn.send(("bloco", dict(report, saidas=[], erro=f"Resultado não pode ser enviado: {e}")))
+
+
+class _Worker:
+    """Um processo auxiliar, a ponta do pipe usada para falar com ele e os datasets que ele mantém abertos."""
+
+    def __init__(self, context, memory_bytes, max_resident):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, memory_bytes, max_resident), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.datasets = []
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+
+class CodeExecutor:
+    """
+    Pool de processos auxiliares para executar código gerado pelo LLM com
+    limites de CPU, memória e tempo.
+
+    Os processos são iniciados antecipadamente (já com pandas, matplotlib e
+    plotly importados) e mantêm os datasets abertos entre execuções; cada
+    pedido vai, de preferência, para um processo que já tem o dataset.
+    """
+
+    def __init__(self, workers=None, timeout=None, cpu_seconds=None, memory_mb=None, data_dir=None,
+                 prewarm=None, max_resident=None, recycle_mb=None):
+        """
+        Inicializa o executor.
+
+        Args:
+            workers (int, optional): Processos simultâneos. Padrão vem da configuração.
+            timeout (float, optional): Tempo máximo de relógio por bloco, em segundos
+            cpu_seconds (int, optional): Tempo máximo de CPU por bloco, em segundos
+            memory_mb (int, optional): Memória máxima de cada processo, em MB (0 sem limite)
+            data_dir (str, optional): Diretório dos datasets exportados
+            prewarm (bool, optional): Inicia todos os processos já na criação do executor
+            max_resident (int, optional): Datasets mantidos abertos em cada processo
+            recycle_mb (int, optional): Memória privada acima da qual o processo é substituído (0 nunca)
+        """
+        config = get_code_execution_config()
+        self.max_workers = max(1, workers or config["workers"])
+        self.timeout = timeout or config["timeout"]
+        self.cpu_seconds = cpu_seconds or config["cpu_seconds"]
+        self.memory_bytes = (memory_mb if memory_mb is not None else config["memory_mb"]) * 1024 * 1024
+        self.prewarm = prewarm if prewarm is not None else config["prewarm"]
+        self.max_resident = max(1, max_resident or config["max_resident"])
+        self.recycle_bytes = (recycle_mb if recycle_mb is not None else config["recycle_mb"]) * 1024 * 1024
+        if data_dir is None:
+            data_dir = config["data_dir"] or ("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+        self.data_dir = os.path.join(data_dir, f"analise-dados-{os.getpid()}")
+
+        # spawn: o fork de um processo com threads (ex.: Streamlit) não é seguro
+        self._context = get_context("spawn")
+        self._cond = threading.Condition()
+        self._idle = []  # processos livres, o usado mais recentemente por último
+        self._workers = 0
+        self._waiting = 0
+        self._datasets = OrderedDict()  # chave do dataset -> caminho exportado
+        self._export_lock = threading.Lock()
+
+        self.executions = 0
+        self.failures = 0
+        self.restarts = 0
+        self.resident_hits = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)  # (espera na fila, execução, total) em segundos
+
+        if self.prewarm:
+            for _ in range(self.max_workers):
+                self._idle.append(self._spawn())
+                self._workers += 1
+
+    def _spawn(self):
+        return _Worker(self._context, self.memory_bytes, self.max_resident)
+
+    def _export(self, df, dataset_key):
+        """Grava o DataFrame para os processos (uma vez por dataset) e retorna o caminho."""
+        with self._export_lock:
+            path = self._datasets.get(dataset_key)
+            if path is not None and os.path.exists(path):
+                self._datasets.move_to_end(dataset_key)
+                return path
+
+            os.makedirs(self.data_dir, exist_ok=True)
+            try:
+                table = pa.Table.from_pandas(df, preserve_index=None)
+                path = os.path.join(self.data_dir, f"{dataset_key}.arrow")
+                # Arquivo IPC sem compressão, para ser mapeado em memória pelos processos
+                with pa.OSFile(path + ".tmp", "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            except (pa.ArrowException, TypeError, ValueError):
+                # Colunas com tipos misturados não têm schema do Arrow: usa pickle (com cópia)
+                path = os.path.join(self.data_dir, f"{dataset_key}.pkl")
+                df.to_pickle(path + ".tmp")
+            os.replace(path + ".tmp", path)
+
+            self._datasets[dataset_key] = path
+            while len(self._datasets) > MAX_EXPORTED_DATASETS:
+                # Processos que já mapearam o arquivo continuam lendo-o até descartá-lo
+                _, old_path = self._datasets.popitem(last=False)
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+            return path
+
+    def _acquire(self, dataset_key=None):
+        """
+        Obtém um processo livre, de preferência um que já tenha o dataset aberto;
+        cria um novo se o pool ainda não estiver cheio.
+        """
+        with self._cond:
+            if not self._idle and self._workers >= self.max_workers:
+                # Pool cheio: espera um processo ser devolvido (contado como fila)
+                self._waiting += 1
+                try:
+                    while not self._idle and self._workers >= self.max_workers:
+                        self._cond.wait()
+                finally:
+                    self._waiting -= 1
+            if self._idle:
+                for index in range(len(self._idle) - 1, -1, -1):
+                    if dataset_key in self._idle[index].datasets:
+                        return self._idle.pop(index)
+                return self._idle.pop()
+            self._workers += 1
+
+        try:
+            return self._spawn()
+        except Exception:
+            with self._cond:
+                self._workers -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, worker):
+        with self._cond:
+            self._idle.append(worker)
+            self._cond.notify()
+
+    def _discard(self, worker):
+        """Encerra um processo (limite estourado ou memória alta) e, com pré-aquecimento, já inicia outro."""
+        worker.kill()
+        replacement = None
+        if self.prewarm:
+            try:
+                replacement = self._spawn()
+            except Exception as e:
+                print(f"Não foi possível iniciar um processo de execução: {e}")
+        with self._cond:
+            self.restarts += 1
+            if replacement is not None:
+                self._idle.append(replacement)
+            else:
+                self._workers -= 1
+            self._cond.notify()
+
+    def _request(self, worker, task):
+        """
+        Envia uma tarefa e recebe os relatórios dos blocos, com o tempo limite
+        valendo para cada bloco. Um processo que estoura o tempo ou morre é
+        descartado.
+
+        Returns:
+            tuple: (relatórios dos blocos, erro da tarefa ou None, info do processo ou None se foi descartado)
+        """
+        reports = []
+        try:
+            worker.conn.send(task)
+            while True:
+                if not worker.conn.poll(self.timeout):
+                    self._discard(worker)
+                    return reports, f"Tempo limite de {self.timeout:g} s excedido; a execução foi interrompida", None
+                message = worker.conn.recv()
+                if message[0] != "bloco":
+                    break
+                reports.append(message[1])
+        except (EOFError, OSError):
+            # O processo morreu (ex.: limite rígido de CPU ou falta de memória no sistema)
+            self._discard(worker)
+            return reports, "O processo de execução foi encerrado (possível falta de memória ou limite de CPU)", None
+
+        _, error, info = message
+        worker.datasets = info["residentes"]
+        return reports, error, info
+
+    def _finish(self, worker, info):
+        """Devolve o processo ao pool, ou o substitui se a memória privada passou do limite."""
+        if self.recycle_bytes and info["memoria_privada"] > self.recycle_bytes:
+            # Memória que o código deixou para trás (ex.: fragmentação do heap) só volta com um processo novo
+            self._discard(worker)
+        else:
+            self._release(worker)
+
+    def _execute(self, worker, action, dataset_key, path, blocks, first_index=0, queued=0.0):
+        """
+        Executa blocos em um processo já obtido (sem devolvê-lo ao pool).
+
+        Returns:
+            tuple: (lista de BlockResult, info do processo ou None se ele foi descartado)
+        """
+        start = time.perf_counter()
+        self.executions += 1
+        reports, error, info = self._request(worker, (action, dataset_key, path, blocks, self.cpu_seconds))
+        results = _block_results(blocks, reports, error, first_index)
+        self.failures += sum(1 for result in results if result.error)
+        elapsed = time.perf_counter() - start
+        if len(reports) < len(blocks):
+            # O bloco interrompido consumiu o restante do tempo
+            results[len(reports)].duration = max(0.0, elapsed - sum(report["duracao"] for report in reports))
+        if info is not None and not info["carregou"]:
+            self.resident_hits += 1
+        self._latencies.append((queued, info["duracao"] if info else elapsed, queued + elapsed))
+        return results, info
+
+    def preload(self, df, dataset_key):
+        """
+        Exporta o dataset e o abre nos processos livres, em segundo plano,
+        para que a primeira pergunta não espere pela leitura.
+
+        Args:
+            df (pandas.DataFrame): Dados
+            dataset_key (str): Impressão digital do dataset
+        """
+        def load():
+            try:
+                path = self._export(df, dataset_key)
+                # Processos ocupados recebem o dataset na próxima execução
+                with self._cond:
+                    targets = [worker for worker in self._idle if dataset_key not in worker.datasets]
+                    for worker in targets:
+                        self._idle.remove(worker)
+                for worker in targets:
+                    _, error, info = self._request(worker, ("carregar", dataset_key, path, None, None))
+                    if info is not None:
+                        self._finish(worker, info)
+                    if error:
+                        print(f"Não foi possível pré-carregar o dataset nos processos de execução: {error}")
+            except Exception as e:
+                print(f"Não foi possível pré-carregar o dataset nos processos de execução: {e}")
+
+        threading.Thread(target=load, name="preload-dataset", daemon=True).start()
+
+    def stats(self):
+        """
+        Retorna estatísticas do executor.
+
+        Returns:
+            dict: Processos, fila de espera, execuções, falhas, reinícios e
+                latências (média e p95 das últimas execuções, em ms)
+        """
+        latencies = list(self._latencies)
+
+        def summary(position):
+            values = sorted(item[position] * 1000 for item in latencies)
+            if not values:
+                return 0.0, 0.0
+            return sum(values) / len(values), values[min(len(values) - 1, int(len(values) * 0.95))]
+
+        wait_mean, wait_p95 = summary(0)
+        run_mean, run_p95 = summary(1)
+        total_mean, total_p95 = summary(2)
+        with self._cond:
+            workers, idle, waiting = self._workers, len(self._idle), self._waiting
+        return {
+            "processos": workers,
+            "livres": idle,
+            "fila": waiting,
+            "execucoes": self.executions,
+            "falhas": self.failures,
+            "reinicios": self.restarts,
+            "dataset_residente": self.resident_hits,
+            "espera_media_ms": wait_mean,
+            "espera_p95_ms": wait_p95,
+            "execucao_media_ms": run_mean,
+            "execucao_p95_ms": run_p95,
+            "latencia_media_ms": total_mean,
+            "latencia_p95_ms": total_p95,
+        }
+
+    def shutdown(self):
+        """Encerra os processos livres e apaga os datasets exportados."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._workers -= len(idle)
+        for worker in idle:
+            worker.stop()
+        with self._export_lock:
+            for path in self._datasets.values():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._datasets.clear()
+            try:
+                os.rmdir(self.data_dir)
+            except OSError:
+                pass
+
+
+class CodeSession:
+    """
+    Executa os blocos de uma resposta em sequência, em um único namespace:
+    variáveis criadas em um bloco ficam disponíveis nos seguintes.
+
+    Com o executor em processos, a sessão fica com um processo (e o namespace
+    dentro dele) do primeiro bloco até close(). Blocos cujas saídas já estão
+    no cache não rodam; se um bloco seguinte precisar rodar, os pulados são
+    executados antes, para recriar as variáveis.
+    """
+
+    def __init__(self, df, dataset_key, executor=None, figure_cache=None):
+        """
+        Args:
+            df (pandas.DataFrame): Dados disponíveis como `df`
+            dataset_key (str): Impressão digital do dataset
+            executor (CodeExecutor, optional): Pool de processos (None executa no próprio processo, sem limites)
+            figure_cache (FigureCache, optional): Cache de saídas por dataset e código
+        """
+        self.df = df
+        self.dataset_key = dataset_key
+        self.executor = executor
+        self.figure_cache = figure_cache
+        self.blocks = []
+        self._cache_key = dataset_key
+        self._skipped = []  # blocos vindos do cache que ainda não rodaram no namespace
+        self._namespace = None
+        self._worker = None
+        self._path = None
+
+    def run(self, code):
+        """
+        Executa um bloco (ou reaproveita as saídas do cache).
+
+        Args:
+            code (str): Código Python
+
+        Returns:
+            BlockResult: Saídas, tempo e memória do bloco
+        """
+        index = len(self.blocks)
+        # A chave encadeia os blocos anteriores: a saída de um bloco depende deles
+        self._cache_key = FigureCache.key(self._cache_key, code)
+        cached = self.figure_cache.get(self._cache_key) if self.figure_cache is not None else None
+        if cached is not None:
+            self._skipped.append(code)
+            result = BlockResult(index, code, cached.outputs, cached.duration, cached.memory, from_cache=True)
+        else:
+            blocks = self._skipped + [code]
+            self._skipped = []
+            result = self._execute(blocks, index - len(blocks) + 1)[-1]
+            if self.figure_cache is not None and result.error is None and result.outputs and all(
+                kind != "dataframe" for kind, _ in result.outputs
+            ):
+                self.figure_cache.put(self._cache_key, result)
+        self.blocks.append(result)
+        return result
+
+    def _execute(self, blocks, first_index):
+        if self.executor is None:
+            if self._namespace is None:
+                self._namespace = _namespace(self.df)
+            return _block_results(blocks, list(run_blocks(blocks, self._namespace)), first_index=first_index)
+
+        queued = 0.0
+        if self._worker is None:
+            start = time.perf_counter()
+            self._path = self.executor._export(self.df, self.dataset_key)
+            self._worker = self.executor._acquire(self.dataset_key)
+            queued = time.perf_counter() - start
+            action = "iniciar"
+        else:
+            action = "continuar"
+        results, info = self.executor._execute(
+            self._worker, action, self.dataset_key, self._path, blocks, first_index, queued
+        )
+        if info is None:
+            # Processo descartado (tempo limite): o próximo bloco recomeça em um namespace novo
+            self._worker = None
+        return results
+
+    def result(self, response=None):
+        """Resultado de todos os blocos executados até agora."""
+        return CodeRunResult(list(self.blocks), response)
+
+    def close(self):
+        """Descarta o namespace e devolve o processo ao pool."""
+        self._namespace = None
+        worker, self._worker = self._worker, None
+        if worker is not None:
+            _, _, info = self.executor._request(worker, ("encerrar", self.dataset_key, None, None, None))
+            if info is not None:
+                self.executor._finish(worker, info)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class FigureCache:
+    """
+    Cache LRU das saídas de blocos (figuras e valores, sem DataFrames) por
+    dataset e hash do código que as gerou.
+    """
+
+    def __init__(self, max_entries=None):
+        """
+        Args:
+            max_entries (int, optional): Blocos mantidos. Padrão vem da configuração (0 desativa).
+        """
+        self.max_entries = (
+            max_entries if max_entries is not None else get_visualization_config()["figure_cache_entries"]
+        )
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(previous, code):
+        """
+        Chave do bloco: hash da chave anterior (a impressão digital do dataset,
+        no primeiro bloco) + código sem espaços nas pontas.
+        """
+        return hashlib.blake2b(f"{previous}\x00{code.strip()}".encode("utf-8"), digest_size=20).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            block = self._entries.get(key)
+            if block is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return block
+
+    def put(self, key, block):
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._entries[key] = block
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"figuras": len(self._entries), "acertos": self.hits, "falhas": self.misses}
+
+
+_figure_cache = FigureCache()
+
+
+def open_session(df, dataset_key):
+    """
+    Abre uma sessão de execução pelo executor configurado, com o cache de figuras compartilhado.
+
+    Args:
+        df (pandas.DataFrame): Dados disponíveis como `df`
+        dataset_key (str): Impressão digital do dataset
+
+    Returns:
+        CodeSession: Sessão (use com `with` ou chame close())
+    """
+    return CodeSession(df, dataset_key, get_code_executor(), _figure_cache)
+
+
+def execute_code(blocks, df, dataset_key, response=None):
+    """
+    Executa todos os blocos de código de uma resposta em um único namespace.
+
+    Saídas sem DataFrames ficam em cache pelo dataset e pelo hash do código
+    (encadeado com os blocos anteriores): repetir a mesma análise sobre os
+    mesmos dados devolve as figuras já renderizadas, sem executar nada.
+
+    Args:
+        blocks (list): Códigos Python, na ordem da resposta
+        df (pandas.DataFrame): Dados disponíveis como `df`
+        dataset_key (str): Impressão digital do dataset
+        response (str, optional): Resposta original do LLM
+
+    Returns:
+        CodeRunResult: Saídas, tempo e memória de cada bloco
+    """
+    with open_session(df, dataset_key) as session:
+        for code in blocks:
+            session.run(code)
+    return session.result(response)
+
+
+def get_figure_cache():
+    """Retorna o cache de figuras compartilhado pelas sessões."""
+    return _figure_cache
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_code_executor():
+    """
+    Retorna o executor global (compartilhado por todas as sessões do processo),
+    ou None se a execução estiver configurada como local.
+
+    Returns:
+        CodeExecutor ou None: Executor compartilhado
+    """
+    global _executor
+    if get_code_execution_config()["mode"] == "local":
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = CodeExecutor()
+            # Não deixa datasets exportados em /dev/shm depois que o servidor termina
+            atexit.register(_executor.shutdown)
+        return _executor
@@ -0,0 +1,188 @@
+"""
+Perfil estatístico das colunas de um DataFrame em uma única passada vetorizada.
+
+Substitui o describe(include='all') do pandas, que calcula unique/top/freq
+de colunas de texto com hashing em Python. Cada coluna vira um array do
+Arrow uma única vez (sem cópia quando o DataFrame já usa tipos do Arrow);
+as estatísticas numéricas e de datas de todas as colunas saem de um único
+select do Polars, que paraleliza as expressões, enquanto as contagens de
+frequência das demais colunas rodam no kernel de hash do Arrow em outras
+threads, ao mesmo tempo (POLARS_MAX_THREADS limita as threads do Polars).
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import polars as pl
+import pyarrow as pa
+import pyarrow.compute as pc
+from pandas.api import types as ptypes
+
+# Valores mais frequentes reportados por coluna (mantido baixo: entra no contexto do LLM)
+TOP_K = 5
+# Acima desta quantidade de linhas, os distintos das colunas numéricas e de datas são estimados (HyperLogLog)
+EXACT_DISTINCT_MAX_ROWS = 1_000_000
+QUANTILES = (0.25, 0.5, 0.75)
+
+
+def _to_arrow(series):
+    """
+    Converte uma coluna em um array do Arrow; colunas que o Arrow não consegue
+    tipar (ex.: objetos com tipos misturados) ou aninhadas viram texto.
+    """
+    # infer_dtype percorre os objetos em C: evita tentar (e falhar) a conversão de colunas misturadas
+    if series.dtype != object or not ptypes.infer_dtype(series, skipna=True).startswith("mixed"):
+        try:
+            array = pa.array(series, from_pandas=True)
+            if not pa.types.is_nested(array.type):
+                return array
+        except (pa.ArrowException, TypeError, ValueError):
+            pass
+    return pa.array(series.astype("string"), from_pandas=True)
+
+
+def _kind(arrow_type):
+    """Classifica a coluna: 'numerico', 'data' ou 'categorico' (texto, booleanos, categorias)."""
+    if pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type) or pa.types.is_decimal(arrow_type):
+        return "numerico"
+    if pa.types.is_temporal(arrow_type):
+        return "data"
+    return "categorico"
+
+
+def _numeric_expressions(name, kind, exact_distinct):
+    """Expressões de uma coluna numérica ou de datas, para o select único do Polars."""
+    column = pl.col(name)
+    distinct = column.drop_nulls().n_unique() if exact_distinct else column.drop_nulls().approx_n_unique()
+    expressions = [
+        distinct.alias(f"{name}:unique"),
+        column.min().alias(f"{name}:min"),
+        column.max().alias(f"{name}:max"),
+    ]
+    if kind == "numerico":
+        values = column.cast(pl.Float64)
+        expressions += [values.mean().alias(f"{name}:mean"), values.std().alias(f"{name}:std")]
+        # Sem nulos, cada quantil é uma seleção parcial, sem ordenar a coluna inteira
+        expressions += [
+            values.drop_nulls().quantile(q, interpolation="linear").alias(f"{name}:{q:.0%}") for q in QUANTILES
+        ]
+    return expressions
+
+
+def _numeric_stats(table, columns, exact_distinct):
+    """
+    Estatísticas de todas as colunas numéricas e de datas em um único select do Polars.
+
+    Returns:
+        tuple: (linha com as estatísticas, segundos)
+    """
+    start = time.perf_counter()
+    if not columns:
+        return {}, 0.0
+    frame = pl.from_arrow(table.select([name for name, _ in columns]))
+    expressions = [
+        expression for name, kind in columns for expression in _numeric_expressions(name, kind, exact_distinct)
+    ]
+    row = frame.select(expressions).row(0, named=True)
+    return row, time.perf_counter() - start
+
+
+def _frequencies(array):
+    """
+    Valores distintos (exatos) e os TOP_K mais frequentes de uma coluna, com
+    o kernel de hash do Arrow (que libera o GIL).
+
+    Returns:
+        tuple: (quantidade de distintos, {valor: contagem} em ordem decrescente, segundos)
+    """
+    start = time.perf_counter()
+    counts = pc.value_counts(array.drop_null() if array.null_count else array)
+    frequencies = counts.field("counts").to_numpy()
+    top = np.arange(len(frequencies))
+    if len(top) > TOP_K:
+        top = np.argpartition(-frequencies, TOP_K)[:TOP_K]
+    top = top[np.argsort(-frequencies[top], kind="stable")]
+    values = counts.field("values").take(pa.array(top, type=pa.int64())).to_pylist()
+    top_values = {str(value): int(frequencies[index]) for value, index in zip(values, top)}
+    return len(counts), top_values, time.perf_counter() - start
+
+
+def _json_value(value):
+    """Converte valores do Polars em tipos serializáveis em JSON."""
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    if isinstance(value, float):
+        return None if value != value else value
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def profile_dataframe(df, max_workers=None):
+    """
+    Calcula as estatísticas descritivas de todas as colunas.
+
+    Colunas numéricas: count, nulos, unique, mean, std, min, 25%, 50%, 75% e max.
+    Datas: count, nulos, unique, min e max. Demais (texto, categorias,
+    booleanos): count, nulos, unique, top, freq e mais_frequentes.
+
+    Args:
+        df (pandas.DataFrame): Dados
+        max_workers (int, optional): Threads das contagens de frequência. Padrão: núcleos disponíveis.
+
+    Returns:
+        tuple: (estatísticas por coluna, tempos por etapa em segundos: 'conversao',
+            'numericas' e 'frequencias' (somas por etapa, que rodam ao mesmo tempo),
+            'estatisticas' (tempo de relógio das duas), 'formatacao' e 'total')
+    """
+    timings = {}
+    start = time.perf_counter()
+
+    arrays = [_to_arrow(df.iloc[:, position]) for position in range(df.shape[1])]
+    table = pa.table(arrays, names=[f"c{position}" for position in range(len(arrays))])
+    kinds = {field.name: _kind(field.type) for field in table.schema}
+    converted = time.perf_counter()
+    timings["conversao"] = converted - start
+
+    numeric = [(name, kind) for name, kind in kinds.items() if kind != "categorico"]
+    categorical = [name for name, kind in kinds.items() if kind == "categorico"]
+    exact_distinct = table.num_rows <= EXACT_DISTINCT_MAX_ROWS
+    workers = max(1, min(len(categorical), max_workers or os.cpu_count() or 1))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="profiler") as pool:
+        futures = {name: pool.submit(_frequencies, table.column(name)) for name in categorical}
+        # O select do Polars roda nesta thread enquanto as contagens rodam no pool
+        row, timings["numericas"] = _numeric_stats(table, numeric, exact_distinct)
+        frequencies = {name: future.result() for name, future in futures.items()}
+    computed = time.perf_counter()
+    timings["frequencias"] = sum(seconds for _, _, seconds in frequencies.values())
+    timings["estatisticas"] = computed - converted
+
+    descricao = {}
+    for position, (name, kind) in enumerate(kinds.items()):
+        key = str(df.columns[position])
+        if key in descricao:
+            # Colunas com o mesmo nome: mantém a primeira
+            continue
+        column = table.column(name)
+        stats = {"count": len(column) - column.null_count, "nulos": column.null_count}
+        if kind == "categorico":
+            distinct, top, _ = frequencies[name]
+            first = next(iter(top.items()), (None, None))
+            stats.update({"unique": distinct, "top": first[0], "freq": first[1], "mais_frequentes": top})
+        else:
+            keys = ["unique", "min", "max"]
+            if kind == "numerico":
+                keys = ["unique", "mean", "std", "min", *(f"{q:.0%}" for q in QUANTILES), "max"]
+            stats.update({stat: _json_value(row[f"{name}:{stat}"]) for stat in keys})
+        descricao[key] = stats
+    finished = time.perf_counter()
+    timings["formatacao"] = finished - computed
+    timings["total"] = finished - start
+    return descricao, timings
+
+
+def format_timings(timings):
+    """Formata os tempos por etapa em uma linha (ex.: para logs)."""
+    return ", ".join(f"{stage} {seconds * 1000:.0f} ms" for stage, seconds in timings.items())
@@ -54,4 +54,196 @@ def get_visualization_config():
     return {
         "use_plotly": os.getenv("DEFAULT_USE_PLOTLY", "false").lower() == "true",
         "output_format": os.getenv("DEFAULT_OUTPUT_FORMAT", "texto").lower(),
-    }
\ No newline at end of file
+        # Formato das figuras do matplotlib (png ou svg), renderizadas em memória
+        "figure_format": os.getenv("FIGURE_FORMAT", "png").lower(),
+        # Saídas de blocos guardadas por dataset e código (0 desativa o cache)
+        "figure_cache_entries": int(os.getenv("FIGURE_CACHE_MAX_ENTRIES", "128")),
+    }
+
+
+def get_cache_config():
+    """
+    Obtém a configuração do cache de arquivos processados.
+    
+    Returns:
+        dict: Dicionário de configuração para o cache
+    """
+    return {
+        "max_bytes": int(os.getenv("PARSE_CACHE_MAX_BYTES", "1000000000")),
+        "spill_dir": os.getenv("PARSE_CACHE_DIR", "") or None,
+    }
+
+
+def get_dataset_store_config():
+    """
+    Obtém a configuração do catálogo persistente de datasets.
+    
+    Returns:
+        dict: Dicionário de configuração para o catálogo
+    """
+    return {
+        "enabled": os.getenv("DATASET_STORE_ENABLED", "true").lower() == "true",
+        "dir": os.getenv("DATASET_STORE_DIR", ".cache/datasets"),
+        # feather (mapeado em memória, abertura instantânea) ou parquet (menor em disco)
+        "format": os.getenv("DATASET_STORE_FORMAT", "feather"),
+        "sql_ttl_seconds": int(os.getenv("DATASET_STORE_SQL_TTL", "3600")),
+        "max_bytes": int(os.getenv("DATASET_STORE_MAX_BYTES", "20000000000")),
+    }
+
+
+def get_processing_config():
+    """
+    Obtém a configuração de processamento de dados.
+    
+    Returns:
+        dict: Dicionário de configuração para o processamento de arquivos
+    """
+    return {
+        "large_file_threshold": int(os.getenv("LARGE_FILE_THRESHOLD", "100000000")),
+        "csv_chunk_size": int(os.getenv("CSV_CHUNK_SIZE", "100000")),
+        "stream_sample_size": int(os.getenv("STREAM_SAMPLE_SIZE", "1000")),
+        "sql_batch_size": int(os.getenv("SQL_BATCH_SIZE", "50000")),
+        # Motor de leitura de Excel: auto (calamine se instalado, senão openpyxl), calamine ou openpyxl
+        "excel_engine": os.getenv("EXCEL_ENGINE", "auto"),
+        "excel_max_workers": int(os.getenv("EXCEL_MAX_WORKERS", "4")),
+    }
+
+
+def get_context_config():
+    """
+    Obtém a configuração do contexto enviado ao LLM.
+    
+    Returns:
+        dict: Dicionário de configuração para o contexto dos dados
+    """
+    return {
+        "token_budget": int(os.getenv("LLM_CONTEXT_TOKEN_BUDGET", "6000")),
+        "tokenizer": os.getenv("LLM_CONTEXT_TOKENIZER", "cl100k_base"),
+    }
+
+
+def get_response_cache_config():
+    """
+    Obtém a configuração do cache de respostas do LLM.
+    
+    Returns:
+        dict: Dicionário de configuração para o cache de respostas
+    """
+    return {
+        "enabled": os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true",
+        "path": os.getenv("RESPONSE_CACHE_PATH", ".cache/respostas.sqlite"),
+        "ttl_seconds": int(os.getenv("RESPONSE_CACHE_TTL", "604800")),
+        "max_entries": int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000")),
+        # Provedor de embeddings para a busca semântica ('api', 'local' ou vazio para desativar)
+        "embeddings": os.getenv("RESPONSE_CACHE_EMBEDDINGS", "").lower(),
+        "similarity_threshold": float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95")),
+    }
+
+
+def get_code_execution_config():
+    """
+    Obtém a configuração da execução do código gerado pelo LLM.
+    
+    Returns:
+        dict: Dicionário de configuração para a execução isolada
+    """
+    return {
+        # processo (isolado, com limites) ou local (no processo do Streamlit, sem limites)
+        "mode": os.getenv("CODE_EXECUTION_MODE", "processo").lower(),
+        "workers": int(os.getenv("CODE_EXECUTION_WORKERS", "2")),
+        "timeout": float(os.getenv("CODE_EXECUTION_TIMEOUT", "30")),
+        "cpu_seconds": int(os.getenv("CODE_EXECUTION_CPU_SECONDS", "20")),
+        "memory_mb": int(os.getenv("CODE_EXECUTION_MEMORY_MB", "2048")),
+        # Inicia os processos junto com o servidor, com pandas, matplotlib e plotly já importados
+        "prewarm": os.getenv("CODE_EXECUTION_PREWARM", "true").lower() == "true",
+        # Datasets mantidos abertos em cada processo
+        "max_resident": int(os.getenv("CODE_EXECUTION_RESIDENT_DATASETS", "2")),
+        # Memória privada (em MB) acima da qual o processo é substituído depois da execução (0 nunca)
+        "recycle_mb": int(os.getenv("CODE_EXECUTION_RECYCLE_MB", "1024")),
+        # Onde o DataFrame é gravado para os processos (vazio usa /dev/shm ou o diretório temporário)
+        "data_dir": os.getenv("CODE_EXECUTION_DATA_DIR", ""),
+    }
+
+
+def get_batch_config():
+    """
+    Obtém a configuração da análise em lote.
+    
+    Returns:
+        dict: Dicionário de configuração para perguntas em lote
+    """
+    return {
+        "concurrency": int(os.getenv("BATCH_CONCURRENCY", "8")),
+        "max_retries": int(os.getenv("BATCH_MAX_RETRIES", "5")),
+        "backoff_base": float(os.getenv("BATCH_BACKOFF_BASE", "1.0")),
+        "backoff_max": float(os.getenv("BATCH_BACKOFF_MAX", "60.0")),
+    }
+
+
+def get_database_pool_config():
+    """
+    Obtém a configuração do pool de conexões com o banco de dados.
+    
+    Returns:
+        dict: Dicionário de configuração do pool do SQLAlchemy
+    """
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_POOL_MAX_OVERFLOW", "10")),
+        "timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "recycle": int(os.getenv("DB_POOL_RECYCLE", "3600")),
+        "pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+    }
+
+
+def get_sql_analyzer_config():
+    """
+    Obtém a configuração da análise de tabelas direto no banco de dados.
+    
+    Returns:
+        dict: Dicionário de configuração do SQLTableAnalyzer
+    """
+    return {
+        "sample_rows": int(os.getenv("SQL_ANALYZER_SAMPLE_ROWS", "1000")),
+        "full_scan_rows": int(os.getenv("SQL_ANALYZER_FULL_SCAN_ROWS", "1000000")),
+        "max_result_rows": int(os.getenv("SQL_ANALYZER_MAX_RESULT_ROWS", "10000")),
+        "timeout_ms": int(os.getenv("SQL_ANALYZER_TIMEOUT_MS", "30000")),
+    }
+
+
+def get_instrumentation_config():
+    """
+    Obtém a configuração da instrumentação do pipeline (spans, tokens e memória).
+    
+    Returns:
+        dict: Dicionário de configuração dos traces e das exportações
+    """
+    return {
+        "enabled": os.getenv("INSTRUMENTATION_ENABLED", "true").lower() == "true",
+        # Traces mantidos em memória para o painel de depuração
+        "max_traces": int(os.getenv("INSTRUMENTATION_MAX_TRACES", "50")),
+        # Arquivo JSON lines com um trace por linha (vazio desativa)
+        "jsonl_path": os.getenv("INSTRUMENTATION_JSONL_PATH", ""),
+        # Arquivo texto no formato do Prometheus, para o textfile collector (vazio desativa)
+        "prometheus_path": os.getenv("INSTRUMENTATION_PROMETHEUS_PATH", ""),
+        # Intervalo da amostragem da memória residente durante as requisições
+        "sample_ms": int(os.getenv("INSTRUMENTATION_SAMPLE_MS", "50")),
+    }
+
+
+def get_ai_client_config():
+    """
+    Obtém a configuração dos clientes dos provedores de IA.
+    
+    Returns:
+        dict: Dicionário de configuração das conexões HTTP e do pré-carregamento
+    """
+    return {
+        "max_connections": int(os.getenv("AI_HTTP_MAX_CONNECTIONS", "20")),
+        "max_keepalive_connections": int(os.getenv("AI_HTTP_MAX_KEEPALIVE_CONNECTIONS", "10")),
+        # Tempo que uma conexão ociosa fica aberta esperando a próxima pergunta
+        "keepalive_seconds": float(os.getenv("AI_HTTP_KEEPALIVE_SECONDS", "120")),
+        "timeout": float(os.getenv("AI_HTTP_TIMEOUT", "120")),
+        # Cria o cliente (importando o LangChain) em segundo plano enquanto a página é exibida
+        "preload": os.getenv("AI_PROVIDER_PRELOAD", "true").lower() == "true",
+    }
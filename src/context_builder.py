@@ -0,0 +1,285 @@
+"""
+Construção do contexto compacto sobre o DataFrame enviado ao LLM,
+limitado por um orçamento de tokens.
+"""
+
+import json
+from functools import lru_cache
+
+import pandas as pd
+from pandas.api import types as ptypes
+
+from config import get_context_config
+
+# Quantidade máxima de linhas por tipo de exemplo
+MAX_STRATIFIED_ROWS = 20
+MAX_OUTLIER_ROWS = 10
+MAX_RANDOM_ROWS = 50
+
+# Limites de cardinalidade para escolher a coluna de estratificação
+STRATIFY_MIN_GROUPS = 2
+STRATIFY_MAX_GROUPS = 20
+
+# Linhas usadas para estimar a cardinalidade das colunas em datasets grandes
+PROFILE_SAMPLE_ROWS = 10_000
+
+# Dígitos significativos dos floats no contexto serializado
+FLOAT_DIGITS = 10
+
+# Linhas da amostra inicial que sempre entram no contexto (o orçamento é reservado antes dos perfis)
+MIN_SAMPLE_ROWS = 3
+# Estatísticas removidas dos perfis quando os perfis completos não cabem para todas as colunas
+BULKY_PROFILE_STATS = ("mais_frequentes", "std", "25%", "50%", "75%", "freq")
+
+
+@lru_cache(maxsize=4)
+def _get_encoding(name):
+    """Carrega a codificação do tiktoken (None se indisponível, ex.: sem rede)."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(name)
+    except Exception:
+        return None
+
+
+def count_tokens(text, encoding_name=None):
+    """
+    Conta os tokens de um texto com o tiktoken.
+
+    Se a codificação não puder ser carregada, usa a estimativa de
+    4 caracteres por token.
+
+    Args:
+        text (str): Texto a contar
+        encoding_name (str, optional): Codificação do tiktoken. Padrão vem da configuração.
+
+    Returns:
+        int: Quantidade de tokens
+    """
+    encoding = _get_encoding(encoding_name or get_context_config()["tokenizer"])
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _canonical(value):
+    """
+    Normaliza o contexto para uma serialização determinística: floats com
+    FLOAT_DIGITS dígitos significativos (somas paralelas variam no último
+    bit entre execuções) e tuplas como listas.
+    """
+    if isinstance(value, float):
+        return float(f"{value:.{FLOAT_DIGITS}g}") if value == value else value
+    if isinstance(value, dict):
+        return {key: _canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    return value
+
+
+def serialize_context(info):
+    """
+    Serializa o contexto em JSON compacto (sem indentação) e determinístico.
+
+    O mesmo dataset gera sempre o mesmo texto, byte a byte, para que o
+    prefixo do prompt seja reaproveitado pelo cache de prompt do provedor.
+
+    Args:
+        info (dict): Contexto a serializar
+
+    Returns:
+        str: JSON compacto
+    """
+    return json.dumps(_canonical(info), ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _records(df):
+    """Converte linhas em registros serializáveis (conversão vetorizada do pandas)."""
+    if df.empty:
+        return []
+    return json.loads(df.to_json(orient="records", date_format="iso", default_handler=str))
+
+
+def _compact_profile(stats):
+    """Perfil resumido de uma coluna (sem frequências, quartis e desvio padrão)."""
+    if not isinstance(stats, dict):
+        return stats
+    return {stat: value for stat, value in stats.items() if stat not in BULKY_PROFILE_STATS}
+
+
+def _stratified_rows(df, sample):
+    """Escolhe uma coluna de baixa cardinalidade e retorna um exemplo por grupo."""
+    best_col, best_rank = None, None
+    for col in sample.columns:
+        dtype = sample[col].dtype
+        if ptypes.is_float_dtype(dtype) or ptypes.is_datetime64_any_dtype(dtype):
+            continue
+        try:
+            groups = sample[col].nunique()
+        except TypeError:
+            continue
+        if not STRATIFY_MIN_GROUPS <= groups <= STRATIFY_MAX_GROUPS:
+            continue
+        # Prefere colunas categóricas/textuais e, entre elas, as com mais grupos
+        rank = (not ptypes.is_numeric_dtype(dtype), groups)
+        if best_rank is None or rank > best_rank:
+            best_col, best_rank = col, rank
+
+    if best_col is None:
+        return None, pd.DataFrame()
+
+    rows = (
+        df.dropna(subset=[best_col])
+        .groupby(best_col, observed=True, sort=False)
+        .sample(n=1, random_state=42)
+        .head(MAX_STRATIFIED_ROWS)
+    )
+    return best_col, rows
+
+
+def _outlier_rows(df):
+    """Retorna as linhas com maior desvio (z-score) em alguma coluna numérica."""
+    numeric_cols = [
+        col for col, dtype in df.dtypes.items()
+        if ptypes.is_numeric_dtype(dtype) and not ptypes.is_bool_dtype(dtype)
+    ]
+    if not numeric_cols or len(df) < 3:
+        return pd.DataFrame()
+
+    numeric = df[numeric_cols].astype("float64")
+    std = numeric.std().replace(0, float("nan"))
+    z_scores = ((numeric - numeric.mean()) / std).abs().max(axis=1, skipna=True)
+    z_scores = z_scores.dropna()
+    if z_scores.empty:
+        return pd.DataFrame()
+
+    top = z_scores.nlargest(MAX_OUTLIER_ROWS)
+    # Só interessa o que realmente se afasta da média
+    top = top[top > 3]
+    return df.loc[top.index]
+
+
+class _BudgetedContext:
+    """Acumula partes do contexto enquanto couberem no orçamento de tokens."""
+
+    def __init__(self, budget, encoding_name):
+        self.budget = budget
+        self.encoding_name = encoding_name
+        self.used = 0
+        self.info = {}
+
+    def cost(self, value):
+        return count_tokens(serialize_context(value), self.encoding_name)
+
+    def add(self, key, value):
+        """Adiciona uma parte inteira, se couber. Retorna True se adicionou."""
+        cost = self.cost({key: value})
+        if self.used + cost > self.budget:
+            return False
+        self.info[key] = value
+        self.used += cost
+        return True
+
+    def add_items(self, key, items):
+        """Adiciona itens de uma lista/dicionário, um a um, até esgotar o orçamento."""
+        is_dict = isinstance(items, dict)
+        pairs = items.items() if is_dict else enumerate(items)
+        accepted = {} if is_dict else []
+        base_cost = self.cost({key: accepted})
+        if self.used + base_cost > self.budget:
+            return 0
+
+        self.used += base_cost
+        for name, item in pairs:
+            cost = self.cost({name: item} if is_dict else item)
+            if self.used + cost > self.budget:
+                break
+            if is_dict:
+                accepted[name] = item
+            else:
+                accepted.append(item)
+            self.used += cost
+
+        self.info[key] = accepted
+        return len(accepted)
+
+
+def build_llm_context(df, base_info, token_budget=None, encoding_name=None):
+    """
+    Monta o contexto enviado ao LLM escolhendo as partes mais informativas
+    que cabem no orçamento de tokens.
+
+    A ordem de prioridade é: estrutura (colunas, dimensões e tipos), perfis
+    por coluna, amostra inicial, exemplos estratificados, linhas atípicas e,
+    por fim, linhas aleatórias para preencher o orçamento restante. As
+    primeiras MIN_SAMPLE_ROWS linhas da amostra têm o orçamento reservado
+    antes dos perfis; quando os perfis completos não cabem para todas as
+    colunas, entram perfis resumidos. Se só a estrutura já passa do
+    orçamento, a primeira linha da amostra entra mesmo assim.
+
+    Args:
+        df (pandas.DataFrame): Dados completos
+        base_info (dict): Informações já calculadas (colunas, dimensoes, tipos_dados,
+                          amostra e, opcionalmente, descricao)
+        token_budget (int, optional): Orçamento de tokens. Padrão vem da configuração.
+        encoding_name (str, optional): Codificação do tiktoken usada na contagem
+
+    Returns:
+        dict: Contexto compacto para o LLM
+    """
+    config = get_context_config()
+    budget = token_budget or config["token_budget"]
+    context = _BudgetedContext(budget, encoding_name or config["tokenizer"])
+
+    # Estrutura dos dados sempre entra, mesmo que ultrapasse o orçamento
+    for key in ("colunas", "dimensoes", "tipos_dados"):
+        context.info[key] = base_info[key]
+    context.used = context.cost(context.info)
+
+    # Algumas linhas de exemplo valem mais que os últimos perfis: o orçamento delas é reservado
+    amostra = base_info.get("amostra", [])
+    reserved = context.cost({"amostra": amostra[:MIN_SAMPLE_ROWS]}) if amostra else 0
+    context.budget -= reserved
+
+    descricao = base_info.get("descricao")
+    if isinstance(descricao, dict):
+        used = context.used
+        included = context.add_items("descricao", descricao)
+        if included < len(descricao):
+            # Perfis completos não cabem para todas as colunas: perfis resumidos cobrem mais colunas
+            context.used = used
+            context.add_items("descricao", {col: _compact_profile(stats) for col, stats in descricao.items()})
+            omitted = [col for col in descricao if col not in context.info.get("descricao", {})]
+            if omitted:
+                context.info["descricao_omitida"] = omitted
+    elif descricao is not None:
+        context.add("descricao", descricao)
+
+    context.budget += reserved
+    if not context.add_items("amostra", amostra) and amostra:
+        # Estrutura maior que o orçamento (ex.: centenas de colunas): uma linha de exemplo entra mesmo assim
+        context.info["amostra"] = amostra[:1]
+        context.used += context.cost({"amostra": context.info["amostra"]})
+
+    sample = df.sample(n=PROFILE_SAMPLE_ROWS, random_state=42) if len(df) > PROFILE_SAMPLE_ROWS else df
+    strat_col, strat_rows = _stratified_rows(df, sample)
+    if strat_col is not None and not strat_rows.empty:
+        if context.add("estratificado_por", strat_col):
+            context.add_items("exemplos_estratificados", _records(strat_rows))
+
+    outliers = _outlier_rows(df)
+    if not outliers.empty:
+        context.add_items("linhas_atipicas", _records(outliers))
+
+    if len(df) > len(base_info.get("amostra", [])):
+        random_rows = df.sample(n=min(MAX_RANDOM_ROWS, len(df)), random_state=7)
+        context.add_items("amostra_aleatoria", _records(random_rows))
+
+    if len(df) > 10000:
+        context.info["nota"] = (
+            f"Dataset grande com {len(df)} linhas. O contexto traz perfis das colunas "
+            f"e exemplos selecionados; use o DataFrame completo no código gerado."
+        )
+
+    context.info["orcamento_tokens"] = {"limite": budget, "usado": context.used}
+    return context.info
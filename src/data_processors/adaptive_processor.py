@@ -1,88 +1,253 @@
 import os
-import pandas as pd
+import codecs
+import tempfile
+import contextlib
 import polars as pl
-from .csv_processor import process_csv
-from .excel_processor import process_excel
+from config import get_processing_config
+from instrumentation import span
+from .csv_processor import process_csv, detect_encoding
+from .excel_processor import process_excel, read_excel_polars
 from .xml_processor import process_xml
+from .type_inference import infer_column_types, apply_column_types
 
-def process_adaptive(file_path, file_content=None):
+def measure_size(file_path, file_content=None):
+    """
+    Mede o tamanho, em bytes, de um arquivo no disco ou de um upload.
+
+    Args:
+        file_path: Caminho ou nome do arquivo
+        file_content: Conteúdo do arquivo (para uploads via Streamlit)
+
+    Returns:
+        int: Tamanho em bytes
+    """
+    if file_content is None:
+        return os.path.getsize(file_path)
+
+    # UploadedFile do Streamlit já informa o tamanho
+    size = getattr(file_content, 'size', None)
+    if size is not None:
+        return int(size)
+
+    if hasattr(file_content, 'getbuffer'):
+        return file_content.getbuffer().nbytes
+
+    # Objeto tipo arquivo genérico: mede pelo deslocamento até o fim
+    position = file_content.tell()
+    file_content.seek(0, os.SEEK_END)
+    size = file_content.tell()
+    file_content.seek(position)
+    return size
+
+# Bytes lidos por vez ao converter um CSV para UTF-8
+TRANSCODE_CHUNK_SIZE = 1024 * 1024
+
+def _transcode_to_utf8(file, encoding, target):
+    """Converte um CSV para UTF-8 em blocos, sem carregar o arquivo inteiro."""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    while True:
+        chunk = file.read(TRANSCODE_CHUNK_SIZE)
+        if not chunk:
+            break
+        target.write(decoder.decode(chunk).encode('utf-8'))
+    target.write(decoder.decode(b'', final=True).encode('utf-8'))
+
+@contextlib.contextmanager
+def _csv_source(file_path, file_content):
+    """
+    Origem para pl.scan_csv, que só lê UTF-8.
+
+    Arquivos em UTF-8 são lidos direto (uploads sem copiar os bytes); outros
+    encodings (ex.: latin1) são convertidos para um arquivo temporário em
+    UTF-8, removido ao sair do contexto, para que os acentos sejam mantidos.
+    """
+    with contextlib.ExitStack() as stack:
+        if file_content is None:
+            file = stack.enter_context(open(file_path, 'rb'))
+        else:
+            file = file_content
+            file.seek(0)
+        encoding = detect_encoding(file)
+
+        if encoding == 'utf-8':
+            if file_content is None:
+                yield file_path
+            elif hasattr(file_content, 'getvalue'):
+                yield file_content.getvalue()
+            else:
+                yield file_content.read()
+            return
+
+        target = tempfile.NamedTemporaryFile(suffix='.csv', delete=False)
+        try:
+            with target:
+                _transcode_to_utf8(file, encoding, target)
+            yield target.name
+        finally:
+            os.remove(target.name)
+
+def _build_lazy_frame(file_path, file_content=None, sheet_name=0, cell_range=None, cleanup=None):
+    """
+    Cria um LazyFrame do Polars para o arquivo (CSV é lido de forma preguiçosa).
+
+    Args:
+        file_path: Caminho ou nome do arquivo
+        file_content: Conteúdo do arquivo (para uploads via Streamlit)
+        sheet_name (str ou int): Planilha do Excel por nome ou posição
+        cell_range (str, optional): Intervalo de células do Excel (ex.: 'B2:F1000')
+        cleanup (contextlib.ExitStack): Recursos que precisam durar até o plano
+            ser executado (ex.: a cópia em UTF-8 de um CSV em latin1)
+
+    Returns:
+        polars.LazyFrame: Plano de leitura ainda não executado
+    """
+    if file_path.endswith('.csv'):
+        return pl.scan_csv(
+            cleanup.enter_context(_csv_source(file_path, file_content)),
+            infer_schema_length=10000,
+        )
+
+    elif file_path.endswith(('.xlsx', '.xls')):
+        # Excel não tem leitura preguiçosa; o plano começa após a leitura
+        source = file_path if file_content is None else file_content
+        return read_excel_polars(source, sheet_name=sheet_name, cell_range=cell_range).lazy()
+
+    raise ValueError(f"Formato de arquivo não suportado para processamento grande: {file_path}")
+
+def process_adaptive(file_path, file_content=None, columns=None, filters=None, drop_empty_rows=True,
+                     record_path=None, sheet_name=0, cell_range=None):
     """
     Processa dados adaptando-se automaticamente ao tamanho do arquivo.
-    
+
+    Arquivos pequenos usam os processadores pandas; arquivos grandes (ou
+    leituras com seleção de colunas/filtros) usam o caminho preguiçoso do
+    Polars, que aplica as operações antes de materializar os dados.
+
     Args:
         file_path: Caminho ou nome do arquivo
         file_content: Conteúdo do arquivo (para uploads via Streamlit)
-        
+        columns (list, optional): Colunas a carregar
+        filters (list, optional): Predicados em SQL (ex.: "idade > 30") aplicados na leitura
+        drop_empty_rows (bool): Remove linhas em que todas as colunas são nulas
+        record_path (str, optional): Caminho dos registros em arquivos XML (detectado se omitido)
+        sheet_name (str ou int, optional): Planilha do Excel por nome ou posição; None lê todas
+        cell_range (str, optional): Intervalo de células do Excel (ex.: 'B2:F1000')
+
     Returns:
         DataFrame do pandas processado
     """
-    # Determina se estamos lidando com um upload do Streamlit ou um arquivo no disco
-    is_upload = file_content is not None
-    
     # Obtém o limite de tamanho das configurações
-    large_file_threshold = int(os.getenv("LARGE_FILE_THRESHOLD", 100_000_000))  # 100MB padrão
-    
-    # Para uploads do Streamlit, não podemos verificar o tamanho diretamente
-    # então usamos uma abordagem baseada no tipo de arquivo
-    if is_upload:
-        if file_path.endswith('.csv'):
-            return process_csv(file_content)
-        elif file_path.endswith(('.xlsx', '.xls')):
-            return process_excel(file_content)
-        elif file_path.endswith('.xml'):
-            return process_xml(file_content)
+    large_file_threshold = get_processing_config()["large_file_threshold"]
+
+    # Mede o tamanho tanto de arquivos no disco quanto de uploads
+    file_size = measure_size(file_path, file_content)
+    use_lazy_path = file_size >= large_file_threshold or bool(columns) or bool(filters)
+    # Todas as planilhas de uma vez: leitura paralela do processador pandas
+    lazy_formats = ('.csv', '.xlsx', '.xls') if sheet_name is not None else ('.csv',)
+
+    lazy = use_lazy_path and file_path.endswith(lazy_formats)
+
+    with span("leitura", formato=os.path.splitext(file_path)[1].lower(), bytes=file_size, preguicoso=lazy) as current:
+        if lazy:
+            df = process_large_dataframe(
+                file_path,
+                file_content,
+                columns=columns,
+                filters=filters,
+                drop_empty_rows=drop_empty_rows,
+                sheet_name=sheet_name,
+                cell_range=cell_range,
+            )
+        elif file_content is not None:
+            # Para arquivos pequenos (menos que o limite configurado), usa processamento padrão
+            file_content.seek(0)
+            df = _process_with_pandas(file_path, file_content, record_path, sheet_name, cell_range)
         else:
-            raise ValueError(f"Formato de arquivo não suportado: {file_path}")
-    
-    # Para arquivos no disco, podemos verificar o tamanho
+            with open(file_path, 'rb') as f:
+                df = _process_with_pandas(file_path, f, record_path, sheet_name, cell_range)
+        current.set(linhas=len(df), colunas=df.shape[1])
+    return df
+
+def _process_with_pandas(file_path, file, record_path=None, sheet_name=0, cell_range=None):
+    """Despacha para o processador pandas correspondente à extensão."""
+    if file_path.endswith('.csv'):
+        return process_csv(file)
+    elif file_path.endswith(('.xlsx', '.xls')):
+        return process_excel(file, sheet_name=sheet_name, cell_range=cell_range)
+    elif file_path.endswith('.xml'):
+        # XML é sempre lido em streaming, qualquer que seja o tamanho
+        return process_xml(file, record_path=record_path)
     else:
-        file_size = os.path.getsize(file_path)
-        
-        # Para arquivos pequenos (menos que o limite configurado), usa processamento padrão
-        if file_size < large_file_threshold:
-            if file_path.endswith('.csv'):
-                return pd.read_csv(file_path)
-            elif file_path.endswith(('.xlsx', '.xls')):
-                return pd.read_excel(file_path)
-            elif file_path.endswith('.xml'):
-                # Implementação específica para XML
-                with open(file_path, 'r') as f:
-                    return process_xml(f)
-            else:
-                raise ValueError(f"Formato de arquivo não suportado: {file_path}")
-        
-        # Para arquivos grandes, usa processamento otimizado com Polars
-        else:
-            return process_large_dataframe(file_path)
+        raise ValueError(f"Formato de arquivo não suportado: {file_path}")
 
-def process_large_dataframe(file_path):
+def process_upload(uploaded_file, **options):
+    """
+    Processa um upload do Streamlit pelo processador adaptativo.
+
+    Args:
+        uploaded_file: Arquivo carregado (precisa ter o atributo name)
+        **options: Opções repassadas a process_adaptive
+
+    Returns:
+        DataFrame do pandas processado
+    """
+    return process_adaptive(uploaded_file.name, uploaded_file, **options)
+
+def process_large_dataframe(file_path, file_content=None, columns=None, filters=None, drop_empty_rows=True,
+                            sheet_name=0, cell_range=None):
     """
     Processa arquivos de dados muito grandes usando Polars para melhor performance.
-    
+
+    A seleção de colunas, os filtros e a remoção de linhas vazias entram no
+    plano preguiçoso e são executados durante a leitura. CSVs passam depois
+    pela mesma inferência de tipos do process_csv (datas, decimais no formato
+    brasileiro, booleanos, categorias), então o resultado tem os mesmos tipos
+    do caminho pandas, qualquer que seja o tamanho do arquivo ou as opções de
+    leitura; planilhas são entregues ao pandas com tipos baseados em Arrow,
+    sem uma segunda cópia.
+
     Args:
-        file_path: Caminho para o arquivo de dados grande
-        
+        file_path: Caminho ou nome do arquivo de dados grande
+        file_content: Conteúdo do arquivo (para uploads via Streamlit)
+        columns (list, optional): Colunas a carregar
+        filters (list, optional): Predicados em SQL aplicados na leitura
+        drop_empty_rows (bool): Remove linhas em que todas as colunas são nulas
+        sheet_name (str ou int): Planilha do Excel por nome ou posição
+        cell_range (str, optional): Intervalo de células do Excel (ex.: 'B2:F1000')
+
     Returns:
-        DataFrame processado (convertido para pandas para compatibilidade)
+        DataFrame processado
     """
-    # Carregar com Polars - muito mais eficiente para arquivos grandes
-    if file_path.endswith('.csv'):
-        df = pl.read_csv(file_path)
-    elif file_path.endswith(('.xlsx', '.xls')):
-        df = pl.read_excel(file_path)
-    else:
-        raise ValueError(f"Formato de arquivo não suportado para processamento grande: {file_path}")
-    
-    # Realizar operações de limpeza/transformação em Polars (muito rápido)
-    # Remover linhas com valores nulos em todas as colunas
-    df = df.drop_nulls(how="all")
-    
+    with contextlib.ExitStack() as cleanup:
+        lazy = _build_lazy_frame(file_path, file_content, sheet_name=sheet_name, cell_range=cell_range,
+                                 cleanup=cleanup)
+
+        if columns:
+            lazy = lazy.select(columns)
+
+        for predicate in filters or []:
+            lazy = lazy.filter(pl.sql_expr(predicate) if isinstance(predicate, str) else predicate)
+
+        if drop_empty_rows:
+            # Remover linhas com valores nulos em todas as colunas
+            lazy = lazy.filter(~pl.all_horizontal(pl.all().is_null()))
+
+        df = lazy.collect()
+
+    # Limpa os nomes das colunas (só metadados, não copia os dados)
+    df = df.rename(lambda name: str(name).strip())
+
     # Para datasets realmente grandes, considerar amostragem
-    # Isso é opcional e pode ser controlado por uma configuração
     if df.height > 100000:
         print(f"Dataset muito grande ({df.height} linhas). Usando amostragem para análise.")
-    
-    # Converter para pandas para compatibilidade com o resto do sistema
-    pandas_df = df.to_pandas()
-    
-    return pandas_df
\ No newline at end of file
+
+    if file_path.endswith('.csv'):
+        # Tipos do pandas, como no process_csv (colunas numéricas sem nulos não são copiadas)
+        df = df.to_pandas()
+        decisions = infer_column_types(df)
+        df = apply_column_types(df, decisions)
+        df.attrs["tipos_inferidos"] = decisions
+        return df
+
+    # Os buffers Arrow do Polars são reaproveitados pelo pandas (sem cópia)
+    return df.to_pandas(use_pyarrow_extension_array=True)
@@ -0,0 +1,144 @@
+"""
+Construção de DataFrames coluna a coluna, sem um dicionário por linha.
+
+Usado pelos leitores em streaming (ex.: XML): cada valor vai direto para o
+buffer da sua coluna e, a cada bloco de linhas, os buffers viram arrays do
+Arrow (compactos e tipados). O DataFrame é materializado uma única vez.
+"""
+
+import pandas as pd
+import pyarrow as pa
+
+# Linhas acumuladas em listas Python antes de virarem arrays do Arrow
+CHUNK_ROWS = 65_536
+
+
+class SchemaRegistry:
+    """Registro de colunas: nome (ex.: tag XML) -> índice, na ordem em que aparecem."""
+
+    def __init__(self):
+        self.names = []
+        self._index = {}
+
+    def index(self, name):
+        """
+        Retorna o índice da coluna, registrando-a na primeira vez.
+
+        Args:
+            name (str): Nome da coluna
+
+        Returns:
+            int: Índice da coluna
+        """
+        idx = self._index.get(name)
+        if idx is None:
+            idx = self._index[name] = len(self.names)
+            self.names.append(name)
+        return idx
+
+    def __len__(self):
+        return len(self.names)
+
+
+class ColumnarBuilder:
+    """
+    Acumula linhas em buffers por coluna e monta o DataFrame uma única vez.
+
+    Os buffers de cada bloco crescem com as linhas: cada valor é anexado ao
+    buffer da sua coluna, e as linhas em que a coluna faltou são preenchidas
+    com None só quando ela volta a aparecer (ou no fim do bloco). Assim, uma
+    coluna nova não aloca o bloco inteiro, o que importa em esquemas largos
+    ou esparsos. Ao completar o bloco, cada buffer vira um array do Arrow do
+    tipo da coluna.
+    """
+
+    def __init__(self, arrow_type=pa.string(), chunk_rows=CHUNK_ROWS):
+        """
+        Inicializa o construtor.
+
+        Args:
+            arrow_type (pyarrow.DataType): Tipo dos arrays gerados (texto, por padrão)
+            chunk_rows (int): Linhas por bloco antes da conversão para Arrow
+        """
+        self.schema = SchemaRegistry()
+        # Acesso direto ao mapa do registro: set() é chamado uma vez por valor
+        self._index = self.schema._index
+        self.arrow_type = arrow_type
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self._row = 0
+        self._buffers = []
+        self._chunks = []
+
+    def set(self, name, value):
+        """
+        Define o valor de uma coluna na linha atual.
+
+        Args:
+            name (str): Nome da coluna
+            value: Valor (None para nulo)
+        """
+        idx = self._index.get(name)
+        if idx is None:
+            idx = self._add_column(name)
+        buffer = self._buffers[idx]
+        missing = self._row - len(buffer)
+        if missing > 0:
+            # Linhas do bloco em que a coluna faltou
+            buffer.extend([None] * missing)
+        if missing >= 0:
+            buffer.append(value)
+        else:
+            # Mesma coluna repetida na linha: vale o último valor
+            buffer[self._row] = value
+
+    def _add_column(self, name):
+        """Registra uma coluna nova; as linhas anteriores ficam nulas."""
+        idx = self.schema.index(name)
+        self._buffers.append([])
+        # Blocos já convertidos ficam nulos para a coluna nova
+        done = self.rows - self._row
+        self._chunks.append([pa.nulls(done, self.arrow_type)] if done else [])
+        return idx
+
+    def end_row(self):
+        """Fecha a linha atual."""
+        self._row += 1
+        self.rows += 1
+        if self._row == self.chunk_rows:
+            self._flush()
+
+    def _flush(self):
+        """Converte os buffers do bloco atual em arrays do Arrow e os reinicia."""
+        if not self._row:
+            return
+        for buffer, chunks in zip(self._buffers, self._chunks):
+            if not buffer:
+                # Coluna ausente no bloco inteiro
+                chunks.append(pa.nulls(self._row, self.arrow_type))
+                continue
+            if len(buffer) < self._row:
+                buffer.extend([None] * (self._row - len(buffer)))
+            chunks.append(pa.array(buffer, type=self.arrow_type))
+            buffer.clear()
+        self._row = 0
+
+    def to_arrow(self):
+        """
+        Materializa as colunas acumuladas.
+
+        Returns:
+            pyarrow.Table: Tabela com uma coluna por nome registrado
+        """
+        self._flush()
+        columns = [pa.chunked_array(chunks, type=self.arrow_type) for chunks in self._chunks]
+        return pa.table(columns, names=list(self.schema.names))
+
+    def to_pandas(self):
+        """
+        Materializa as colunas em um DataFrame com tipos baseados em Arrow.
+
+        Returns:
+            pandas.DataFrame: Dados acumulados
+        """
+        return self.to_arrow().to_pandas(types_mapper=pd.ArrowDtype)
@@ -1,29 +1,53 @@
 import pandas as pd
+import codecs
+from .type_inference import infer_column_types, apply_column_types
 
-def process_csv(file):
+# Encodings testados, em ordem, na detecção automática
+CSV_ENCODINGS = ['utf-8', 'latin1', 'iso-8859-1']
+
+def detect_encoding(file, sample_size=1024):
+    """
+    Detecta o encoding de um arquivo CSV lendo uma amostra do início.
+    
+    Args:
+        file: Objeto tipo arquivo (binário) posicionado no início
+        sample_size (int): Quantidade de bytes lidos para a detecção
+        
+    Returns:
+        str: Nome do encoding detectado
+    """
+    sample = file.read(sample_size)
+    file.seek(0)  # Retorna ao início do arquivo
+    
+    if isinstance(sample, str):
+        # Arquivo já aberto em modo texto
+        return getattr(file, 'encoding', None) or 'utf-8'
+    
+    for encoding in CSV_ENCODINGS:
+        try:
+            # Decodificador incremental: um caractere cortado no fim da amostra não é erro
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    
+    return CSV_ENCODINGS[-1]
+
+def process_csv(file, infer_types=True):
     """
     Processa um arquivo CSV e retorna um DataFrame pandas.
     
     Args:
         file: Objeto tipo arquivo contendo dados CSV
+        infer_types (bool): Se True, detecta e converte os tipos das colunas textuais.
+                            As decisões ficam em df.attrs["tipos_inferidos"].
         
     Returns:
         pandas.DataFrame: DataFrame contendo os dados do CSV
     """
     try:
-        # Tenta detectar o encoding e o delimitador automaticamente
-        # Primeiro, lê uma amostra do arquivo para detecção
-        sample = file.read(1024)
-        file.seek(0)  # Retorna ao início do arquivo
-        
-        # Tenta diferentes encodings comuns
-        encodings = ['utf-8', 'latin1', 'iso-8859-1']
-        for encoding in encodings:
-            try:
-                sample.decode(encoding)
-                break
-            except UnicodeDecodeError:
-                continue
+        # Detecta o encoding a partir de uma amostra do início do arquivo
+        encoding = detect_encoding(file)
         
         # Lê o arquivo CSV para um DataFrame
         df = pd.read_csv(
@@ -36,22 +60,11 @@ def process_csv(file):
         # Limpa os nomes das colunas (remove espaços em branco, converte para string)
         df.columns = df.columns.astype(str).str.strip()
         
-        # Converte colunas numéricas para o tipo correto
-        # Identifica colunas que parecem ser numéricas
-        for col in df.columns:
-            # Tenta converter para numérico, ignorando erros
-            try:
-                # Primeiro, substitui vírgulas por pontos (formato brasileiro para decimal)
-                if df[col].dtype == 'object':
-                    df[col] = df[col].str.replace(',', '.', regex=False)
-                
-                # Tenta converter para numérico
-                pd.to_numeric(df[col], errors='raise')
-                # Se não der erro, converte a coluna
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-            except:
-                # Se não for possível converter, mantém como está
-                pass
+        # Detecta os tipos em uma amostra e converte só as colunas elegíveis, de uma vez
+        if infer_types:
+            decisions = infer_column_types(df)
+            df = apply_column_types(df, decisions)
+            df.attrs["tipos_inferidos"] = decisions
         
         return df
         
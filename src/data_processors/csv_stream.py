@@ -0,0 +1,424 @@
+import json
+import hashlib
+
+import numpy as np
+import pandas as pd
+from pandas.api import types as ptypes
+
+from config import get_processing_config
+from .csv_processor import detect_encoding
+from .type_inference import infer_column_types, apply_column_types
+
+# Número de valores mantidos por coluna numérica para estimar quantis
+QUANTILE_SAMPLE_SIZE = 10_000
+# Número de hashes mantidos para estimar a quantidade de valores distintos
+DISTINCT_SKETCH_SIZE = 1024
+# Quantos valores mais frequentes são reportados
+TOP_K = 10
+
+
+def _to_builtin(value):
+    """Converte escalares numpy/pandas em tipos serializáveis em JSON."""
+    if value is None:
+        return None
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (int, float, bool, str)):
+        return value
+    return str(value)
+
+
+def _bottom_k(keys, values, k):
+    """Mantém os k itens com as menores chaves (amostragem uniforme sem reposição)."""
+    if len(keys) <= k:
+        return keys, values
+    idx = np.argpartition(keys, k - 1)[:k]
+    return keys[idx], values[idx]
+
+
+class _NumericAccumulator:
+    """Contagem, média/variância (Welford/Chan), mínimo, máximo e quantis aproximados."""
+
+    def __init__(self, rng, quantile_sample_size):
+        self.rng = rng
+        self.k = quantile_sample_size
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.keys = np.empty(0)
+        self.values = np.empty(0)
+
+    def update(self, series):
+        values = series.dropna().to_numpy(dtype='float64')
+        n = len(values)
+        if n == 0:
+            return
+
+        # Combina os momentos do bloco com os acumulados (algoritmo paralelo de Chan)
+        chunk_mean = values.mean()
+        chunk_m2 = ((values - chunk_mean) ** 2).sum()
+        total = self.count + n
+        delta = chunk_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += chunk_m2 + delta ** 2 * self.count * n / total
+        self.count = total
+
+        chunk_min, chunk_max = values.min(), values.max()
+        self.min = chunk_min if self.min is None else min(self.min, chunk_min)
+        self.max = chunk_max if self.max is None else max(self.max, chunk_max)
+
+        keys = self.rng.random(n)
+        self.keys, self.values = _bottom_k(
+            np.concatenate([self.keys, keys]),
+            np.concatenate([self.values, values]),
+            self.k,
+        )
+
+    def describe(self):
+        if self.count == 0:
+            return {"count": 0}
+        q25, q50, q75 = np.quantile(self.values, [0.25, 0.5, 0.75])
+        std = (self.m2 / (self.count - 1)) ** 0.5 if self.count > 1 else None
+        return {
+            "count": self.count,
+            "mean": _to_builtin(self.mean),
+            "std": _to_builtin(std),
+            "min": _to_builtin(self.min),
+            "25%": _to_builtin(q25),
+            "50%": _to_builtin(q50),
+            "75%": _to_builtin(q75),
+            "max": _to_builtin(self.max),
+        }
+
+
+class _FrequencyAccumulator:
+    """Valores mais frequentes (Misra-Gries) e estimativa de distintos (KMV)."""
+
+    def __init__(self, top_k, distinct_sketch_size):
+        self.top_k = top_k
+        self.capacity = max(top_k * 10, 100)
+        self.sketch_size = distinct_sketch_size
+        self.count = 0
+        self.counts = pd.Series(dtype='float64')
+        self.error = 0.0  # subcontagem máxima de qualquer valor
+        self.hashes = np.empty(0, dtype='uint64')
+
+    def update(self, series):
+        values = series.dropna()
+        if values.empty:
+            return
+        self.count += len(values)
+
+        values = values.astype(str)
+        self.counts = self.counts.add(values.value_counts(), fill_value=0)
+        if len(self.counts) > self.capacity:
+            # Resumo Misra-Gries: desconta a (capacidade+1)-ésima contagem de todos
+            threshold = self.counts.nlargest(self.capacity + 1).iloc[-1]
+            self.counts = self.counts - threshold
+            self.counts = self.counts[self.counts > 0]
+            self.error += threshold
+
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+        if len(self.hashes) >= self.sketch_size:
+            hashes = hashes[hashes < self.hashes[-1]]
+        merged = np.unique(np.concatenate([self.hashes, hashes]))
+        self.hashes = merged[:self.sketch_size]
+
+    def distinct(self):
+        if len(self.hashes) < self.sketch_size:
+            return len(self.hashes)
+        # Estimador KMV: (k - 1) / (k-ésimo menor hash normalizado em [0, 1))
+        kth = float(self.hashes[self.sketch_size - 1]) / 2.0 ** 64
+        return int((self.sketch_size - 1) / kth)
+
+    def top(self):
+        top = self.counts.nlargest(self.top_k)
+        return {str(value): int(count) for value, count in top.items()}
+
+    def describe(self):
+        if self.count == 0:
+            return {"count": 0}
+        top = self.top()
+        first = next(iter(top.items()), (None, None))
+        return {
+            "count": self.count,
+            "unique": self.distinct(),
+            "top": first[0],
+            "freq": first[1],
+            "mais_frequentes": top,
+        }
+
+
+class _DateAccumulator:
+    """Contagem, mínimo e máximo de colunas de data."""
+
+    def __init__(self):
+        self.count = 0
+        self.min = None
+        self.max = None
+
+    def update(self, series):
+        values = series.dropna()
+        if values.empty:
+            return
+        self.count += len(values)
+        chunk_min, chunk_max = values.min(), values.max()
+        self.min = chunk_min if self.min is None else min(self.min, chunk_min)
+        self.max = chunk_max if self.max is None else max(self.max, chunk_max)
+
+    def describe(self):
+        return {"count": self.count, "min": _to_builtin(self.min), "max": _to_builtin(self.max)}
+
+
+class StreamingSummary:
+    """
+    Resumo estatístico construído bloco a bloco, com memória limitada.
+
+    Mantém os mesmos campos que DataFrameAnalyzer._generate_df_info produz
+    (colunas, dimensões, tipos, amostra e estatísticas descritivas), além de
+    uma amostra aleatória uniforme das linhas (reservatório).
+    """
+
+    def __init__(self, sample_size=None, quantile_sample_size=QUANTILE_SAMPLE_SIZE,
+                 top_k=TOP_K, random_state=42):
+        """
+        Inicializa o resumo.
+
+        Args:
+            sample_size (int, optional): Linhas mantidas no reservatório. Padrão vem da configuração.
+            quantile_sample_size (int): Valores mantidos por coluna numérica para os quantis
+            top_k (int): Quantidade de valores mais frequentes reportados
+            random_state (int): Semente do gerador aleatório
+        """
+        if sample_size is None:
+            sample_size = get_processing_config()["stream_sample_size"]
+        self.sample_size = sample_size
+        self.quantile_sample_size = quantile_sample_size
+        self.top_k = top_k
+        self.rng = np.random.default_rng(random_state)
+
+        self.rows = 0
+        self.chunks = 0
+        self.columns = []
+        self.dtypes = {}
+        self.head = None
+        self._accumulators = {}
+        self._sample = None
+        self._sample_keys = np.empty(0)
+
+    def _create_accumulator(self, series):
+        if ptypes.is_datetime64_any_dtype(series.dtype):
+            return _DateAccumulator()
+        if ptypes.is_numeric_dtype(series.dtype) and not ptypes.is_bool_dtype(series.dtype):
+            return _NumericAccumulator(self.rng, self.quantile_sample_size)
+        return _FrequencyAccumulator(self.top_k, DISTINCT_SKETCH_SIZE)
+
+    def _update_sample(self, chunk):
+        keys = self.rng.random(len(chunk))
+        if len(self._sample_keys) >= self.sample_size:
+            # Só linhas com chave menor que a maior do reservatório podem entrar
+            mask = keys < self._sample_keys.max()
+            chunk, keys = chunk[mask], keys[mask]
+            if chunk.empty:
+                return
+
+        frames = [chunk] if self._sample is None else [self._sample, chunk]
+        combined = pd.concat(frames, ignore_index=True)
+        all_keys = np.concatenate([self._sample_keys, keys])
+        if len(all_keys) > self.sample_size:
+            idx = np.argpartition(all_keys, self.sample_size - 1)[:self.sample_size]
+            combined = combined.iloc[idx].reset_index(drop=True)
+            all_keys = all_keys[idx]
+        self._sample, self._sample_keys = combined, all_keys
+
+    def update(self, chunk):
+        """
+        Incorpora um bloco de linhas ao resumo.
+
+        Args:
+            chunk (pandas.DataFrame): Bloco de linhas (mesmas colunas a cada chamada)
+        """
+        if self.head is None:
+            self.columns = list(chunk.columns)
+            self.dtypes = {col: str(dtype) for col, dtype in chunk.dtypes.items()}
+            self.head = chunk.head(5)
+            self._accumulators = {col: None for col in chunk.columns}
+
+        self.rows += len(chunk)
+        self.chunks += 1
+        for col, accumulator in self._accumulators.items():
+            if col not in chunk.columns:
+                continue
+            if accumulator is None:
+                # Coluna só com nulos até aqui (ex.: NULL nos primeiros lotes de uma consulta):
+                # o tipo é decidido no primeiro bloco com valores
+                if not chunk[col].notna().any():
+                    continue
+                accumulator = self._accumulators[col] = self._create_accumulator(chunk[col])
+                self.dtypes[col] = str(chunk[col].dtype)
+            accumulator.update(chunk[col])
+        self._update_sample(chunk)
+
+    def sample_frame(self):
+        """
+        Retorna a amostra aleatória uniforme das linhas lidas.
+
+        Returns:
+            pandas.DataFrame: Amostra (no máximo sample_size linhas)
+        """
+        if self._sample is None:
+            return pd.DataFrame(columns=self.columns)
+        return self._sample
+
+    def describe(self):
+        """
+        Retorna as estatísticas descritivas por coluna.
+
+        Returns:
+            dict: Mapeamento coluna -> estatísticas
+        """
+        return {
+            col: acc.describe() if acc is not None else {"count": 0}
+            for col, acc in self._accumulators.items()
+        }
+
+    def fingerprint(self):
+        """
+        Impressão digital do conteúdo lido: quantidade de linhas, tipos,
+        estatísticas (inclusive os sketches de distintos e de frequências) e
+        a amostra. Ler a mesma origem depois de uma alteração nos dados gera
+        outra impressão digital.
+
+        Returns:
+            str: Hash hexadecimal
+        """
+        hasher = hashlib.blake2b(digest_size=20)
+        state = {"linhas": self.rows, "colunas": self.columns, "tipos": self.dtypes, "descricao": self.describe()}
+        hasher.update(json.dumps(state, sort_keys=True, default=str).encode("utf-8"))
+        sample = self.sample_frame()
+        if len(sample):
+            hasher.update(pd.util.hash_pandas_object(sample, index=False).to_numpy().tobytes())
+        return hasher.hexdigest()
+
+    def to_df_info(self):
+        """
+        Gera o dicionário de contexto no mesmo formato de DataFrameAnalyzer.df_info.
+
+        Returns:
+            dict: Informações sobre os dados lidos em streaming
+        """
+        head = self.head if self.head is not None else pd.DataFrame(columns=self.columns)
+        return {
+            "colunas": self.columns,
+            "dimensoes": (self.rows, len(self.columns)),
+            "tipos_dados": self.dtypes,
+            "amostra": [
+                {col: _to_builtin(value) for col, value in record.items()}
+                for record in head.to_dict(orient="records")
+            ],
+            "descricao": self.describe(),
+            "nota": (
+                f"Dataset lido em streaming: {self.rows} linhas em {self.chunks} blocos. "
+                f"Quantis e valores frequentes são aproximados; o código gerado é executado "
+                f"sobre uma amostra aleatória de {len(self.sample_frame())} linhas."
+            ),
+        }
+
+
+def _coerce_to_schema(chunk, schema):
+    """Força cada coluna ao tipo decidido no primeiro bloco em que ela teve valores."""
+    for col, kind in schema.items():
+        if col not in chunk.columns:
+            continue
+        dtype = chunk[col].dtype
+        if kind == "numerico" and not ptypes.is_numeric_dtype(dtype):
+            chunk[col] = pd.to_numeric(chunk[col], errors='coerce')
+        elif kind == "data" and not ptypes.is_datetime64_any_dtype(dtype):
+            chunk[col] = pd.to_datetime(chunk[col], errors='coerce')
+    return chunk
+
+
+def iter_csv_chunks(file, chunksize=None, infer_types=True):
+    """
+    Lê um CSV em blocos, aplicando limpeza de colunas e conversão de tipos a cada bloco.
+
+    O tipo de cada coluna é decidido no primeiro bloco em que ela tem valores
+    e mantido nos seguintes (valores que não convertem viram nulos), para que
+    todos os blocos tenham o mesmo esquema. Uma coluna só com nulos no
+    primeiro bloco (lida como float64 pelo pandas) fica sem tipo até aparecerem
+    valores, em vez de ser fixada como numérica.
+
+    Args:
+        file: Objeto tipo arquivo contendo dados CSV
+        chunksize (int, optional): Linhas por bloco. Padrão vem da configuração.
+        infer_types (bool): Se True, aplica a inferência de tipos do process_csv
+
+    Yields:
+        pandas.DataFrame: Blocos de linhas já limpos
+    """
+    if chunksize is None:
+        chunksize = get_processing_config()["csv_chunk_size"]
+
+    encoding = detect_encoding(file)
+    reader = pd.read_csv(
+        file,
+        encoding=encoding,
+        on_bad_lines='warn',
+        chunksize=chunksize,
+    )
+
+    decisions = {}
+    schema = {}
+    decided = set()
+    with reader:
+        for chunk in reader:
+            chunk.columns = chunk.columns.astype(str).str.strip()
+            new = [col for col in chunk.columns if col not in decided and chunk[col].notna().any()]
+
+            if infer_types:
+                if new:
+                    decisions.update(infer_column_types(chunk[new]))
+                chunk = apply_column_types(chunk, decisions, strict=False)
+            chunk = _coerce_to_schema(chunk, schema)
+
+            for col in new:
+                dtype = chunk[col].dtype
+                if ptypes.is_datetime64_any_dtype(dtype):
+                    schema[col] = "data"
+                elif ptypes.is_numeric_dtype(dtype) and not ptypes.is_bool_dtype(dtype):
+                    schema[col] = "numerico"
+            decided.update(new)
+
+            yield chunk
+
+
+def summarize_csv(file, chunksize=None, sample_size=None, top_k=TOP_K):
+    """
+    Lê um CSV em streaming e constrói seu resumo estatístico sem carregá-lo inteiro.
+
+    Args:
+        file: Objeto tipo arquivo contendo dados CSV
+        chunksize (int, optional): Linhas por bloco. Padrão vem da configuração.
+        sample_size (int, optional): Linhas mantidas na amostra aleatória
+        top_k (int): Quantidade de valores mais frequentes reportados
+
+    Returns:
+        StreamingSummary: Resumo com estatísticas e amostra
+    """
+    try:
+        summary = StreamingSummary(sample_size=sample_size, top_k=top_k)
+        for chunk in iter_csv_chunks(file, chunksize=chunksize):
+            summary.update(chunk)
+        return summary
+
+    except Exception as e:
+        raise Exception(f"Erro ao processar arquivo CSV em streaming: {str(e)}")
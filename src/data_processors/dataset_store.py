@@ -0,0 +1,464 @@
+"""
+Catálogo persistente de datasets já ingeridos.
+
+Depois da primeira leitura de uma fonte (CSV, Excel, XML ou consulta SQL),
+o DataFrame é gravado em formato colunar com o schema inferido, e o catálogo
+(SQLite) guarda os metadados da origem: tamanho, data de modificação, hash
+do conteúdo, texto da consulta e opções do processador. Nas leituras
+seguintes, o arquivo Feather (Arrow IPC sem compressão) é mapeado em memória
+e entregue ao pandas com os mesmos tipos da primeira leitura (colunas
+numéricas sem cópia), então reabrir um dataset grande leva milissegundos em
+vez de uma nova interpretação do CSV.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import contextlib
+
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from config import get_dataset_store_config
+from instrumentation import span
+from analyzer_registry import tag_fingerprint
+
+FORMATS = ("feather", "parquet")
+
+
+def _digest(*parts):
+    hasher = hashlib.blake2b(digest_size=20)
+    for part in parts:
+        hasher.update(str(part).encode("utf-8"))
+        hasher.update(b"\x00")
+    return hasher.hexdigest()
+
+
+def _options_text(options):
+    """Serializa as opções do processador de forma estável (fazem parte da chave)."""
+    return json.dumps(options or {}, sort_keys=True, default=repr)
+
+
+def file_key(path, parser_name="", options=None):
+    """
+    Chave de um arquivo no disco a partir do caminho, tamanho e data de modificação
+    (sem ler o conteúdo).
+
+    Args:
+        path (str): Caminho do arquivo
+        parser_name (str): Nome do processador usado
+        options (dict, optional): Opções do processador
+
+    Returns:
+        str: Chave hexadecimal
+    """
+    stat = os.stat(path)
+    return _digest("arquivo", os.path.abspath(path), stat.st_size, stat.st_mtime_ns,
+                   parser_name, _options_text(options))
+
+
+def sql_key(host, user, database, query):
+    """
+    Chave do resultado de uma consulta SQL.
+
+    O usuário faz parte da chave: contas com permissões diferentes não
+    compartilham resultados.
+
+    Args:
+        host (str): Host do banco de dados
+        user (str): Usuário do banco de dados
+        database (str): Nome do banco de dados
+        query (str): Consulta SQL
+
+    Returns:
+        str: Chave hexadecimal
+    """
+    return _digest("sql", host, user, database, " ".join(query.split()))
+
+
+def hash_file(path, block_size=1 << 20):
+    """Hash do conteúdo de um arquivo no disco, lido em blocos."""
+    hasher = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+class DatasetStore:
+    """
+    Catálogo de datasets em disco: um arquivo colunar por dataset e uma
+    tabela SQLite com a origem, o schema e o uso de cada um.
+    """
+
+    def __init__(self, directory=None, file_format=None, sql_ttl_seconds=None, max_bytes=None):
+        """
+        Inicializa o catálogo.
+
+        Args:
+            directory (str, optional): Diretório dos arquivos e do catálogo. Padrão vem da configuração.
+            file_format (str, optional): 'feather' (mapeado em memória) ou 'parquet' (menor em disco)
+            sql_ttl_seconds (int, optional): Validade dos resultados de consultas SQL (0 não guarda)
+            max_bytes (int, optional): Espaço máximo em disco; os menos usados são removidos
+        """
+        config = get_dataset_store_config()
+        self.directory = directory or config["dir"]
+        self.file_format = (file_format or config["format"]).lower()
+        if self.file_format not in FORMATS:
+            raise ValueError(f"Formato inválido para o catálogo: {self.file_format} (use {', '.join(FORMATS)})")
+        self.sql_ttl_seconds = sql_ttl_seconds if sql_ttl_seconds is not None else config["sql_ttl_seconds"]
+        self.max_bytes = max_bytes if max_bytes is not None else config["max_bytes"]
+        self.path = os.path.join(self.directory, "catalogo.sqlite")
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS datasets (
+                    chave TEXT PRIMARY KEY,
+                    tipo TEXT NOT NULL,
+                    nome TEXT NOT NULL,
+                    processador TEXT,
+                    opcoes TEXT,
+                    hash_conteudo TEXT,
+                    tamanho_origem INTEGER,
+                    modificado_em REAL,
+                    consulta TEXT,
+                    arquivo TEXT NOT NULL,
+                    formato TEXT NOT NULL,
+                    linhas INTEGER NOT NULL,
+                    colunas INTEGER NOT NULL,
+                    schema TEXT NOT NULL,
+                    bytes INTEGER NOT NULL,
+                    criado_em REAL NOT NULL,
+                    acessado_em REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_datasets_acesso ON datasets (acessado_em)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Uma conexão por operação, como no cache de respostas: confirma (ou desfaz) e fecha ao sair."""
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _data_path(self, key, file_format):
+        return os.path.join(self.directory, f"{key}.{file_format}")
+
+    def _read(self, path, file_format):
+        """Lê o arquivo colunar; Feather sem compressão é mapeado em memória."""
+        if file_format == "feather":
+            table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        else:
+            table = pq.read_table(path, memory_map=True)
+        # Os metadados do pandas no schema restauram os tipos da primeira leitura (categorias,
+        # booleanos com nulos, tipos do Arrow); sem consolidar os blocos, as colunas numéricas
+        # sem nulos continuam apontando para o mapeamento
+        return table.to_pandas(split_blocks=True)
+
+    def get(self, key):
+        """
+        Carrega um dataset do catálogo.
+
+        Args:
+            key (str): Chave do dataset (file_key, sql_key ou hash do upload)
+
+        Returns:
+            pandas.DataFrame ou None: Dataset, ou None se não estiver no catálogo (ou expirou)
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT arquivo, formato, tipo, criado_em FROM datasets WHERE chave = ?", (key,)
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        filename, file_format, source_type, created_at = row
+        if source_type == "sql" and time.time() - created_at > self.sql_ttl_seconds:
+            # Resultados de consultas podem mudar no banco: vencida a validade, lê de novo
+            self.remove(key)
+            self.misses += 1
+            return None
+
+        try:
+            df = self._read(os.path.join(self.directory, filename), file_format)
+        except (OSError, pa.ArrowException) as e:
+            print(f"Dataset do catálogo ilegível ({key}): {e}")
+            self.remove(key)
+            self.misses += 1
+            return None
+
+        with self._connect() as conn:
+            conn.execute("UPDATE datasets SET acessado_em = ? WHERE chave = ?", (time.time(), key))
+        self.hits += 1
+        tag_fingerprint(df, key)
+        return df
+
+    def put(self, key, df, source_type, name, parser_name=None, options=None, content_hash=None,
+            source_size=None, modified_at=None, query=None):
+        """
+        Grava um dataset e seus metadados de origem.
+
+        Args:
+            key (str): Chave do dataset
+            df (pandas.DataFrame): Dados já processados
+            source_type (str): 'csv', 'excel', 'xml', 'sql' ou outro identificador da fonte
+            name (str): Nome do arquivo ou da consulta, para exibição
+            parser_name (str, optional): Processador que gerou os dados
+            options (dict, optional): Opções do processador
+            content_hash (str, optional): Hash do conteúdo de origem
+            source_size (int, optional): Tamanho da origem em bytes
+            modified_at (float, optional): Data de modificação da origem (timestamp)
+            query (str, optional): Texto da consulta SQL
+
+        Returns:
+            bool: True se o dataset foi gravado
+        """
+        if source_type == "sql" and self.sql_ttl_seconds <= 0:
+            return False
+
+        path = self._data_path(key, self.file_format)
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=None)
+        except (pa.ArrowException, TypeError, ValueError) as e:
+            # Colunas com tipos misturados (ex.: números e textos) não têm schema do Arrow
+            print(f"Dataset não gravado no catálogo ({name}): {e}")
+            return False
+
+        with self._lock:
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                if self.file_format == "feather":
+                    # Sem compressão, para que a leitura seja um mapeamento em memória
+                    feather.write_feather(table, tmp_path, compression="uncompressed")
+                else:
+                    pq.write_table(table, tmp_path)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"Dataset não gravado no catálogo ({name}): {e}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                return False
+
+            now = time.time()
+            schema = {field.name: str(field.type) for field in table.schema}
+            with self._connect() as conn:
+                conn.execute(
+                    """
+                    INSERT OR REPLACE INTO datasets (chave, tipo, nome, processador, opcoes, hash_conteudo,
+                        tamanho_origem, modificado_em, consulta, arquivo, formato, linhas, colunas, schema,
+                        bytes, criado_em, acessado_em)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        key, source_type, name, parser_name, _options_text(options), content_hash,
+                        source_size, modified_at, query, os.path.basename(path), self.file_format,
+                        table.num_rows, table.num_columns, json.dumps(schema, ensure_ascii=False),
+                        os.path.getsize(path), now, now,
+                    ),
+                )
+        self._enforce_limit()
+        return True
+
+    def _enforce_limit(self):
+        """Remove os datasets menos usados enquanto o catálogo passar do espaço máximo."""
+        if not self.max_bytes:
+            return
+        with self._connect() as conn:
+            rows = conn.execute("SELECT chave, bytes FROM datasets ORDER BY acessado_em DESC").fetchall()
+        total = 0
+        for index, (key, size) in enumerate(rows):
+            total += size
+            # O mais recente é sempre mantido
+            if index and total > self.max_bytes:
+                self.remove(key)
+
+    def get_or_ingest(self, key, loader, source_type, name, **metadata):
+        """
+        Retorna o dataset do catálogo ou executa a ingestão e o grava.
+
+        Args:
+            key (str): Chave do dataset
+            loader (callable): Função sem argumentos que retorna o DataFrame
+            source_type (str): Tipo da fonte
+            name (str): Nome para exibição
+            **metadata: Metadados de origem repassados a put
+
+        Returns:
+            pandas.DataFrame: Dataset
+        """
+        with span("catalogo_datasets", fonte=source_type) as current:
+            df = self.get(key)
+            current.set(acerto=df is not None)
+            if df is not None:
+                return df
+            df = loader()
+            tag_fingerprint(df, key)
+            self.put(key, df, source_type, name, **metadata)
+            return df
+
+    def remove(self, key):
+        """Remove um dataset do catálogo e seu arquivo."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT arquivo FROM datasets WHERE chave = ?", (key,)).fetchone()
+            conn.execute("DELETE FROM datasets WHERE chave = ?", (key,))
+        if row is not None:
+            try:
+                os.remove(os.path.join(self.directory, row[0]))
+            except OSError:
+                pass  # Já removido, ou ainda mapeado em memória (Windows)
+
+    def clear(self):
+        """
+        Remove todos os datasets do catálogo.
+
+        Returns:
+            int: Quantidade de datasets removidos
+        """
+        entries = self.entries()
+        for entry in entries:
+            self.remove(entry["chave"])
+        return len(entries)
+
+    def entries(self):
+        """
+        Lista os datasets do catálogo, do uso mais recente ao mais antigo.
+
+        Returns:
+            list: Um dicionário de metadados por dataset
+        """
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                """
+                SELECT chave, tipo, nome, processador, hash_conteudo, tamanho_origem, modificado_em,
+                    consulta, formato, linhas, colunas, schema, bytes, criado_em, acessado_em
+                FROM datasets ORDER BY acessado_em DESC
+                """
+            ).fetchall()
+        return [dict(row, schema=json.loads(row["schema"])) for row in rows]
+
+    def stats(self):
+        """
+        Retorna estatísticas de uso do catálogo.
+
+        Returns:
+            dict: Quantidade de datasets, espaço em disco e acertos
+        """
+        with self._connect() as conn:
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM datasets").fetchone()
+        return {
+            "datasets": count,
+            "bytes_em_disco": total,
+            "acertos": self.hits,
+            "falhas": self.misses,
+        }
+
+
+_dataset_store = None
+_dataset_store_lock = threading.Lock()
+
+
+def get_dataset_store():
+    """
+    Retorna o catálogo global, ou None se estiver desativado na configuração.
+
+    Returns:
+        DatasetStore ou None: Catálogo compartilhado
+    """
+    global _dataset_store
+    if not get_dataset_store_config()["enabled"]:
+        return None
+    with _dataset_store_lock:
+        if _dataset_store is None:
+            _dataset_store = DatasetStore()
+        return _dataset_store
+
+
+def load_file(path, loader, **options):
+    """
+    Lê um arquivo do disco pelo catálogo: se o caminho, o tamanho e a data de
+    modificação não mudaram, o dataset gravado é reaproveitado.
+
+    Args:
+        path (str): Caminho do arquivo
+        loader (callable): Processador chamado como loader(path, **options)
+        **options: Opções do processador (fazem parte da chave)
+
+    Returns:
+        pandas.DataFrame: Dataset
+    """
+    store = get_dataset_store()
+    if store is None:
+        return loader(path, **options)
+
+    parser_name = f"{loader.__module__}.{loader.__qualname__}"
+    key = file_key(path, parser_name, options)
+    df = store.get(key)
+    if df is not None:
+        return df
+
+    stat = os.stat(path)
+    df = loader(path, **options)
+    tag_fingerprint(df, key)
+    # O hash do conteúdo só é calculado na ingestão; a busca usa tamanho e data de modificação
+    store.put(
+        key, df,
+        source_type=os.path.splitext(path)[1].lstrip(".").lower() or "arquivo",
+        name=os.path.basename(path),
+        parser_name=parser_name,
+        options=options,
+        content_hash=hash_file(path),
+        source_size=stat.st_size,
+        modified_at=stat.st_mtime,
+    )
+    return df
+
+
+def load_sql(host, user, password, database, query, loader, refresh=False):
+    """
+    Executa uma consulta pelo catálogo: o resultado é reaproveitado enquanto
+    estiver dentro da validade configurada (DATASET_STORE_SQL_TTL).
+
+    Args:
+        host (str): Host do banco de dados
+        user (str): Usuário do banco de dados
+        password (str): Senha do banco de dados
+        database (str): Nome do banco de dados
+        query (str): Consulta SQL
+        loader (callable): Processador chamado como loader(host, user, password, database, query)
+        refresh (bool): Descarta o resultado guardado e executa a consulta de novo
+
+    Returns:
+        pandas.DataFrame: Resultado da consulta
+    """
+    store = get_dataset_store()
+    if store is None:
+        return loader(host, user, password, database, query)
+
+    key = sql_key(host, user, database, query)
+    if refresh:
+        store.remove(key)
+    return store.get_or_ingest(
+        key,
+        lambda: loader(host, user, password, database, query),
+        source_type="sql",
+        name=f"{database}@{host}",
+        parser_name=f"{loader.__module__}.{loader.__qualname__}",
+        query=query,
+    )
@@ -1,32 +1,365 @@
+"""
+Leitura de planilhas Excel em modo somente leitura.
+
+O motor preferido é o calamine (python-calamine, em Rust), bem mais rápido
+que o openpyxl; sem ele, o openpyxl é usado em modo read_only, que lê as
+linhas em streaming sem montar o modelo completo da planilha. Os dois
+motores entregam linhas de valores que passam uma única vez pelo mesmo
+construtor, que já descarta linhas e colunas vazias e monta as colunas.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from io import BytesIO
+from multiprocessing import get_context
+
 import pandas as pd
+import polars as pl
+
+from config import get_processing_config
+
+ENGINES = ("auto", "calamine", "openpyxl")
+
+# Abaixo desse tamanho, iniciar processos custa mais que ler as planilhas em sequência
+PARALLEL_MIN_BYTES = 1_000_000
+
+
+def calamine_available():
+    """Verifica se o python-calamine (dependência opcional) está instalado."""
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def resolve_engine(engine=None):
+    """
+    Escolhe o motor de leitura.
+
+    Args:
+        engine (str, optional): 'auto', 'calamine' ou 'openpyxl'. Padrão vem da configuração.
+
+    Returns:
+        str: 'calamine' ou 'openpyxl'
+    """
+    engine = (engine or get_processing_config()["excel_engine"]).lower()
+    if engine not in ENGINES:
+        raise ValueError(f"Motor de Excel inválido: {engine} (use {', '.join(ENGINES)})")
+    if engine == "auto":
+        return "calamine" if calamine_available() else "openpyxl"
+    if engine == "calamine" and not calamine_available():
+        raise ImportError("O motor 'calamine' requer o pacote python-calamine (pip install python-calamine)")
+    return engine
+
+
+def parse_cell_range(cell_range):
+    """
+    Converte um intervalo do Excel em limites de linhas e colunas (base 1).
+
+    Aceita 'B2:F1000', colunas inteiras ('B:F') ou linhas inteiras ('2:1000').
+    A primeira linha do intervalo é usada como cabeçalho.
+
+    Args:
+        cell_range (str): Intervalo no formato do Excel (vazio para a planilha toda)
+
+    Returns:
+        tuple: (min_row, max_row, min_col, max_col); None indica sem limite
+    """
+    if not cell_range:
+        return None, None, None, None
+    # O openpyxl só é importado quando necessário (com o calamine, quase nunca)
+    from openpyxl.utils.cell import range_boundaries
+    try:
+        min_col, min_row, max_col, max_row = range_boundaries(cell_range.strip().upper())
+    except ValueError:
+        raise ValueError(f"Intervalo de células inválido: {cell_range} (ex.: B2:F1000)")
+    return min_row, max_row, min_col, max_col
+
+
+def _read_bytes(file):
+    """Obtém os bytes da pasta de trabalho (caminho, upload do Streamlit ou arquivo aberto)."""
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as f:
+            return f.read()
+    if hasattr(file, 'getvalue'):
+        return file.getvalue()
+    file.seek(0)
+    return file.read()
+
+
+def _sheet_names(content, engine):
+    """Nomes das planilhas, na ordem da pasta de trabalho."""
+    if engine == "calamine":
+        from python_calamine import CalamineWorkbook
+        return list(CalamineWorkbook.from_filelike(BytesIO(content)).sheet_names)
+
+    from openpyxl import load_workbook
+    workbook = load_workbook(BytesIO(content), read_only=True, keep_links=False)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+def list_sheets(file, engine=None):
+    """
+    Lista as planilhas de uma pasta de trabalho sem ler as células.
+
+    Args:
+        file: Caminho ou objeto tipo arquivo contendo a pasta de trabalho
+        engine (str, optional): Motor de leitura
+
+    Returns:
+        list: Nomes das planilhas
+    """
+    return _sheet_names(_read_bytes(file), resolve_engine(engine))
+
+
+def _select_sheet(names, sheet_name):
+    """Resolve a planilha por nome ou posição."""
+    if isinstance(sheet_name, int):
+        if not -len(names) <= sheet_name < len(names):
+            raise ValueError(f"A pasta de trabalho tem {len(names)} planilha(s); posição {sheet_name} inválida")
+        return names[sheet_name]
+    if sheet_name not in names:
+        raise ValueError(f"Planilha não encontrada: {sheet_name} (disponíveis: {', '.join(names)})")
+    return sheet_name
+
+
+def _iter_rows_calamine(content, sheet_name, bounds):
+    """Linhas do intervalo lidas pelo calamine (a planilha é decodificada de uma vez, em Rust)."""
+    from python_calamine import CalamineWorkbook
+
+    workbook = CalamineWorkbook.from_filelike(BytesIO(content))
+    sheet = workbook.get_sheet_by_name(_select_sheet(workbook.sheet_names, sheet_name))
+    min_row, max_row, min_col, max_col = bounds
+
+    # skip_empty_area=False mantém as coordenadas a partir de A1, como no Excel
+    rows = sheet.to_python(skip_empty_area=False)
+    start = (min_row or 1) - 1
+    stop = max_row if max_row is not None else len(rows)
+    col_start = (min_col or 1) - 1
+    if col_start or max_col is not None:
+        for row in rows[start:stop]:
+            yield row[col_start:max_col]
+    else:
+        yield from rows[start:stop]
+
+
+def _iter_rows_openpyxl(content, sheet_name, bounds):
+    """Linhas do intervalo lidas em streaming pelo openpyxl em modo somente leitura."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(BytesIO(content), read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook[_select_sheet(workbook.sheetnames, sheet_name)]
+        min_row, max_row, min_col, max_col = bounds
+        if max_col is None:
+            # A dimensão gravada no arquivo nem sempre é confiável; lê até a última célula de cada linha
+            sheet.reset_dimensions()
+        yield from sheet.iter_rows(
+            min_row=min_row or 1, max_row=max_row, min_col=min_col or 1, max_col=max_col, values_only=True
+        )
+    finally:
+        workbook.close()
 
-def process_excel(file):
+
+def _column_names(header):
+    """Nomes das colunas a partir do cabeçalho (sem espaços nas pontas, vazios e repetidos numerados)."""
+    names, seen = [], {}
+    for i, value in enumerate(header):
+        name = str(value).strip() if value is not None else ""
+        name = name or f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _collect_columns(rows):
+    """
+    Percorre as linhas uma única vez: troca strings vazias por nulos, descarta
+    linhas vazias e registra quais colunas têm algum valor. Colunas sem nenhum
+    valor abaixo do cabeçalho são descartadas, mesmo que tenham cabeçalho.
+
+    Args:
+        rows: Iterável de sequências de valores; a primeira linha não vazia é o cabeçalho
+
+    Returns:
+        tuple: (nomes das colunas, lista de colunas com os valores)
+    """
+    header = None
+    data = []
+    width = 0
+    ragged = False
+    pending = set()  # Colunas ainda sem nenhum valor
+
+    for row in rows:
+        values = [None if value == "" else value for value in row]
+        if values.count(None) == len(values):
+            continue
+
+        if len(values) != width:
+            if header is not None:
+                ragged = True
+            if len(values) > width:
+                pending.update(range(width, len(values)))
+                width = len(values)
+
+        if header is None:
+            header = values
+            continue
+
+        data.append(values)
+        if pending:
+            pending.difference_update([i for i in pending if i < len(values) and values[i] is not None])
+
+    if header is None:
+        return [], []
+
+    if ragged or len(header) < width:
+        header = header + [None] * (width - len(header))
+        for values in data:
+            if len(values) < width:
+                values.extend([None] * (width - len(values)))
+
+    keep = [i for i in range(width) if i not in pending]
+    names = _column_names(header[i] for i in keep)
+    columns = list(zip(*data)) if data else [() for _ in range(width)]
+    del data
+    return names, [columns[i] for i in keep]
+
+
+def _read_sheet_columns(content, sheet_name, bounds, engine):
+    """Lê uma planilha e devolve (nomes, colunas)."""
+    reader = _iter_rows_calamine if engine == "calamine" else _iter_rows_openpyxl
+    return _collect_columns(reader(content, sheet_name, bounds))
+
+
+def _to_pandas(names, columns):
+    """
+    Monta o DataFrame pandas. Como no pd.read_excel, números inteiros (que o
+    calamine entrega como float) viram int64 e datas viram datetime64.
+    """
+    df = pd.DataFrame({name: column for name, column in zip(names, columns)}, columns=names)
+    for name in df.columns[df.dtypes == float]:
+        values = df[name]
+        if len(values) and values.notna().all() and (values % 1 == 0).all():
+            df[name] = values.astype('int64')
+    for name in df.columns[df.dtypes == object]:
+        first = df[name].first_valid_index()
+        if first is not None and isinstance(df[name][first], date) and not isinstance(df[name][first], datetime):
+            try:
+                df[name] = pd.to_datetime(df[name])
+            except (TypeError, ValueError):
+                pass  # Coluna com datas misturadas a outros valores: fica como objeto
+    return df
+
+
+def _read_sheet(content, sheet_name, bounds, engine):
+    """Lê uma planilha em DataFrame pandas (executado também nos processos auxiliares)."""
+    return _to_pandas(*_read_sheet_columns(content, sheet_name, bounds, engine))
+
+
+def process_excel_sheets(file, sheet_names=None, cell_range=None, engine=None, max_workers=None):
+    """
+    Lê várias planilhas, em paralelo quando vale a pena.
+
+    Cada planilha é lida em um processo separado (a decodificação é limitada
+    pela CPU e o GIL impediria ganho com threads); pastas de trabalho pequenas
+    ou com uma única planilha são lidas no próprio processo.
+
+    Args:
+        file: Caminho ou objeto tipo arquivo contendo a pasta de trabalho
+        sheet_names (list, optional): Planilhas (nomes ou posições). Todas se omitido.
+        cell_range (str, optional): Intervalo aplicado a todas as planilhas (ex.: 'A1:H5000')
+        engine (str, optional): 'auto', 'calamine' ou 'openpyxl'
+        max_workers (int, optional): Processos simultâneos. Padrão vem da configuração.
+
+    Returns:
+        dict: Nome da planilha -> pandas.DataFrame, na ordem pedida
+    """
+    engine = resolve_engine(engine)
+    content = _read_bytes(file)
+    bounds = parse_cell_range(cell_range)
+    names = _sheet_names(content, engine)
+    selected = [_select_sheet(names, sheet) for sheet in (sheet_names if sheet_names is not None else names)]
+
+    workers = min(
+        len(selected),
+        max_workers or get_processing_config()["excel_max_workers"],
+        os.cpu_count() or 1,
+    )
+    if workers <= 1 or len(content) < PARALLEL_MIN_BYTES:
+        return {sheet: _read_sheet(content, sheet, bounds, engine) for sheet in selected}
+
+    # spawn: o fork de um processo com threads (ex.: Streamlit) não é seguro
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as executor:
+        futures = {sheet: executor.submit(_read_sheet, content, sheet, bounds, engine) for sheet in selected}
+        return {sheet: future.result() for sheet, future in futures.items()}
+
+
+def process_excel(file, sheet_name=0, cell_range=None, engine=None):
     """
     Processa um arquivo Excel e retorna um DataFrame pandas.
-    
+
+    A primeira linha não vazia do intervalo vira o cabeçalho; strings vazias
+    viram nulos e linhas e colunas totalmente vazias são descartadas durante
+    a própria leitura, sem cópias extras do DataFrame.
+
     Args:
-        file: Objeto tipo arquivo contendo dados Excel
-        
+        file: Caminho ou objeto tipo arquivo contendo dados Excel
+        sheet_name (str ou int, optional): Planilha por nome ou posição (primeira por padrão).
+            None lê todas, em paralelo, empilhadas com a coluna 'planilha'.
+        cell_range (str, optional): Intervalo de células (ex.: 'B2:F1000')
+        engine (str, optional): 'auto', 'calamine' ou 'openpyxl'. Padrão vem da configuração.
+
     Returns:
         pandas.DataFrame: DataFrame contendo os dados do Excel
     """
     try:
-        # Lê o arquivo Excel para um DataFrame
-        # Usaremos a primeira planilha por padrão
-        df = pd.read_excel(file, engine='openpyxl')
-        
-        # Limpa os nomes das colunas (remove espaços em branco, converte para string)
-        df.columns = df.columns.astype(str).str.strip()
-        
-        # Limpeza básica de dados
-        # Substitui strings vazias por NaN
-        df = df.replace('', pd.NA)
-        
-        # Remove linhas e colunas completamente vazias
-        df = df.dropna(how='all')
-        df = df.dropna(axis=1, how='all')
-        
-        return df
-    
+        if sheet_name is None:
+            sheets = process_excel_sheets(file, cell_range=cell_range, engine=engine)
+            frames = [df.assign(planilha=name) for name, df in sheets.items() if len(df.columns)]
+            return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+        engine = resolve_engine(engine)
+        return _read_sheet(_read_bytes(file), sheet_name, parse_cell_range(cell_range), engine)
+
+    except (ValueError, ImportError):
+        raise
     except Exception as e:
-        raise Exception(f"Erro ao processar arquivo Excel: {e}")
\ No newline at end of file
+        raise Exception(f"Erro ao processar arquivo Excel: {e}")
+
+
+def read_excel_polars(file, sheet_name=0, cell_range=None, engine=None):
+    """
+    Lê uma planilha direto em um DataFrame do Polars (usado pelo caminho preguiçoso).
+
+    As colunas são montadas sem passar pelo pandas; colunas com tipos
+    misturados viram texto em vez de falhar na conversão.
+
+    Args:
+        file: Caminho ou objeto tipo arquivo contendo dados Excel
+        sheet_name (str ou int, optional): Planilha por nome ou posição
+        cell_range (str, optional): Intervalo de células (ex.: 'B2:F1000')
+        engine (str, optional): 'auto', 'calamine' ou 'openpyxl'
+
+    Returns:
+        polars.DataFrame: Dados da planilha
+    """
+    names, columns = _read_sheet_columns(
+        _read_bytes(file), sheet_name, parse_cell_range(cell_range), resolve_engine(engine)
+    )
+    series = []
+    for name, column in zip(names, columns):
+        try:
+            series.append(pl.Series(name, column, strict=False))
+        except (TypeError, pl.exceptions.PolarsError):
+            series.append(pl.Series(name, [None if v is None else str(v) for v in column], dtype=pl.String))
+    return pl.DataFrame(series)
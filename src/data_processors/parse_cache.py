@@ -0,0 +1,275 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from config import get_cache_config
+from instrumentation import span
+from analyzer_registry import tag_fingerprint
+from .dataset_store import get_dataset_store
+
+
+def hash_upload(file, parser_name="", options=None):
+    """
+    Calcula a chave de cache de um upload a partir do conteúdo e das opções.
+
+    Args:
+        file: Objeto tipo arquivo (UploadedFile do Streamlit ou similar)
+        parser_name (str): Nome do processador usado para interpretar o arquivo
+        options (dict, optional): Opções passadas ao processador
+
+    Returns:
+        str: Hash hexadecimal que identifica o conteúdo + opções
+    """
+    hasher = hashlib.blake2b(digest_size=20)
+
+    # UploadedFile já mantém os bytes em memória; evita uma cópia extra
+    if hasattr(file, "getvalue"):
+        hasher.update(file.getvalue())
+    else:
+        position = file.tell()
+        file.seek(0)
+        for block in iter(lambda: file.read(1 << 20), b""):
+            hasher.update(block if isinstance(block, bytes) else block.encode("utf-8"))
+        file.seek(position)
+
+    hasher.update(parser_name.encode("utf-8"))
+    for name, value in sorted((options or {}).items()):
+        hasher.update(f"{name}={value!r}".encode("utf-8"))
+
+    return hasher.hexdigest()
+
+
+def _dataframe_size(df):
+    """Estima o tamanho em memória de um DataFrame (em bytes)."""
+    try:
+        return int(df.memory_usage(deep=True).sum())
+    except Exception:
+        return int(df.memory_usage(deep=False).sum())
+
+
+class ParseCache:
+    """
+    Cache LRU de DataFrames já processados, com orçamento de memória e
+    transbordo opcional para Parquet em disco.
+    """
+
+    def __init__(self, max_bytes=None, spill_dir=None):
+        """
+        Inicializa o cache.
+
+        Args:
+            max_bytes (int, optional): Orçamento de memória em bytes. Padrão vem da configuração.
+            spill_dir (str, optional): Diretório para transbordo em Parquet. None desativa.
+        """
+        config = get_cache_config()
+        self.max_bytes = max_bytes if max_bytes is not None else config["max_bytes"]
+        self.spill_dir = spill_dir if spill_dir is not None else config["spill_dir"]
+
+        self._entries = OrderedDict()  # chave -> (DataFrame, tamanho)
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+
+    def _spill_path(self, key):
+        return os.path.join(self.spill_dir, f"{key}.parquet")
+
+    def _spill(self, key, df):
+        """Grava um DataFrame removido da memória em Parquet, se configurado."""
+        if not self.spill_dir:
+            return
+        path = self._spill_path(key)
+        if os.path.exists(path):
+            return
+        try:
+            df.to_parquet(path + ".tmp", index=True)
+            os.replace(path + ".tmp", path)
+        except Exception as e:
+            # Colunas com tipos mistos podem não ser serializáveis; apenas descarta
+            print(f"Não foi possível gravar o cache em disco ({key}): {e}")
+            if os.path.exists(path + ".tmp"):
+                os.remove(path + ".tmp")
+
+    def _load_spilled(self, key):
+        if not self.spill_dir:
+            return None
+        path = self._spill_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            df = pd.read_parquet(path)
+        except Exception:
+            return None
+        tag_fingerprint(df, key)
+        return df
+
+    def get(self, key):
+        """
+        Retorna o DataFrame associado à chave, ou None.
+
+        Args:
+            key (str): Chave calculada por hash_upload
+
+        Returns:
+            pandas.DataFrame ou None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        df = self._load_spilled(key)
+        if df is not None:
+            self.disk_hits += 1
+            self.put(key, df)
+            return df
+
+        self.misses += 1
+        return None
+
+    def put(self, key, df):
+        """
+        Armazena um DataFrame, removendo os menos usados se o orçamento for excedido.
+
+        Args:
+            key (str): Chave calculada por hash_upload
+            df (pandas.DataFrame): DataFrame processado
+        """
+        size = _dataframe_size(df)
+        evicted = []
+
+        with self._lock:
+            if key in self._entries:
+                self._current_bytes -= self._entries.pop(key)[1]
+
+            self._entries[key] = (df, size)
+            self._current_bytes += size
+
+            # Remove os itens menos recentes até caber no orçamento (mantém sempre o mais novo)
+            while self._current_bytes > self.max_bytes and len(self._entries) > 1:
+                old_key, (old_df, old_size) = self._entries.popitem(last=False)
+                self._current_bytes -= old_size
+                evicted.append((old_key, old_df))
+
+        for old_key, old_df in evicted:
+            self._spill(old_key, old_df)
+
+    def get_or_parse(self, file, parser, **options):
+        """
+        Retorna o DataFrame do cache ou processa o arquivo e o armazena.
+
+        Sem o DataFrame em memória, consulta o catálogo persistente de datasets
+        antes de processar; o resultado de um novo processamento é gravado nele.
+
+        Args:
+            file: Objeto tipo arquivo
+            parser: Função de processamento (ex.: process_csv)
+            **options: Opções repassadas ao processador (fazem parte da chave)
+
+        Returns:
+            pandas.DataFrame: DataFrame processado
+        """
+        parser_name = f"{parser.__module__}.{parser.__qualname__}"
+        key = hash_upload(file, parser_name, options)
+
+        df = self.get(key)
+        if df is not None:
+            return df
+
+        # Só as leituras fora da memória viram um trace (os reruns do Streamlit acertam a memória)
+        name = getattr(file, "name", "") or "upload"
+        with span("carregar_arquivo", arquivo=os.path.basename(name)) as current:
+            store = get_dataset_store()
+            if store is not None:
+                df = store.get(key)
+                if df is not None:
+                    current.set(origem="catalogo")
+                    self.put(key, df)
+                    return df
+
+            current.set(origem="leitura")
+            if hasattr(file, "seek"):
+                file.seek(0)
+            df = parser(file, **options)
+            # Guarda a impressão digital para reutilização por outras camadas
+            tag_fingerprint(df, key)
+            self.put(key, df)
+
+            if store is not None:
+                with span("catalogo_gravacao"):
+                    store.put(
+                        key, df,
+                        source_type=os.path.splitext(name)[1].lstrip(".").lower() or "upload",
+                        name=os.path.basename(name),
+                        parser_name=parser_name,
+                        options=options,
+                        content_hash=hash_upload(file),
+                        source_size=getattr(file, "size", None),
+                    )
+            return df
+
+    def clear(self):
+        """Esvazia o cache em memória (os arquivos em disco são mantidos)."""
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+
+    def stats(self):
+        """
+        Retorna estatísticas de uso do cache.
+
+        Returns:
+            dict: Contadores de acertos, falhas e ocupação
+        """
+        with self._lock:
+            return {
+                "entradas": len(self._entries),
+                "bytes_em_memoria": self._current_bytes,
+                "orcamento_bytes": self.max_bytes,
+                "acertos_memoria": self.hits,
+                "acertos_disco": self.disk_hits,
+                "falhas": self.misses,
+            }
+
+
+_parse_cache = None
+_parse_cache_lock = threading.Lock()
+
+
+def get_parse_cache():
+    """
+    Retorna a instância global do cache (sobrevive aos reruns do Streamlit,
+    pois o módulo só é importado uma vez por processo).
+
+    Returns:
+        ParseCache: Cache compartilhado
+    """
+    global _parse_cache
+    with _parse_cache_lock:
+        if _parse_cache is None:
+            _parse_cache = ParseCache()
+        return _parse_cache
+
+
+def cached_parse(file, parser, **options):
+    """
+    Processa um upload reaproveitando o resultado de execuções anteriores.
+
+    Args:
+        file: Objeto tipo arquivo
+        parser: Função de processamento (ex.: process_csv, process_excel, process_xml)
+        **options: Opções repassadas ao processador
+
+    Returns:
+        pandas.DataFrame: DataFrame processado
+    """
+    return get_parse_cache().get_or_parse(file, parser, **options)
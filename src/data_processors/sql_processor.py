@@ -1,62 +1,151 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from sqlalchemy.engine import Connection
+from config import get_processing_config
 from database import get_database_connection, get_sqlalchemy_engine
+from data_processors.csv_stream import StreamingSummary, TOP_K
+from instrumentation import span
+
+def _normalize_frame(chunk):
+    """Limpa nomes de colunas e troca strings vazias por nulos, só nas colunas de texto do lote."""
+    chunk.columns = chunk.columns.astype(str).str.strip()
+    for col in chunk.columns[chunk.dtypes == object]:
+        empty = chunk[col] == ""
+        if empty.any():
+            chunk[col] = chunk[col].mask(empty)
+    return chunk
+
+def normalize_batch(rows, columns):
+    """Monta um RecordBatch do Arrow coluna a coluna, trocando strings vazias por nulos."""
+    arrays = []
+    for values in zip(*rows) if rows else [[] for _ in columns]:
+        array = pa.array(values)
+        if pa.types.is_decimal(array.type):
+            # DECIMAL vira float, como no pd.read_sql
+            array = array.cast(pa.float64())
+        elif pa.types.is_string(array.type) or pa.types.is_large_string(array.type):
+            array = pc.if_else(pc.equal(array, ""), pa.scalar(None, array.type), array)
+        arrays.append(array)
+    return pa.RecordBatch.from_arrays(arrays, names=[str(col).strip() for col in columns])
+
+def iter_sql_batches(host, user, password, database, query, batch_size=None, as_arrow=False):
+    """
+    Executa uma consulta SQL com cursor no servidor e entrega o resultado em lotes.
+
+    As linhas são lidas do MySQL sob demanda (stream_results, que usa o
+    SSCursor do pymysql), então o resultado nunca fica inteiro na memória do
+    cliente. Strings vazias viram nulos em cada lote.
+
+    Args:
+        host (str): Host do banco de dados
+        user (str): Usuário do banco de dados
+        password (str): Senha do banco de dados
+        database (str): Nome do banco de dados
+        query (str): Consulta SQL a ser executada
+        batch_size (int, optional): Linhas por lote. Padrão vem da configuração.
+        as_arrow (bool): Entrega pyarrow.RecordBatch em vez de DataFrame
+
+    Yields:
+        pandas.DataFrame ou pyarrow.RecordBatch: Lote de linhas do resultado
+    """
+    batch_size = batch_size or get_processing_config()["sql_batch_size"]
+    engine = get_sqlalchemy_engine(host, user, password, database)
+
+    with engine.connect() as conn:
+        # SQL enviado como está ao driver: ':' e '%' em literais não são tratados como parâmetros
+        result = conn.execution_options(
+            stream_results=True, max_row_buffer=batch_size, no_parameters=True
+        ).exec_driver_sql(query)
+        columns = list(result.keys())
+        emitted = False
+        for rows in result.partitions(batch_size):
+            emitted = True
+            if as_arrow:
+                yield normalize_batch(rows, columns)
+            else:
+                # coerce_float converte DECIMAL em float, como o pd.read_sql
+                yield _normalize_frame(pd.DataFrame.from_records(rows, columns=columns, coerce_float=True))
+
+        # Consulta sem linhas: um lote vazio preserva as colunas
+        if not emitted:
+            yield normalize_batch([], columns) if as_arrow else _normalize_frame(pd.DataFrame(columns=columns))
 
 def process_sql(host, user, password, database, query):
     """
     Processa uma consulta SQL e retorna um DataFrame pandas.
-    
+
     Args:
         host (str): Host do banco de dados
         user (str): Usuário do banco de dados
         password (str): Senha do banco de dados
         database (str): Nome do banco de dados
         query (str): Consulta SQL a ser executada
-        
+
     Returns:
         pandas.DataFrame: DataFrame contendo os resultados da consulta
     """
     try:
-        # Cria o motor SQLAlchemy
-        engine = get_sqlalchemy_engine(host, user, password, database)
-        
-        # Executa a consulta usando pandas read_sql
-        df = pd.read_sql(query, engine)
-        
-        # Limpa os nomes das colunas
-        df.columns = df.columns.astype(str).str.strip()
-        
-        # Limpeza básica de dados
-        df = df.replace('', pd.NA)
-        
-        return df
-    
+        with span("consulta_sql", banco=database) as current:
+            # Lê em lotes do Arrow (já limpos) e converte para pandas uma única vez.
+            # Uma coluna só com NULL em um lote tem tipo nulo; a promoção unifica os tipos entre lotes.
+            tables = [
+                pa.Table.from_batches([batch])
+                for batch in iter_sql_batches(host, user, password, database, query, as_arrow=True)
+            ]
+            table = pa.concat_tables(tables, promote_options="permissive")
+            current.set(linhas=table.num_rows, lotes=len(tables))
+
+            return table.to_pandas(types_mapper=pd.ArrowDtype)
+
     except Exception as e:
         raise Exception(f"Erro ao executar consulta SQL: {e}")
 
+def summarize_sql(host, user, password, database, query, batch_size=None, sample_size=None, top_k=TOP_K):
+    """
+    Lê o resultado de uma consulta SQL em streaming e constrói seu resumo
+    estatístico sem carregá-lo inteiro.
+
+    Args:
+        host (str): Host do banco de dados
+        user (str): Usuário do banco de dados
+        password (str): Senha do banco de dados
+        database (str): Nome do banco de dados
+        query (str): Consulta SQL a ser executada
+        batch_size (int, optional): Linhas por lote. Padrão vem da configuração.
+        sample_size (int, optional): Linhas mantidas na amostra aleatória
+        top_k (int): Quantidade de valores mais frequentes reportados
+
+    Returns:
+        StreamingSummary: Resumo com estatísticas e amostra
+    """
+    try:
+        summary = StreamingSummary(sample_size=sample_size, top_k=top_k)
+        for chunk in iter_sql_batches(host, user, password, database, query, batch_size=batch_size):
+            summary.update(chunk)
+        return summary
+
+    except Exception as e:
+        raise Exception(f"Erro ao processar consulta SQL em streaming: {e}")
+
 def process_sql_with_connection(connection, query):
     """
     Process a SQL query using an existing connection and return a pandas DataFrame.
-    
+
     Args:
         connection: Database connection object
         query (str): SQL query to execute
-        
+
     Returns:
         pandas.DataFrame: DataFrame containing the query results
     """
     try:
         # Execute query using pandas read_sql
         df = pd.read_sql(query, connection)
-        
-        # Clean column names
-        df.columns = df.columns.astype(str).str.strip()
-        
-        # Basic data cleaning
-        df = df.replace('', pd.NA)
-        
-        return df
-    
+
+        # Clean column names and empty strings (only text columns are touched)
+        return _normalize_frame(df)
+
     except Exception as e:
         # Re-raise with more context
-        raise Exception(f"Error executing SQL query: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Error executing SQL query: {str(e)}")
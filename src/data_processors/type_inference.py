@@ -0,0 +1,212 @@
+import io
+import csv
+
+import pandas as pd
+from pandas.api import types as ptypes
+
+# Quantidade de linhas amostradas para decidir o tipo de cada coluna
+DEFAULT_SAMPLE_SIZE = 1000
+
+# Valores aceitos como booleanos (comparados em minúsculas, sem espaços)
+BOOLEAN_VALUES = {
+    "true": True, "false": False,
+    "verdadeiro": True, "falso": False,
+    "sim": True, "não": False, "nao": False,
+    "yes": True, "no": False,
+}
+
+# Formatos de data testados, na ordem de preferência (dia antes do mês, padrão brasileiro)
+DATE_FORMATS = [
+    "ISO8601",
+    "%d/%m/%Y",
+    "%d/%m/%Y %H:%M",
+    "%d/%m/%Y %H:%M:%S",
+    "%d-%m-%Y",
+    "%d.%m.%Y",
+    "%m/%d/%Y",
+    "%Y/%m/%d",
+]
+
+# Pré-filtro barato antes de tentar os formatos de data
+_DATE_PATTERN = r"\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}([ T]\d{1,2}:\d{2}(:\d{2}(\.\d+)?)?)?(Z|[+-]\d{2}:?\d{2})?"
+
+# Número no formato brasileiro: milhar com ponto (opcional) e decimal com vírgula
+_BR_DECIMAL_PATTERN = r"[+-]?(\d{1,3}(\.\d{3})+|\d+)(,\d+)?"
+_BR_THOUSANDS_PATTERN = r"\d\.\d{3}"
+
+# Limite de valores distintos (relativo à amostra) para considerar uma coluna categórica
+CATEGORICAL_MAX_RATIO = 0.05
+CATEGORICAL_MIN_ROWS = 50
+
+
+def _to_br_decimal(series, has_thousands):
+    """
+    Converte texto no formato '1.234,56' para float.
+
+    Os valores são reunidos em um único texto e lidos pelo parser em C do
+    pandas (decimal=','), o que evita operações de string por célula. Se o
+    texto não puder ser lido assim, recorre às operações de string.
+    """
+    text = series.astype(str)
+    try:
+        parsed = pd.read_csv(
+            io.StringIO("\n".join(text.tolist())),
+            header=None,
+            sep="\x01",
+            quoting=csv.QUOTE_NONE,
+            skip_blank_lines=False,
+            decimal=",",
+            thousands="." if has_thousands else None,
+        ).iloc[:, 0]
+        if len(parsed) == len(series) and ptypes.is_numeric_dtype(parsed):
+            parsed.index = series.index
+            return parsed.astype("float64")
+    except Exception:
+        pass
+
+    if has_thousands:
+        text = text.str.replace(".", "", regex=False)
+    return pd.to_numeric(text.str.replace(",", ".", regex=False), errors="coerce")
+
+
+def _detect_column(sample):
+    """
+    Decide o tipo de uma coluna textual a partir de uma amostra sem nulos.
+
+    Args:
+        sample (pandas.Series): Amostra de valores não nulos (dtype object/string)
+
+    Returns:
+        dict: Decisão com a chave 'tipo' e parâmetros de conversão
+    """
+    text = sample.astype(str).str.strip()
+    text = text[text != ""]
+    if text.empty:
+        return {"tipo": "texto"}
+
+    lowered = text.str.lower()
+    if lowered.isin(BOOLEAN_VALUES.keys()).all():
+        return {"tipo": "booleano"}
+
+    if pd.to_numeric(text, errors="coerce").notna().all():
+        return {"tipo": "numerico"}
+
+    if text.str.contains(",", regex=False).any() and text.str.fullmatch(_BR_DECIMAL_PATTERN).all():
+        return {
+            "tipo": "decimal_br",
+            "milhar": bool(text.str.contains(_BR_THOUSANDS_PATTERN).any()),
+        }
+
+    if text.str.fullmatch(_DATE_PATTERN).all():
+        for fmt in DATE_FORMATS:
+            parsed = pd.to_datetime(text, format=fmt, errors="coerce")
+            if parsed.notna().all():
+                return {"tipo": "data", "formato": fmt}
+
+    n_unique = text.nunique()
+    if len(text) >= CATEGORICAL_MIN_ROWS and n_unique <= max(2, CATEGORICAL_MAX_RATIO * len(text)):
+        return {"tipo": "categorico"}
+
+    return {"tipo": "texto"}
+
+
+def _convert_column(series, decision):
+    """Aplica a decisão de tipo a uma coluna completa."""
+    tipo = decision["tipo"]
+    if tipo == "numerico":
+        return pd.to_numeric(series, errors="coerce")
+    if tipo == "decimal_br":
+        return _to_br_decimal(series, decision.get("milhar", False))
+    if tipo == "data":
+        return pd.to_datetime(series, format=decision["formato"], errors="coerce")
+    if tipo == "booleano":
+        return series.astype(str).str.strip().str.lower().map(BOOLEAN_VALUES).astype("boolean")
+    if tipo == "categorico":
+        return series.astype("category")
+    return series
+
+
+def infer_column_types(df, sample_size=DEFAULT_SAMPLE_SIZE, random_state=42):
+    """
+    Decide o tipo de cada coluna a partir de uma amostra das linhas.
+
+    Colunas que o pandas já leu com tipo numérico, booleano ou de data são
+    mantidas; apenas colunas textuais são analisadas.
+
+    Args:
+        df (pandas.DataFrame): DataFrame recém-lido
+        sample_size (int): Número de linhas amostradas
+        random_state (int): Semente da amostragem
+
+    Returns:
+        dict: Mapeamento coluna -> decisão ({'tipo': ..., 'converter': bool, ...})
+    """
+    if len(df) > sample_size:
+        # Uma única amostragem de linhas serve para todas as colunas
+        sample_df = df.sample(n=sample_size, random_state=random_state)
+    else:
+        sample_df = df
+
+    decisions = {}
+    for col in df.columns:
+        dtype = df[col].dtype
+        if ptypes.is_bool_dtype(dtype):
+            decisions[col] = {"tipo": "booleano", "converter": False}
+        elif ptypes.is_numeric_dtype(dtype):
+            decisions[col] = {"tipo": "numerico", "converter": False}
+        elif ptypes.is_datetime64_any_dtype(dtype):
+            decisions[col] = {"tipo": "data", "converter": False}
+        elif isinstance(dtype, pd.CategoricalDtype):
+            decisions[col] = {"tipo": "categorico", "converter": False}
+        else:
+            decision = _detect_column(sample_df[col].dropna())
+            decision["converter"] = decision["tipo"] != "texto"
+            decisions[col] = decision
+
+    return decisions
+
+
+def apply_column_types(df, decisions, strict=True):
+    """
+    Converte, em uma única atribuição, as colunas cuja decisão pede conversão.
+    O DataFrame recebido é alterado no lugar (evita copiar as demais colunas).
+
+    No modo estrito, uma conversão só é aceita se não criar novos nulos na
+    coluna completa; caso contrário a coluna volta a ser tratada como texto
+    (a amostra não representava todos os valores). Fora do modo estrito os
+    valores inválidos viram nulos, o que mantém os tipos estáveis entre
+    blocos de uma leitura em streaming.
+
+    Args:
+        df (pandas.DataFrame): DataFrame a converter
+        decisions (dict): Resultado de infer_column_types
+        strict (bool): Se True, desfaz conversões que perderiam valores
+
+    Returns:
+        pandas.DataFrame: DataFrame com as colunas convertidas
+    """
+    converted = {}
+    for col, decision in decisions.items():
+        if not decision.get("converter") or col not in df.columns:
+            continue
+
+        original = df[col]
+        new_values = _convert_column(original, decision)
+
+        # Só examina valores em branco quando a contagem de nulos mudou
+        lost = strict and new_values.isna().sum() > original.isna().sum()
+        if lost:
+            blank = original.isna() | original.astype(str).str.strip().eq("")
+            lost = (new_values.isna() & ~blank).any()
+        if lost:
+            decision["converter"] = False
+            decision["tipo"] = "texto"
+            decision["motivo"] = "valores fora da amostra não puderam ser convertidos"
+            continue
+
+        converted[col] = new_values
+
+    if converted:
+        df[list(converted)] = pd.DataFrame(converted, index=df.index)
+
+    return df
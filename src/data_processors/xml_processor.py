@@ -1,88 +1,232 @@
 import pandas as pd
-import xml.etree.ElementTree as ET
-from io import BytesIO
+from collections import Counter
+from functools import lru_cache
+from lxml import etree
 
-def process_xml(file):
+from .columnar import ColumnarBuilder
+
+# Elementos lidos do início do arquivo para detectar o caminho dos registros
+DETECT_ELEMENTS = 10_000
+
+
+@lru_cache(maxsize=4096)
+def _local_name(tag):
+    """Remove o namespace de uma tag ('{ns}nome' -> 'nome')."""
+    if not isinstance(tag, str):
+        return None  # Comentários e instruções de processamento
+    return tag.rsplit('}', 1)[-1]
+
+
+def _iterparse(source, **kwargs):
+    """iterparse do lxml sem resolução de entidades externas e sem limite de profundidade."""
+    return etree.iterparse(source, huge_tree=True, resolve_entities=False, no_network=True, **kwargs)
+
+
+def detect_record_path(file, max_elements=DETECT_ELEMENTS):
+    """
+    Detecta o caminho dos elementos que representam os registros.
+
+    Lê apenas o início do arquivo e escolhe o caminho (da raiz até a tag)
+    mais frequente entre os elementos que têm filhos; se nenhum caminho com
+    filhos se repete, usa o caminho mais frequente de elementos folha.
+
+    Args:
+        file: Objeto tipo arquivo (posicionável) contendo dados XML
+        max_elements (int): Quantidade máxima de elementos analisados
+
+    Returns:
+        tuple: Caminho de nomes locais, da raiz até a tag dos registros
+    """
+    start = file.tell()
+    containers, leaves = Counter(), Counter()
+    path = []
+    seen = 0
+    try:
+        for event, elem in _iterparse(file, events=('start', 'end')):
+            if event == 'start':
+                path.append(_local_name(elem.tag))
+                continue
+
+            key = tuple(path)
+            if len(elem):
+                containers[key] += 1
+            else:
+                leaves[key] += 1
+            path.pop()
+
+            # Libera o que já foi contado
+            if len(path) > 1:
+                elem.clear()
+            seen += 1
+            if seen >= max_elements:
+                break
+    except etree.XMLSyntaxError:
+        # Arquivo truncado na amostra ou malformado: usa o que foi lido
+        if not containers and not leaves:
+            raise
+    finally:
+        file.seek(start)
+
+    repeated = [(count, -len(key), key) for key, count in containers.items() if count >= 2]
+    if repeated:
+        return max(repeated)[2]
+    if leaves:
+        return max((count, -len(key), key) for key, count in leaves.items())[2]
+    if containers:
+        # Documento com um único elemento com filhos (a raiz): cada filho é um registro
+        root = min(containers, key=len)
+        return root + ('*',)
+    raise ValueError("Nenhum elemento encontrado no XML")
+
+
+def _normalize_record_path(record_path):
+    """Converte 'a/b/c' ou uma sequência de tags em tupla de nomes locais."""
+    if isinstance(record_path, str):
+        record_path = [part for part in record_path.strip('/').split('/') if part]
+    return tuple(_local_name(part) for part in record_path)
+
+
+def _path_matches(elem, record_path):
+    """Verifica se os ancestrais do elemento terminam com o caminho informado."""
+    node = elem
+    for name in reversed(record_path):
+        if node is None or (name != '*' and _local_name(node.tag) != name):
+            return False
+        node = node.getparent()
+    return True
+
+
+@lru_cache(maxsize=4096)
+def _column_name(prefix, tag):
+    """Nome da coluna de uma tag dentro de um pai ('pai_filho'), memorizado por tag."""
+    name = _local_name(tag)
+    return f"{prefix}_{name}" if prefix else name
+
+
+def _flatten_children(elem, prefix, emit):
+    """
+    Envia texto e atributos dos descendentes, com nomes 'pai_filho'.
+
+    Returns:
+        bool: True se algum valor foi enviado
+    """
+    emitted = False
+    for child in elem:
+        tag = child.tag
+        if not isinstance(tag, str):
+            continue  # Comentários e instruções de processamento
+        column = _column_name(prefix, tag)
+        if child.attrib:
+            for attr, value in child.attrib.items():
+                emit(_column_name(column, attr), value)
+                emitted = True
+        if len(child):
+            emitted = _flatten_children(child, column, emit) or emitted
+        else:
+            text = child.text
+            if text and not text.isspace():
+                emit(column, text.strip())
+                emitted = True
+    return emitted
+
+
+def _emit_record(record, emit):
+    """
+    Envia os valores de um registro (texto próprio, atributos e filhos
+    achatados) para emit(coluna, valor).
+
+    Returns:
+        bool: True se o registro tinha algum valor
+    """
+    tag = _local_name(record.tag)
+    emitted = False
+    text = record.text
+    if text and not text.isspace():
+        emit(tag, text.strip())
+        emitted = True
+    for attr, value in record.attrib.items():
+        emit(_column_name(tag, attr), value)
+        emitted = True
+    return _flatten_children(record, '', emit) or emitted
+
+
+def _iter_record_elements(file, record_path=None):
+    """
+    Percorre os elementos de registro em streaming. Cada elemento é
+    liberado (junto com os irmãos já lidos) quando o próximo é pedido.
+    """
+    if record_path is None:
+        record_path = detect_record_path(file)
+    record_path = _normalize_record_path(record_path)
+
+    tag = None if record_path[-1] == '*' else f"{{*}}{record_path[-1]}"
+    for _, elem in _iterparse(file, events=('end',), tag=tag):
+        if not _path_matches(elem, record_path):
+            continue
+
+        yield elem
+
+        # Libera o registro e os irmãos já processados
+        elem.clear(keep_tail=False)
+        parent = elem.getparent()
+        if parent is not None:
+            while elem.getprevious() is not None:
+                del parent[0]
+
+
+def iter_xml_records(file, record_path=None):
+    """
+    Percorre os registros de um XML em streaming, liberando cada elemento
+    depois de lido (memória constante, independente do tamanho do arquivo).
+
+    Args:
+        file: Objeto tipo arquivo contendo dados XML
+        record_path (str ou sequência, optional): Caminho dos registros ('raiz/registro'
+            ou só 'registro'). Detectado automaticamente se omitido.
+
+    Yields:
+        dict: Valores de cada registro (strings vazias omitidas)
+    """
+    for elem in _iter_record_elements(file, record_path):
+        row = {}
+        if _emit_record(elem, row.__setitem__):
+            yield row
+
+
+def process_xml(file, record_path=None):
     """
     Processa um arquivo XML e retorna um DataFrame pandas.
-    
+
+    O arquivo é lido em streaming (iterparse do lxml) e os valores de cada
+    registro vão direto para os buffers por coluna do ColumnarBuilder, sem
+    dicionários intermediários; o DataFrame é montado uma única vez ao final,
+    com colunas de texto do Arrow.
+
     Args:
         file: Objeto tipo arquivo contendo dados XML
-        
+        record_path (str, optional): Caminho dos elementos de registro ('raiz/registro'
+            ou só 'registro'). Detectado automaticamente se omitido.
+
     Returns:
         pandas.DataFrame: DataFrame contendo os dados do XML
     """
     try:
-        # Lê o conteúdo do arquivo
-        content = file.read()
-        
-        # Analisa o XML
-        root = ET.parse(BytesIO(content)).getroot()
-        
-        # Extrai dados do XML
-        # Esta é uma implementação simples que assume uma estrutura plana
-        # Para XML mais complexos, isso precisaria ser personalizado
-        data = []
-        
-        # Encontra todos os registros (assumindo um pai comum para itens de dados)
-        # Esta é uma abordagem simplificada - a implementação real dependeria da estrutura XML
-        records = root.findall('.//*')
-        
-        if not records:
-            # Se nenhum registro for encontrado com a abordagem acima, tenta filhos diretos
-            records = list(root)
-        
-        # Se temos registros, processa-os
-        if records:
-            # Obtém todas as tags únicas para usar como colunas
-            all_tags = set()
-            for record in records:
-                # Adiciona a tag do próprio registro
-                all_tags.add(record.tag)
-                # Adiciona tags de todos os filhos
-                for child in record:
-                    all_tags.add(child.tag)
-            
-            # Processa cada registro
-            for record in records:
-                row = {}
-                # Adiciona o texto do registro, se houver
-                if record.text and record.text.strip():
-                    row[record.tag] = record.text.strip()
-                
-                # Adiciona todos os dados dos filhos
-                for child in record:
-                    # Usa a tag como nome da coluna
-                    tag = child.tag
-                    # Usa o texto como valor, ou string vazia se None
-                    value = child.text.strip() if child.text else ''
-                    # Adiciona à linha
-                    row[tag] = value
-                
-                # Adiciona atributos, se houver
-                for attr, value in record.attrib.items():
-                    row[f"{record.tag}_{attr}"] = value
-                
-                # Adiciona apenas linhas não vazias
-                if row:
-                    data.append(row)
-        
-        # Cria DataFrame
-        if data:
-            df = pd.DataFrame(data)
-            
+        builder = ColumnarBuilder()
+        for elem in _iter_record_elements(file, record_path):
+            if _emit_record(elem, builder.set):
+                builder.end_row()
+
+        if builder.rows:
+            df = builder.to_pandas()
+
             # Limpa os nomes das colunas
             df.columns = df.columns.astype(str).str.strip()
-            
-            # Limpeza básica de dados
-            df = df.replace('', pd.NA)
-            df = df.dropna(how='all')
-            
+
             return df
         else:
             # Se nenhum dado estruturado for encontrado, retorna DataFrame vazio com uma mensagem
             return pd.DataFrame({'mensagem': ['Nenhum dado estruturado encontrado no XML']})
-    
+
     except Exception as e:
         # Re-levanta com mais contexto
-        raise Exception(f"Erro ao processar arquivo XML: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Erro ao processar arquivo XML: {str(e)}")
@@ -1,106 +1,200 @@
 import os
+import time
+import hashlib
+import threading
 import pymysql
 import pandas as pd
 from sqlalchemy import create_engine
+from sqlalchemy.engine import URL
+from sqlalchemy.pool import QueuePool
 from dotenv import load_dotenv
 
+from config import get_database_pool_config
+
 # Carrega variáveis de ambiente
 load_dotenv()
 
+# Motores SQLAlchemy mantidos vivos entre consultas (e reruns do Streamlit), um por conjunto de credenciais
+_engines = {}
+_engines_lock = threading.Lock()
+
+class _TimedQueuePool(QueuePool):
+    """QueuePool que mede quanto tempo cada retirada de conexão esperou."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._stats_lock = threading.Lock()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+def _resolve_credentials(host, user, password, database):
+    """Completa as credenciais com as variáveis de ambiente e valida."""
+    # Usa as credenciais fornecidas ou recorre às variáveis de ambiente
+    host = host or os.getenv("DB_HOST", "localhost")
+    user = user or os.getenv("DB_USER")
+    password = password or os.getenv("DB_PASSWORD")
+    database = database or os.getenv("DB_NAME")
+
+    # Verifica se as credenciais necessárias estão disponíveis
+    if not all([user, password, database]):
+        raise ValueError("Credenciais de banco de dados ausentes. Por favor, forneça-as ou defina variáveis de ambiente.")
+
+    return host, user, password, database
+
+def _engine_key(host, user, password, database):
+    # A senha entra na chave apenas como hash
+    password_hash = hashlib.blake2b(password.encode("utf-8"), digest_size=16).hexdigest()
+    return (host, user, password_hash, database)
+
 def get_database_connection(host=None, user=None, password=None, database=None):
     """
     Obtém uma conexão com o banco de dados usando as credenciais fornecidas ou variáveis de ambiente.
-    
+
+    A conexão vem do pool do motor SQLAlchemy compartilhado; chamar close()
+    a devolve ao pool em vez de fechá-la. Para linhas como dicionários, use
+    connection.cursor(pymysql.cursors.DictCursor).
+
     Args:
         host (str, optional): Host do banco de dados. Padrão é None (usa variável de ambiente).
         user (str, optional): Usuário do banco de dados. Padrão é None (usa variável de ambiente).
         password (str, optional): Senha do banco de dados. Padrão é None (usa variável de ambiente).
         database (str, optional): Nome do banco de dados. Padrão é None (usa variável de ambiente).
-        
+
     Returns:
-        pymysql.Connection: Objeto de conexão com o banco de dados
+        Conexão DBAPI (pymysql) do pool
     """
-    # Usa as credenciais fornecidas ou recorre às variáveis de ambiente
-    host = host or os.getenv("DB_HOST", "localhost")
-    user = user or os.getenv("DB_USER")
-    password = password or os.getenv("DB_PASSWORD")
-    database = database or os.getenv("DB_NAME")
-    
-    # Verifica se as credenciais necessárias estão disponíveis
-    if not all([user, password, database]):
-        raise ValueError("Credenciais de banco de dados ausentes. Por favor, forneça-as ou defina variáveis de ambiente.")
-    
-    # Cria conexão
-    connection = pymysql.connect(
-        host=host,
-        user=user,
-        password=password,
-        database=database,
-        cursorclass=pymysql.cursors.DictCursor
-    )
-    
-    return connection
+    return get_sqlalchemy_engine(host, user, password, database).raw_connection()
 
 def get_sqlalchemy_engine(host=None, user=None, password=None, database=None):
     """
     Obtém um motor SQLAlchemy usando as credenciais fornecidas ou variáveis de ambiente.
-    
+
+    O motor é criado uma única vez por conjunto de credenciais e reaproveitado
+    nas chamadas seguintes, mantendo o pool de conexões aberto. O tamanho do
+    pool, o pre-ping e a reciclagem vêm de get_database_pool_config().
+
     Args:
         host (str, optional): Host do banco de dados. Padrão é None (usa variável de ambiente).
         user (str, optional): Usuário do banco de dados. Padrão é None (usa variável de ambiente).
         password (str, optional): Senha do banco de dados. Padrão é None (usa variável de ambiente).
         database (str, optional): Nome do banco de dados. Padrão é None (usa variável de ambiente).
-        
+
     Returns:
         sqlalchemy.engine.Engine: Motor SQLAlchemy para o banco de dados
     """
-    # Usa as credenciais fornecidas ou recorre às variáveis de ambiente
-    host = host or os.getenv("DB_HOST", "localhost")
-    user = user or os.getenv("DB_USER")
-    password = password or os.getenv("DB_PASSWORD")
-    database = database or os.getenv("DB_NAME")
-    
-    # Verifica se as credenciais necessárias estão disponíveis
-    if not all([user, password, database]):
-        raise ValueError("Credenciais de banco de dados ausentes. Por favor, forneça-as ou defina variáveis de ambiente.")
-    
-    # Cria string de conexão
-    connection_string = f"mysql+pymysql://{user}:{password}@{host}/{database}"
-    
-    # Cria e retorna o motor
-    return create_engine(connection_string)
+    host, user, password, database = _resolve_credentials(host, user, password, database)
+    key = _engine_key(host, user, password, database)
+
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            config = get_database_pool_config()
+
+            # Monta a URL com escape de caracteres especiais na senha
+            url = URL.create("mysql+pymysql", username=user, password=password, host=host, database=database)
+            engine = create_engine(
+                url,
+                poolclass=_TimedQueuePool,
+                pool_size=config["pool_size"],
+                max_overflow=config["max_overflow"],
+                pool_timeout=config["timeout"],
+                pool_recycle=config["recycle"],
+                pool_pre_ping=config["pre_ping"],
+            )
+            _engines[key] = engine
+
+        return engine
+
+def dispose_engines():
+    """
+    Fecha as conexões de todos os motores e esvazia o registro.
+
+    Returns:
+        int: Quantidade de motores descartados
+    """
+    with _engines_lock:
+        engines = list(_engines.values())
+        _engines.clear()
+
+    for engine in engines:
+        engine.dispose()
+    return len(engines)
+
+def get_pool_stats():
+    """
+    Retorna as estatísticas dos pools de conexões ativos.
+
+    Returns:
+        list: Um dicionário por motor com host, banco, tamanho do pool, conexões
+              em uso, conexões livres, overflow, retiradas e tempos de espera
+    """
+    with _engines_lock:
+        engines = list(_engines.values())
+
+    stats = []
+    for engine in engines:
+        pool = engine.pool
+        checkouts = getattr(pool, "checkouts", 0)
+        wait_total = getattr(pool, "wait_total", 0.0)
+        stats.append({
+            "host": engine.url.host,
+            "banco": engine.url.database,
+            "tamanho_pool": pool.size(),
+            "em_uso": pool.checkedout(),
+            "livres": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "retiradas": checkouts,
+            "espera_media_ms": 1000 * wait_total / checkouts if checkouts else 0.0,
+            "espera_maxima_ms": 1000 * getattr(pool, "wait_max", 0.0),
+        })
+    return stats
 
 def execute_query(query, connection=None, **connection_params):
     """
     Execute a SQL query and return the results as a pandas DataFrame.
-    
+
     Args:
         query (str): SQL query to execute.
-        connection (pymysql.Connection, optional): Existing database connection. 
-                                                 Defaults to None (creates a new connection).
+        connection (pymysql.Connection, optional): Existing database connection.
+                                                 Defaults to None (takes a connection from the pool).
         **connection_params: Additional parameters to pass to get_database_connection.
-        
+
     Returns:
         pandas.DataFrame: Query results as a DataFrame
     """
-    # Create a new connection if one wasn't provided
+    # Take a pooled connection if one wasn't provided
     close_connection = False
     if connection is None:
         connection = get_database_connection(**connection_params)
         close_connection = True
-    
+
     try:
         # Execute query and fetch results
-        with connection.cursor() as cursor:
+        cursor = connection.cursor(pymysql.cursors.DictCursor)
+        try:
             cursor.execute(query)
             results = cursor.fetchall()
-        
+        finally:
+            cursor.close()
+
         # Convert results to DataFrame
         df = pd.DataFrame(results)
-        
+
         return df
-    
+
     finally:
-        # Close the connection if we created it
+        # Return the connection to the pool if we took it
         if close_connection:
-            connection.close()
\ No newline at end of file
+            connection.close()
@@ -0,0 +1,542 @@
+"""
+Instrumentação do pipeline: etapas cronometradas (spans), tokens do LLM e
+pico de memória de cada requisição.
+
+Cada requisição (carregar um arquivo, responder uma pergunta) vira um
+trace com uma árvore de spans (leitura, perfil, serialização do contexto,
+chamada ao LLM, execução de cada bloco de código). O trace e o span atuais
+ficam em contextvars, então as camadas não precisam repassar nada entre
+si: span() abre um filho do span atual, ou um novo trace se não houver
+nenhum ativo. Os traces concluídos ficam em memória para o painel de
+depuração e podem ser exportados em JSON lines e em um arquivo texto no
+formato do Prometheus (para o textfile collector do node_exporter).
+"""
+
+import os
+import json
+import time
+import uuid
+import itertools
+import threading
+import contextvars
+from collections import deque, defaultdict
+from contextlib import contextmanager
+
+from config import get_instrumentation_config
+
+_current_trace = contextvars.ContextVar("instrumentation_trace", default=None)
+_current_span = contextvars.ContextVar("instrumentation_span", default=None)
+_span_ids = itertools.count(1)
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+def current_rss():
+    """
+    Memória residente do processo em bytes (lida de /proc; 0 se indisponível).
+
+    Returns:
+        int: Bytes residentes
+    """
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class Span:
+    """
+    Etapa cronometrada de uma requisição.
+    """
+
+    __slots__ = ("id", "parent_id", "depth", "name", "offset", "duration", "attributes", "_start")
+
+    def __init__(self, name, parent=None, offset=0.0, attributes=None):
+        self.id = next(_span_ids)
+        self.parent_id = parent.id if parent is not None else None
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.name = name
+        self.offset = offset  # Segundos desde o início do trace
+        self.duration = None
+        self.attributes = dict(attributes or {})
+        self._start = time.perf_counter()
+
+    def set(self, **attributes):
+        """Acrescenta atributos ao span (ex.: linhas lidas, acerto de cache)."""
+        self.attributes.update(attributes)
+
+    def add(self, name, amount):
+        """Soma um valor a um atributo numérico (ex.: tokens de várias chamadas)."""
+        self.attributes[name] = self.attributes.get(name, 0) + amount
+
+    def to_dict(self):
+        """Representação serializável em JSON."""
+        return {
+            "id": self.id,
+            "pai": self.parent_id,
+            "profundidade": self.depth,
+            "nome": self.name,
+            "inicio_ms": round(self.offset * 1000, 3),
+            "duracao_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "atributos": {key: _json_value(value) for key, value in self.attributes.items()},
+        }
+
+
+class _NullSpan:
+    """Span usado quando a instrumentação está desativada: descarta tudo."""
+
+    def set(self, **attributes):
+        pass
+
+    def add(self, name, amount):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    """
+    Uma requisição instrumentada: spans, tokens por modelo e memória.
+    """
+
+    def __init__(self, name, attributes=None):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self.root = Span(name, attributes=attributes)
+        self.spans = [self.root]
+        # modelo -> {"prompt", "completion", "cache" (tokens do prompt lidos do cache do provedor), "chamadas", "estimado"}
+        self.tokens = {}
+        self.rss_start = current_rss()
+        self.rss_peak = self.rss_start
+        self.rss_end = None
+        self.duration = None
+        self.error = None
+
+    def _start_span(self, name, parent, attributes):
+        span = Span(name, parent, time.perf_counter() - self._start, attributes)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def add_span(self, name, duration, parent=None, **attributes):
+        """
+        Registra uma etapa medida em outro lugar (ex.: um bloco de código
+        executado em outro processo), terminando agora.
+
+        Args:
+            name (str): Nome da etapa
+            duration (float): Duração em segundos
+            parent (Span, optional): Span pai. Padrão: raiz do trace.
+            **attributes: Atributos da etapa
+
+        Returns:
+            Span: Span registrado
+        """
+        span = self._start_span(name, parent or self.root, attributes)
+        span.offset = max(0.0, span.offset - duration)
+        span.duration = duration
+        return span
+
+    def add_tokens(self, model, prompt_tokens, completion_tokens, estimated=False, cached_tokens=0):
+        """Soma os tokens de uma chamada ao LLM."""
+        with self._lock:
+            usage = self.tokens.setdefault(
+                model, {"prompt": 0, "completion": 0, "cache": 0, "chamadas": 0, "estimado": False}
+            )
+            usage["prompt"] += prompt_tokens
+            usage["completion"] += completion_tokens
+            usage["cache"] += cached_tokens
+            usage["chamadas"] += 1
+            usage["estimado"] = usage["estimado"] or estimated
+
+    def sample_memory(self, rss=None):
+        """Atualiza o pico de memória residente."""
+        rss = current_rss() if rss is None else rss
+        if rss > self.rss_peak:
+            self.rss_peak = rss
+
+    def prompt_tokens(self):
+        return sum(usage["prompt"] for usage in self.tokens.values())
+
+    def completion_tokens(self):
+        return sum(usage["completion"] for usage in self.tokens.values())
+
+    def cached_tokens(self):
+        return sum(usage["cache"] for usage in self.tokens.values())
+
+    def to_dict(self):
+        """Representação serializável em JSON (uma linha do arquivo JSON lines)."""
+        with self._lock:
+            spans = [span.to_dict() for span in _tree_order(self.spans)]
+            tokens = {model: dict(usage) for model, usage in self.tokens.items()}
+        return {
+            "trace": self.id,
+            "nome": self.name,
+            "inicio": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+            "duracao_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "erro": self.error,
+            "tokens": tokens,
+            "memoria": {
+                "rss_inicio_mb": round(self.rss_start / 1e6, 1),
+                "rss_pico_mb": round(self.rss_peak / 1e6, 1),
+                "rss_fim_mb": round(self.rss_end / 1e6, 1) if self.rss_end is not None else None,
+            },
+            "spans": spans,
+        }
+
+
+def _tree_order(spans):
+    """Ordena os spans em pré-ordem (cada pai seguido dos filhos, por início)."""
+    children = defaultdict(list)
+    for span in spans:
+        children[span.parent_id].append(span)
+    ordered = []
+    stack = sorted(children[None], key=lambda span: span.offset, reverse=True)
+    while stack:
+        span = stack.pop()
+        ordered.append(span)
+        stack.extend(sorted(children[span.id], key=lambda child: child.offset, reverse=True))
+    return ordered
+
+
+def _json_value(value):
+    """Converte atributos em tipos serializáveis em JSON."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, dict):
+        return {str(key): _json_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_value(item) for item in value]
+    return str(value)
+
+
+def _label(value):
+    """Escapa o valor de um rótulo do Prometheus."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class TraceRecorder:
+    """
+    Guarda os traces recentes, acumula os totais exportados ao Prometheus e
+    amostra a memória residente enquanto há requisições em andamento.
+    """
+
+    def __init__(self, max_traces=None, jsonl_path=None, prometheus_path=None, sample_interval=None):
+        """
+        Args:
+            max_traces (int, optional): Traces mantidos em memória. Padrão vem da configuração.
+            jsonl_path (str, optional): Arquivo JSON lines (um trace por linha); vazio não grava.
+            prometheus_path (str, optional): Arquivo texto do Prometheus; vazio não grava.
+            sample_interval (float, optional): Intervalo da amostragem de memória, em segundos.
+        """
+        config = get_instrumentation_config()
+        self.traces = deque(maxlen=max_traces or config["max_traces"])
+        self.jsonl_path = config["jsonl_path"] if jsonl_path is None else jsonl_path
+        self.prometheus_path = config["prometheus_path"] if prometheus_path is None else prometheus_path
+        self.sample_interval = sample_interval or config["sample_ms"] / 1000
+        self._lock = threading.Lock()
+        self._active = set()
+        self._sampler = None
+        self._wake = threading.Event()
+        # Totais desde o início do processo
+        self._requests = defaultdict(lambda: [0, 0.0])  # nome -> [quantidade, segundos]
+        self._stages = defaultdict(lambda: [0, 0.0])  # etapa -> [quantidade, segundos]
+        self._tokens = defaultdict(int)  # (modelo, tipo, estimado) -> tokens
+        self._peak = {}  # nome -> pico de memória da última requisição
+        self._errors = defaultdict(int)
+
+    def _sample(self):
+        """Thread de amostragem: lê a memória residente enquanto há traces ativos."""
+        while True:
+            self._wake.wait()
+            with self._lock:
+                active = list(self._active)
+                if not active:
+                    self._wake.clear()
+                    continue
+            rss = current_rss()
+            for trace in active:
+                trace.sample_memory(rss)
+            time.sleep(self.sample_interval)
+
+    def start(self, trace):
+        """Passa a amostrar a memória de um trace em andamento."""
+        with self._lock:
+            self._active.add(trace)
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample, name="instrumentation-rss", daemon=True)
+                self._sampler.start()
+        self._wake.set()
+
+    def finish(self, trace):
+        """Guarda um trace concluído, atualiza os totais e grava as exportações configuradas."""
+        trace.sample_memory()
+        trace.rss_end = current_rss()
+        with self._lock:
+            self._active.discard(trace)
+            self.traces.append(trace)
+            request = self._requests[trace.name]
+            request[0] += 1
+            request[1] += trace.duration
+            if trace.error:
+                self._errors[trace.name] += 1
+            for span in trace.spans[1:]:
+                if span.duration is not None:
+                    stage = self._stages[span.name]
+                    stage[0] += 1
+                    stage[1] += span.duration
+            for model, usage in trace.tokens.items():
+                estimated = "true" if usage["estimado"] else "false"
+                self._tokens[(model, "prompt", estimated)] += usage["prompt"]
+                self._tokens[(model, "completion", estimated)] += usage["completion"]
+                self._tokens[(model, "prompt_cache", estimated)] += usage["cache"]
+            self._peak[trace.name] = trace.rss_peak
+
+        try:
+            if self.jsonl_path:
+                self._append_jsonl(trace)
+            if self.prometheus_path:
+                self.write_prometheus(self.prometheus_path)
+        except OSError as e:
+            print(f"Não foi possível exportar o trace {trace.id}: {e}")
+
+    def _append_jsonl(self, trace):
+        line = json.dumps(trace.to_dict(), ensure_ascii=False)
+        directory = os.path.dirname(self.jsonl_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.jsonl_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def recent(self, limit=None):
+        """
+        Traces concluídos, do mais recente para o mais antigo.
+
+        Args:
+            limit (int, optional): Quantidade máxima
+
+        Returns:
+            list: Traces
+        """
+        with self._lock:
+            traces = list(reversed(self.traces))
+        return traces[:limit] if limit else traces
+
+    def to_jsonl(self):
+        """Traces em memória no formato JSON lines (do mais antigo para o mais recente)."""
+        with self._lock:
+            traces = list(self.traces)
+        return "".join(json.dumps(trace.to_dict(), ensure_ascii=False) + "\n" for trace in traces)
+
+    def prometheus_text(self):
+        """
+        Totais no formato texto do Prometheus.
+
+        Returns:
+            str: Métricas de requisições, etapas, tokens e pico de memória
+        """
+        with self._lock:
+            requests = {name: tuple(values) for name, values in self._requests.items()}
+            stages = {name: tuple(values) for name, values in self._stages.items()}
+            tokens = dict(self._tokens)
+            peaks = dict(self._peak)
+            errors = dict(self._errors)
+
+        lines = [
+            "# HELP analise_dados_requisicao_segundos Duração das requisições instrumentadas.",
+            "# TYPE analise_dados_requisicao_segundos summary",
+        ]
+        for name, (count, seconds) in sorted(requests.items()):
+            lines.append(f'analise_dados_requisicao_segundos_sum{{requisicao="{_label(name)}"}} {seconds:.6f}')
+            lines.append(f'analise_dados_requisicao_segundos_count{{requisicao="{_label(name)}"}} {count}')
+        lines += [
+            "# HELP analise_dados_requisicao_erros_total Requisições que terminaram com exceção.",
+            "# TYPE analise_dados_requisicao_erros_total counter",
+        ]
+        for name, count in sorted(errors.items()):
+            lines.append(f'analise_dados_requisicao_erros_total{{requisicao="{_label(name)}"}} {count}')
+        lines += [
+            "# HELP analise_dados_etapa_segundos Duração de cada etapa do pipeline.",
+            "# TYPE analise_dados_etapa_segundos summary",
+        ]
+        for name, (count, seconds) in sorted(stages.items()):
+            lines.append(f'analise_dados_etapa_segundos_sum{{etapa="{_label(name)}"}} {seconds:.6f}')
+            lines.append(f'analise_dados_etapa_segundos_count{{etapa="{_label(name)}"}} {count}')
+        lines += [
+            "# HELP analise_dados_tokens_total Tokens enviados (prompt, dos quais prompt_cache lidos do cache "
+            "de prompt do provedor) e recebidos (completion) do LLM.",
+            "# TYPE analise_dados_tokens_total counter",
+        ]
+        for (model, kind, estimated), count in sorted(tokens.items()):
+            lines.append(
+                f'analise_dados_tokens_total{{modelo="{_label(model)}",tipo="{kind}",estimado="{estimated}"}} {count}'
+            )
+        lines += [
+            "# HELP analise_dados_memoria_pico_bytes Pico de memória residente da última requisição.",
+            "# TYPE analise_dados_memoria_pico_bytes gauge",
+        ]
+        for name, peak in sorted(peaks.items()):
+            lines.append(f'analise_dados_memoria_pico_bytes{{requisicao="{_label(name)}"}} {peak}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Grava as métricas de forma atômica (o coletor nunca lê um arquivo pela metade)."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(temporary, path)
+
+    def clear(self):
+        """Descarta os traces em memória (os totais do Prometheus são mantidos)."""
+        with self._lock:
+            self.traces.clear()
+
+    def stats(self):
+        """
+        Resumo dos traces em memória.
+
+        Returns:
+            dict: Quantidade de traces, tokens acumulados e a proporção dos
+                tokens de prompt lidos do cache do provedor
+        """
+        with self._lock:
+            traces = list(self.traces)
+        prompt = sum(trace.prompt_tokens() for trace in traces)
+        cached = sum(trace.cached_tokens() for trace in traces)
+        return {
+            "traces": len(traces),
+            "tokens_prompt": prompt,
+            "tokens_completion": sum(trace.completion_tokens() for trace in traces),
+            "tokens_cache": cached,
+            "proporcao_cache": cached / prompt if prompt else 0.0,
+        }
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder():
+    """
+    Retorna o gravador de traces do processo (None se a instrumentação estiver desativada).
+
+    Returns:
+        TraceRecorder ou None
+    """
+    global _recorder
+    if not get_instrumentation_config()["enabled"]:
+        return None
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = TraceRecorder()
+        return _recorder
+
+
+def _reset(variable, token):
+    # Um gerador abandonado pode ser finalizado em outro contexto: o valor já não importa
+    try:
+        variable.reset(token)
+    except ValueError:
+        pass
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Cronometra uma etapa. Dentro de um trace, vira filho do span atual;
+    fora de qualquer trace, inicia um trace (uma requisição) com esse nome.
+
+    Args:
+        name (str): Nome da etapa (ex.: 'leitura', 'perfil', 'llm')
+        **attributes: Atributos iniciais da etapa
+
+    Yields:
+        Span: Span em andamento (set() acrescenta atributos)
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        recorder = get_recorder()
+        if recorder is None:
+            yield _NULL_SPAN
+            return
+        trace = Trace(name, attributes)
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(trace.root)
+        recorder.start(trace)
+        try:
+            yield trace.root
+        except BaseException as e:
+            trace.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            trace.duration = trace.root.duration = time.perf_counter() - trace._start
+            _reset(_current_span, span_token)
+            _reset(_current_trace, trace_token)
+            recorder.finish(trace)
+        return
+
+    current = trace._start_span(name, _current_span.get() or trace.root, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.set(erro=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        current.duration = time.perf_counter() - current._start
+        _reset(_current_span, token)
+
+
+def current_span():
+    """Span em andamento no contexto atual (um span nulo se não houver trace)."""
+    if _current_trace.get() is None:
+        return _NULL_SPAN
+    return _current_span.get()
+
+
+def record_span(name, duration, **attributes):
+    """
+    Registra, como filho do span atual, uma etapa já medida (ex.: um bloco
+    de código que rodou em outra thread ou processo). Sem trace ativo, não faz nada.
+
+    Args:
+        name (str): Nome da etapa
+        duration (float): Duração em segundos
+        **attributes: Atributos da etapa
+    """
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(name, duration, _current_span.get(), **attributes)
+
+
+def record_tokens(model, prompt_tokens, completion_tokens, estimated=False, cached_tokens=0):
+    """
+    Soma os tokens de uma chamada ao LLM ao trace e ao span atuais.
+
+    Args:
+        model (str): Nome do modelo
+        prompt_tokens (int): Tokens enviados
+        completion_tokens (int): Tokens gerados
+        estimated (bool): Se as contagens são estimadas (o provedor não as informou)
+        cached_tokens (int): Tokens do prompt lidos do cache de prompt do provedor
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    trace.add_tokens(model, prompt_tokens, completion_tokens, estimated, cached_tokens)
+    current = _current_span.get()
+    if current is not None:
+        current.add("tokens_prompt", prompt_tokens)
+        current.add("tokens_completion", completion_tokens)
+        current.add("tokens_cache", cached_tokens)
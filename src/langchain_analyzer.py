@@ -1,17 +1,20 @@
-import os
 import pandas as pd
-from typing import Union, Dict, Any
+from typing import Union, Dict, Any, Iterator, List, Tuple
 import json
-import matplotlib.pyplot as plt
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_core.documents import Document
-from langchain.chains import create_extraction_chain
-from langchain.output_parsers.json import SimpleJsonOutputParser
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.output_parsers import StrOutputParser, JsonOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.exceptions import OutputParserException
 
 # Importar os system prompts
-from prompts.system_prompts import get_system_prompt
+from prompts.system_prompts import get_system_prompt, get_prompt_layers
+from context_builder import build_llm_context, serialize_context
+from column_profiler import profile_dataframe, format_timings
+from response_cache import get_model_name
+from code_executor import get_code_executor, execute_code, open_session, CodeRunResult
+from instrumentation import span, record_span
 
 class DataFrameAnalyzer:
     """
@@ -30,6 +33,10 @@ class DataFrameAnalyzer:
         self.llm = llm
         self.df = None
         self.df_info = None
+        self.df_info_json = None
+        self.profile_timings = None  # Tempos por etapa do perfil das colunas
+        self.fingerprint = None
+        self.response_cache = None
         self.output_format = output_format
         self.system_prompt = get_system_prompt(output_format)
     
@@ -58,8 +65,36 @@ class DataFrameAnalyzer:
             print(f"Dataset grande com {len(df)} linhas. Criando resumos estatísticos.")
             
         # Gerar informações sobre o DataFrame
-        self._generate_df_info()
-    
+        with span("carregar_dataset", linhas=len(df), colunas=df.shape[1]):
+            self._generate_df_info()
+            self._preload_dataset()
+
+    def load_summary(self, summary):
+        """
+        Carrega um resumo construído em streaming (ex.: summarize_csv).
+
+        O contexto do LLM vem das estatísticas acumuladas sobre o arquivo
+        inteiro; o código gerado é executado sobre a amostra aleatória.
+
+        Args:
+            summary: StreamingSummary com as estatísticas e a amostra
+        """
+        with span("carregar_resumo", linhas=summary.rows):
+            self.df = summary.sample_frame()
+            self.df_info = summary.to_df_info()
+            with span("serializacao") as current:
+                self.df_info_json = serialize_context(self.df_info)
+                current.set(caracteres=len(self.df_info_json))
+            self._preload_dataset()
+
+    def _preload_dataset(self):
+        """Abre o dataset nos processos de execução em segundo plano, antes da primeira pergunta."""
+        executor = get_code_executor()
+        if executor is not None:
+            from analyzer_registry import dataset_fingerprint
+            with span("preload"):
+                executor.preload(self.df, dataset_fingerprint(self.df))
+
     def _generate_df_info(self):
         """Gera informações sobre o DataFrame para contextualizar o LLM."""
         if self.df is None:
@@ -86,22 +121,20 @@ class DataFrameAnalyzer:
                 "amostra": sample_data,
             }
             
-            # Tenta incluir estatísticas descritivas, com tratamento para tipos não numéricos
+            # Estatísticas de todas as colunas em uma passada vetorizada (Polars/Arrow), já serializáveis
             try:
-                desc_df = self.df.describe(include='all')
-                info["descricao"] = {col: {idx: json_serializable(val) 
-                                        for idx, val in desc_df[col].items()}
-                                    for col in desc_df.columns}
+                with span("perfil") as current:
+                    info["descricao"], self.profile_timings = profile_dataframe(self.df)
+                    current.set(**{f"{stage}_ms": round(seconds * 1000, 1)
+                                   for stage, seconds in self.profile_timings.items()})
+                if len(self.df) > 10000:
+                    print(f"Perfil das colunas: {format_timings(self.profile_timings)}")
             except Exception as e:
                 info["descricao"] = f"Não foi possível gerar estatísticas descritivas: {str(e)}"
             
-            # Para datasets grandes, adicionar informações de amostragem
-            if len(self.df) > 10000:
-                info["nota"] = f"Dataset grande com {len(self.df)} linhas. Usando amostragem para análise."
-                sample_random = self.df.sample(n=min(1000, len(self.df)), random_state=42)
-                info["amostra_aleatoria"] = sample_random.applymap(json_serializable).to_dict(orient="records")
-            
-            self.df_info = info
+            # Seleciona perfis, exemplos estratificados e linhas atípicas dentro do orçamento de tokens
+            with span("contexto"):
+                self.df_info = build_llm_context(self.df, info)
             
         except Exception as e:
             # Fallback para caso ainda haja problemas
@@ -111,6 +144,133 @@ class DataFrameAnalyzer:
                 "dimensoes": self.df.shape,
                 "tipos_dados": {col: str(dtype) for col, dtype in self.df.dtypes.items()},
             }
+        
+        # Serializa uma única vez; cada pergunta reutiliza o mesmo texto
+        with span("serializacao") as current:
+            self.df_info_json = serialize_context(self.df_info)
+            current.set(caracteres=len(self.df_info_json))
+    
+    def _cached_response(self, output_format: str, query: str, compute) -> str:
+        """
+        Retorna a resposta do cache de respostas ou chama o LLM e a guarda.
+        
+        Args:
+            output_format: Formato de saída (parte da chave do cache)
+            query: Pergunta do usuário
+            compute: Função sem argumentos que chama o LLM
+            
+        Returns:
+            Texto da resposta do LLM
+        """
+        if self.response_cache is None:
+            with span("llm", formato=output_format):
+                return compute()
+        
+        if self.fingerprint is None:
+            from analyzer_registry import dataset_fingerprint
+            self.fingerprint = dataset_fingerprint(self.df)
+        
+        key = (self.fingerprint, output_format, self.system_prompt, get_model_name(self.llm), query)
+        with span("cache_respostas") as current:
+            cached = self.response_cache.get(*key)
+            current.set(acerto=cached is not None)
+        if cached is not None:
+            return cached
+        
+        with span("llm", formato=output_format):
+            response = compute()
+        self.response_cache.put(*key, response)
+        return response
+    
+    def _stream_cached_response(self, output_format: str, query: str, stream):
+        """
+        Versão em streaming de _cached_response: repassa os pedaços do LLM
+        e guarda a resposta completa no cache ao final.
+        
+        Args:
+            output_format: Formato de saída (parte da chave do cache)
+            query: Pergunta do usuário
+            stream: Função sem argumentos que retorna um iterador de pedaços de texto
+            
+        Yields:
+            Pedaços de texto da resposta
+        """
+        if self.response_cache is None:
+            yield from self._timed_stream(output_format, stream)
+            return
+        
+        if self.fingerprint is None:
+            from analyzer_registry import dataset_fingerprint
+            self.fingerprint = dataset_fingerprint(self.df)
+        
+        key = (self.fingerprint, output_format, self.system_prompt, get_model_name(self.llm), query)
+        with span("cache_respostas") as current:
+            cached = self.response_cache.get(*key)
+            current.set(acerto=cached is not None)
+        if cached is not None:
+            yield cached
+            return
+        
+        parts = []
+        for chunk in self._timed_stream(output_format, stream):
+            parts.append(chunk)
+            yield chunk
+        self.response_cache.put(*key, "".join(parts))
+    
+    @staticmethod
+    def _timed_stream(output_format: str, stream):
+        """
+        Repassa os pedaços do LLM e registra o span 'llm' ao final, com o
+        tempo até o primeiro pedaço (o span não fica aberto entre os yields,
+        que devolvem o controle a quem consome o gerador).
+        """
+        start = time.perf_counter()
+        first = None
+        chunks = 0
+        for chunk in stream():
+            if first is None:
+                first = time.perf_counter() - start
+            chunks += 1
+            yield chunk
+        record_span(
+            "llm", time.perf_counter() - start, formato=output_format, pedacos=chunks,
+            primeiro_pedaco_ms=round(first * 1000, 1) if first is not None else None,
+        )
+    
+    def _system_prompt_for(self, output_format: str) -> str:
+        """System prompt de um formato (o do analisador, que pode ser personalizado, se for o mesmo)."""
+        if output_format == self.output_format:
+            return self.system_prompt
+        return get_system_prompt(output_format)
+    
+    def _prompt(self, task: str, system_prompt: str = None, **values) -> ChatPromptTemplate:
+        """
+        Monta o prompt em camadas: system prompt e instruções da tarefa,
+        contexto do dataset e, por último, a pergunta.
+        
+        O prefixo (tudo antes da pergunta) é idêntico entre perguntas sobre o
+        mesmo dataset, o que permite ao provedor reaproveitá-lo (cache de
+        prompt da OpenAI, KV cache do Ollama).
+        
+        Args:
+            task: Tarefa ('texto', 'markdown', 'json' ou 'sql')
+            system_prompt: System prompt. Padrão: o do formato da tarefa.
+            **values: Variáveis fixas das instruções da tarefa
+        """
+        return ChatPromptTemplate.from_messages(
+            get_prompt_layers(system_prompt or self._system_prompt_for(task), task, **values)
+        )
+    
+    def _chat_chain(self):
+        """Monta a cadeia de perguntas e respostas sobre o DataFrame."""
+        return self._prompt("texto", self.system_prompt) | self.llm | StrOutputParser()
+    
+    def _prompt_inputs(self, query: str) -> Dict[str, Any]:
+        """Entradas do prompt em camadas (o contexto já serializado uma única vez)."""
+        return {
+            "context": self.df_info_json,
+            "question": query
+        }
     
     def chat(self, query: str) -> Any:
         """
@@ -120,107 +280,117 @@ class DataFrameAnalyzer:
             query: Pergunta ou instrução do usuário
             
         Returns:
-            Resposta que pode ser texto, DataFrame, ou caminho para uma imagem
+            Resposta em texto ou CodeRunResult com as saídas dos blocos de código
         """
         if self.df is None:
             return "Nenhum DataFrame carregado. Por favor, carregue os dados primeiro."
         
-        # Converter informações do DataFrame para documentos
-        df_info_str = json.dumps(self.df_info, indent=2, ensure_ascii=False)
-        doc = Document(page_content=df_info_str)
+        chain = self._chat_chain()
         
-        # Criar prompt para análise com system prompt
-        system_template = self.system_prompt
-        human_template = """
-        Informações sobre o DataFrame:
-        {context}
+        # Executar a cadeia (ou reaproveitar uma resposta já obtida para a mesma pergunta)
+        result = self._cached_response("texto", query, lambda: chain.invoke(self._prompt_inputs(query)))
         
-        Quando solicitado a criar visualizações, gere código Python que use matplotlib ou outras bibliotecas 
-        e execute o código para salvar a imagem.
+        # Processar o resultado para executar código Python se necessário
+        return self._process_result(result, query)
+    
+    def stream_chat(self, query: str) -> Iterator[Tuple[str, Any]]:
+        """
+        Processa uma consulta entregando a resposta à medida que é gerada.
         
-        Se a resposta incluir código Python para análise ou visualização, execute o código e retorne os resultados.
+        Cada bloco ```python é executado assim que seu fechamento chega,
+        sem esperar o restante da resposta. A execução (e a renderização das
+        figuras) roda em uma thread em segundo plano, na ordem dos blocos e em
+        um único namespace, enquanto o texto continua chegando.
         
-        Pergunta do usuário: {question}
+        Args:
+            query: Pergunta ou instrução do usuário
+            
+        Yields:
+            Tuplas (tipo, valor): ("texto", pedaço da resposta) ou
+            ("resultado", BlockResult com as saídas, o tempo e a memória de cada bloco)
         """
+        if self.df is None:
+            yield ("texto", "Nenhum DataFrame carregado. Por favor, carregue os dados primeiro.")
+            return
         
-        # Criar mensagens do chat
-        system_message_prompt = SystemMessagePromptTemplate.from_template(system_template)
-        human_message_prompt = HumanMessagePromptTemplate.from_template(human_template)
-        
-        chat_prompt = ChatPromptTemplate.from_messages([
-            system_message_prompt,
-            human_message_prompt
-        ])
+        chain = self._chat_chain()
+        watcher = CodeBlockWatcher()
+        pending = deque()
         
-        # Criar cadeia de processamento
-        chain = create_stuff_documents_chain(self.llm, chat_prompt)
+        def finished_results(wait=False):
+            # Entrega os resultados na ordem dos blocos, sem esperar os que ainda rodam
+            while pending and (wait or pending[0].done()):
+                block = pending.popleft().result()
+                self._record_block(block)
+                yield ("resultado", block)
         
-        # Executar a cadeia
-        result = chain.invoke({
-            "context": [doc],
-            "question": query
-        })
+        stream = self._stream_cached_response(
+            "texto", query, lambda: chain.stream(self._prompt_inputs(query))
+        )
+        from analyzer_registry import dataset_fingerprint
+        # A sessão só ocupa um processo de execução a partir do primeiro bloco
+        with open_session(self.df, dataset_fingerprint(self.df)) as session:
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix="code-block") as runner:
+                for chunk in stream:
+                    yield ("texto", chunk)
+                    pending.extend(runner.submit(session.run, code) for code in watcher.feed(chunk))
+                    yield from finished_results()
+                pending.extend(runner.submit(session.run, code) for code in watcher.close())
+                yield from finished_results(wait=True)
+    
+    @staticmethod
+    def _extract_code_blocks(result: str) -> List[str]:
+        """Extrai os blocos ```python de uma resposta completa."""
+        watcher = CodeBlockWatcher()
+        return watcher.feed(result) + watcher.close()
+    
+    def _execute_code_blocks(self, blocks: List[str], response: str = None) -> CodeRunResult:
+        """
+        Executa os blocos de código gerados pelo LLM em um único namespace.
         
-        # Processar o resultado para executar código Python se necessário
-        return self._process_result(result, query)
+        Args:
+            blocks: Códigos Python, na ordem da resposta
+            response: Resposta original do LLM
+            
+        Returns:
+            CodeRunResult com as saídas, o tempo e a memória de cada bloco
+        """
+        # Por padrão o código roda em um processo auxiliar, com limites de tempo e memória;
+        # saídas já geradas pelo mesmo código sobre o mesmo dataset vêm do cache
+        from analyzer_registry import dataset_fingerprint
+        with span("execucao_codigo", blocos=len(blocks)):
+            run = execute_code(blocks, self.df, dataset_fingerprint(self.df), response)
+            for block in run.blocks:
+                self._record_block(block)
+        return run
+    
+    @staticmethod
+    def _record_block(block):
+        """Registra a execução de um bloco de código como um span do trace atual."""
+        # Um bloco vindo do cache não rodou nesta requisição (a duração guardada é a da execução original)
+        record_span(
+            "bloco_codigo", 0.0 if block.from_cache else block.duration, indice=block.index + 1,
+            memoria_mb=round(block.memory / 1e6, 1), cache=block.from_cache, saidas=len(block.outputs),
+            erro=block.error,
+        )
     
     def _process_result(self, result: str, query: str) -> Any:
         """
-        Processa o resultado da consulta, executando código Python se necessário.
+        Processa o resultado da consulta, executando todos os blocos de código Python.
         
         Args:
             result: Resultado da consulta ao LLM
             query: Consulta original
             
         Returns:
-            Resultado processado
-        """
-        # Verificar se o resultado contém código Python para executar
-        if "```python" in result:
-            # Extrair código Python
-            code_blocks = []
-            lines = result.split("\n")
-            in_code_block = False
-            current_block = []
-            
-            for line in lines:
-                if line.startswith("```python"):
-                    in_code_block = True
-                elif line.startswith("```") and in_code_block:
-                    in_code_block = False
-                    code_blocks.append("\n".join(current_block))
-                    current_block = []
-                elif in_code_block:
-                    current_block.append(line)
-            
-            # Executar cada bloco de código
-            for code in code_blocks:
-                try:
-                    # Preparar ambiente de execução
-                    local_vars = {
-                        "df": self.df,
-                        "pd": pd,
-                        "plt": plt,
-                        "os": os
-                    }
-                    
-                    # Executar código
-                    exec(code, globals(), local_vars)
-                    
-                    # Verificar se uma figura foi gerada
-                    if plt.get_fignums():
-                        # Salvar figura
-                        fig_path = "temp_figure.png"
-                        plt.savefig(fig_path)
-                        plt.close()
-                        return fig_path
-                    
-                    # Verificar se um novo DataFrame foi gerado
-                    if "result_df" in local_vars:
-                        return local_vars["result_df"]
-                    
-                except Exception as e:
-                    return f"Erro ao executar código: {str(e)}\n\nResposta original:\n{result}"
+            CodeRunResult com as saídas de todos os blocos, ou o texto se
+            os blocos não produziram nada
+        """
+        blocks = self._extract_code_blocks(result) if "```python" in result else []
+        if blocks:
+            run = self._execute_code_blocks(blocks, result)
+            if run.outputs or run.errors:
+                return run
         
         return result
     
@@ -235,22 +405,18 @@ class DataFrameAnalyzer:
             String JSON com os resultados
         """
         if query:
-            # Definir esquema de extração
-            schema = {
-                "properties": {
-                    "analise": {"type": "string"},
-                    "insights": {"type": "array", "items": {"type": "string"}},
-                    "resumo": {"type": "string"}
-                },
-                "required": ["analise", "insights", "resumo"]
-            }
+            chain = self._prompt("json") | self.llm | JsonOutputParser()
             
-            # Criar cadeia de extração
-            chain = create_extraction_chain(schema, self.llm)
+            def compute():
+                try:
+                    result = chain.invoke(self._prompt_inputs(query))
+                except OutputParserException as e:
+                    # Resposta fora do formato: devolve o texto em vez de falhar
+                    result = {"analise": e.llm_output or str(e), "insights": [], "resumo": ""}
+                return json.dumps(result, indent=2, ensure_ascii=False)
             
             # Executar consulta e extrair informações estruturadas
-            result = chain.run(f"Analise os seguintes dados e forneça insights: {self.df_info}\n\nConsulta: {query}")
-            return json.dumps(result, indent=2, ensure_ascii=False)
+            return self._cached_response("json", query, compute)
         else:
             # Retornar informações básicas do DataFrame em JSON
             return json.dumps(self.df_info, indent=2, ensure_ascii=False)
@@ -266,36 +432,10 @@ class DataFrameAnalyzer:
             String Markdown com os resultados
         """
         if query:
-            # Criar prompt para gerar markdown
-            prompt = ChatPromptTemplate.from_template("""
-            Você é um assistente especializado em análise de dados.
-            
-            Informações sobre o DataFrame:
-            {df_info}
-            
-            Gere um relatório em formato Markdown sobre os dados com base na seguinte consulta:
-            {query}
-            
-            O relatório deve incluir:
-            1. Um título e introdução
-            2. Resumo dos dados
-            3. Principais insights
-            4. Análise detalhada
-            5. Conclusão
-            
-            Use formatação Markdown adequada com títulos, subtítulos, listas e tabelas.
-            
-            Responda em português do Brasil.
-            """)
-            
-            # Criar cadeia
-            chain = prompt | self.llm | StrOutputParser()
+            chain = self._markdown_chain()
             
             # Executar cadeia
-            return chain.invoke({
-                "df_info": json.dumps(self.df_info, indent=2, ensure_ascii=False),
-                "query": query
-            })
+            return self._cached_response("markdown", query, lambda: chain.invoke(self._prompt_inputs(query)))
         else:
             # Gerar markdown básico com informações do DataFrame
             md = f"# Análise de DataFrame\n\n"
@@ -309,10 +449,81 @@ class DataFrameAnalyzer:
             separator = "| " + " | ".join(["---"] * len(self.df_info['colunas'])) + " |"
             
             rows = []
-            for record in self.df_info['amostra']:
-                row = "| " + " | ".join([str(record[col]) for col in self.df_info['colunas']]) + " |"
+            # A amostra pode ter ficado fora do contexto (orçamento de tokens esgotado)
+            for record in self.df_info.get('amostra', []):
+                row = "| " + " | ".join([str(record.get(col, "")) for col in self.df_info['colunas']]) + " |"
                 rows.append(row)
             
             md += header + "\n" + separator + "\n" + "\n".join(rows)
             
-            return md
\ No newline at end of file
+            return md
+
+    def _markdown_chain(self):
+        """Monta a cadeia que gera relatórios em Markdown."""
+        return self._prompt("markdown") | self.llm | StrOutputParser()
+    
+    def stream_markdown(self, query: str) -> Iterator[str]:
+        """
+        Gera o relatório em Markdown entregando o texto à medida que é gerado.
+        
+        Args:
+            query: Consulta para a análise
+            
+        Yields:
+            Pedaços do relatório em Markdown
+        """
+        chain = self._markdown_chain()
+        yield from self._stream_cached_response(
+            "markdown", query, lambda: chain.stream(self._prompt_inputs(query))
+        )
+
+
+class CodeBlockWatcher:
+    """
+    Detecta blocos ```python completos em um texto que chega aos pedaços.
+    """
+    
+    def __init__(self):
+        self._buffer = ""
+        self._in_code_block = False
+        self._current_block = []
+    
+    def _consume_line(self, line: str, blocks: List[str]):
+        if line.startswith("```python"):
+            self._in_code_block = True
+        elif line.startswith("```") and self._in_code_block:
+            self._in_code_block = False
+            blocks.append("\n".join(self._current_block))
+            self._current_block = []
+        elif self._in_code_block:
+            self._current_block.append(line)
+    
+    def feed(self, chunk: str) -> List[str]:
+        """
+        Recebe um pedaço de texto e retorna os blocos que se completaram.
+        
+        Args:
+            chunk: Pedaço da resposta
+            
+        Returns:
+            Lista com o código dos blocos fechados neste pedaço
+        """
+        blocks = []
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split("\n")
+        for line in lines:
+            self._consume_line(line, blocks)
+        return blocks
+    
+    def close(self) -> List[str]:
+        """
+        Processa a última linha pendente ao fim da resposta.
+        
+        Returns:
+            Lista com o código dos blocos fechados na última linha
+        """
+        blocks = []
+        if self._buffer:
+            self._consume_line(self._buffer, blocks)
+            self._buffer = ""
+        return blocks
@@ -1,4 +1,6 @@
 import os
+import sys
+import hashlib
 import streamlit as st
 import pandas as pd
 from dotenv import load_dotenv
@@ -7,14 +9,18 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Importa módulos personalizados
+# LangChain, SDKs dos provedores e o acesso ao MySQL são importados só quando usados
 from config import get_ai_config
-from database import get_database_connection
-from data_processors.excel_processor import process_excel
-from data_processors.xml_processor import process_xml
-from data_processors.sql_processor import process_sql
-from data_processors.csv_processor import process_csv
-from ai_providers import get_ai_provider
-from langchain_analyzer import DataFrameAnalyzer  # Importa nosso novo analisador
+from data_processors.adaptive_processor import process_upload
+from data_processors.parse_cache import cached_parse, hash_upload
+from data_processors.csv_stream import summarize_csv
+from data_processors.excel_processor import list_sheets
+from data_processors.dataset_store import get_dataset_store, load_sql
+from ai_providers import get_ai_provider, preload_ai_provider, get_provider_stats
+from analyzer_registry import AnalyzerRegistry  # Reaproveita o DataFrameAnalyzer de cada dataset
+from response_cache import get_response_cache
+from code_executor import get_code_executor, get_figure_cache, BlockResult, CodeRunResult
+from instrumentation import get_recorder, span
 
 # Configuração da página
 st.set_page_config(
@@ -23,6 +29,11 @@ st.set_page_config(
     layout="wide"
 )
 
+# Analisadores da sessão, um por dataset (o perfil dos dados é calculado uma vez)
+if "analyzer_registry" not in st.session_state:
+    st.session_state["analyzer_registry"] = AnalyzerRegistry(response_cache=get_response_cache())
+analyzer_registry = st.session_state["analyzer_registry"]
+
 # Título principal
 st.title("📊 Análise de Dados com LangChain")
 
@@ -36,9 +47,11 @@ ai_provider_type = st.sidebar.radio(
     index=0
 )
 
-# Obtém o provedor de IA com base na seleção
+# Provedor de IA conforme a seleção; o cliente é criado uma vez por processo, em segundo plano
+# (importar o LangChain e o SDK do provedor leva segundos), e usado a partir da primeira pergunta
+provider_type = "api" if ai_provider_type == "API" else "local"
+preload_ai_provider(provider_type)
 if ai_provider_type == "API":
-    ai_provider = get_ai_provider("api")
     st.sidebar.info("Usando IA baseada em API (configurada no código)")
     
     # Exibe qual API está sendo usada (para informação do desenvolvedor)
@@ -46,7 +59,6 @@ if ai_provider_type == "API":
     st.sidebar.text(f"API Atual: {api_type}")
     
 else:
-    ai_provider = get_ai_provider("local")
     st.sidebar.info("Usando IA Local (Ollama)")
     
     # Exibe qual modelo está sendo usado
@@ -81,31 +93,103 @@ with st.sidebar.expander("Configurações Avançadas"):
         )
     else:
         custom_prompt = None
+    
+    # Leitura em blocos para CSVs e consultas que não cabem na memória
+    stream_data = st.checkbox(
+        "Ler dados em streaming (CSV e MySQL grandes)",
+        help="Calcula as estatísticas bloco a bloco e analisa uma amostra aleatória das linhas"
+    )
+    
+    # Tempo por etapa, tokens e memória das últimas requisições
+    show_debug_panel = st.checkbox(
+        "Painel de depuração",
+        help="Mostra as etapas cronometradas, os tokens e o pico de memória de cada requisição"
+    )
+
+def make_sql_analyzer(llm, output_format):
+    """Cria o analisador da tabela conectada e calcula seu perfil no banco."""
+    from sql_analyzer import SQLTableAnalyzer
+    host, user, password, database, table = st.session_state["sql_table"]
+    analyzer = SQLTableAnalyzer(llm, host, user, password, database, table, output_format)
+    analyzer.load_table()
+    return analyzer
 
 # Área de conteúdo principal
 st.header("Análise de Dados")
 
 # Trata diferentes fontes de dados
 df = None
+summary = None
+summary_key = None
+sql_table_key = None
 if data_source == "Arquivo CSV":
     uploaded_file = st.file_uploader("Carregar Arquivo CSV", type=["csv"])
     if uploaded_file is not None:
-        df = process_csv(uploaded_file)
-        st.success("Arquivo CSV carregado com sucesso!")
+        if stream_data:
+            # O resumo é guardado na sessão para não reler o arquivo a cada rerun
+            summary_key = hash_upload(uploaded_file, "summarize_csv")
+            if st.session_state.get("csv_summary_key") != summary_key:
+                st.session_state["csv_summary"] = summarize_csv(uploaded_file)
+                st.session_state["csv_summary_key"] = summary_key
+            summary = st.session_state["csv_summary"]
+            df = summary.sample_frame()
+            st.success(
+                f"Arquivo CSV lido em streaming: {summary.rows} linhas "
+                f"(amostra de {len(df)} linhas para análise)"
+            )
+        else:
+            # Processador adaptativo (Polars preguiçoso para arquivos grandes), com cache entre reruns
+            df = cached_parse(uploaded_file, process_upload)
+            st.success("Arquivo CSV carregado com sucesso!")
         
 elif data_source == "Arquivo Excel":
     uploaded_file = st.file_uploader("Carregar Arquivo Excel", type=["xlsx", "xls"])
     if uploaded_file is not None:
-        df = process_excel(uploaded_file)
+        # Os nomes das planilhas são guardados na sessão para não reabrir o arquivo a cada rerun
+        sheets_key = hash_upload(uploaded_file, "list_sheets")
+        if st.session_state.get("excel_sheets_key") != sheets_key:
+            st.session_state["excel_sheets"] = list_sheets(uploaded_file)
+            st.session_state["excel_sheets_key"] = sheets_key
+        sheets = st.session_state["excel_sheets"]
+
+        col1, col2 = st.columns(2)
+        with col1:
+            all_sheets = "Todas as planilhas"
+            sheet = st.selectbox(
+                "Planilha",
+                sheets + [all_sheets] if len(sheets) > 1 else sheets,
+                help="Com 'Todas as planilhas', as planilhas são lidas em paralelo e empilhadas com a coluna 'planilha'"
+            )
+        with col2:
+            cell_range = st.text_input(
+                "Intervalo (opcional)",
+                placeholder="Ex.: B2:F1000",
+                help="A primeira linha do intervalo é usada como cabeçalho. Se vazio, lê a planilha inteira."
+            ).strip()
+
+        df = cached_parse(
+            uploaded_file,
+            process_upload,
+            sheet_name=None if sheet == all_sheets else sheet,
+            cell_range=cell_range or None,
+        )
         st.success("Arquivo Excel carregado com sucesso!")
         
 elif data_source == "Documento XML":
     uploaded_file = st.file_uploader("Carregar Documento XML", type=["xml"])
+    record_path = st.text_input(
+        "Caminho dos registros (opcional)",
+        placeholder="Ex.: clientes/cliente",
+        help="Elemento que representa cada linha. Se vazio, é detectado automaticamente."
+    ).strip()
     if uploaded_file is not None:
-        df = process_xml(uploaded_file)
+        df = cached_parse(uploaded_file, process_upload, record_path=record_path or None)
         st.success("Documento XML carregado com sucesso!")
         
 elif data_source == "Banco de Dados MySQL":
+    from data_processors.sql_processor import process_sql, summarize_sql
+    from sql_analyzer import SQLTableAnalyzer
+    
     # Formulário de conexão com o banco de dados
     with st.expander("Conexão com o Banco de Dados"):
         st.info("Os detalhes da conexão podem ser configurados no arquivo .env ou inseridos aqui")
@@ -124,18 +208,125 @@ elif data_source == "Banco de Dados MySQL":
             password = st.text_input("Senha", value=default_password, type="password")
             database = st.text_input("Banco de Dados", value=default_database)
         
-        # Entrada de consulta SQL
-        sql_query = st.text_area("Consulta SQL", height=100)
+        sql_mode = st.radio(
+            "Modo",
+            ["Executar consulta", "Analisar tabela no banco"],
+            horizontal=True,
+            help="No modo tabela, os perfis são calculados no banco e cada pergunta vira uma consulta SQL "
+                 "executada no servidor, sem carregar a tabela"
+        )
         
-        if st.button("Executar Consulta"):
-            if sql_query.strip():
-                try:
-                    df = process_sql(host, user, password, database, sql_query)
-                    st.success("Consulta executada com sucesso!")
-                except Exception as e:
-                    st.error(f"Erro ao executar consulta: {e}")
-            else:
-                st.warning("Por favor, insira uma consulta SQL")
+        if sql_mode == "Analisar tabela no banco":
+            sql_table = st.text_input("Tabela").strip()
+            
+            if st.button("Conectar à Tabela"):
+                if sql_table:
+                    try:
+                        st.session_state["sql_table"] = (host, user, password, database, sql_table)
+                        st.session_state["sql_table_key"] = SQLTableAnalyzer.table_fingerprint(host, database, sql_table)
+                        # Calcula o perfil no banco agora; as perguntas reaproveitam o analisador do registro
+                        analyzer_registry.get(
+                            get_ai_provider(provider_type), output_format.lower(),
+                            fingerprint=st.session_state["sql_table_key"], factory=make_sql_analyzer
+                        )
+                        st.success("Perfil da tabela calculado no banco!")
+                    except Exception as e:
+                        st.session_state.pop("sql_table_key", None)
+                        st.error(f"Erro ao analisar a tabela: {e}")
+                else:
+                    st.warning("Por favor, informe o nome da tabela")
+        else:
+            # Entrada de consulta SQL
+            sql_query = st.text_area("Consulta SQL", height=100)
+            refresh_query = st.checkbox(
+                "Ignorar resultado guardado",
+                help="Executa a consulta no banco mesmo que o resultado esteja no catálogo de datasets"
+            )
+            
+            if st.button("Executar Consulta"):
+                if sql_query.strip():
+                    try:
+                        # O resultado fica na sessão para sobreviver aos reruns (ex.: clique em "Analisar")
+                        st.session_state.pop("sql_df", None)
+                        st.session_state.pop("sql_summary", None)
+                        if stream_data:
+                            summary = summarize_sql(host, user, password, database, sql_query)
+                            st.session_state["sql_summary"] = summary
+                            # A chave vem do conteúdo lido: a mesma consulta sobre dados alterados
+                            # não reaproveita o analisador nem as respostas guardadas
+                            st.session_state["sql_summary_key"] = hashlib.blake2b(
+                                f"{host}|{user}|{database}|{sql_query}|{summary.fingerprint()}".encode("utf-8"),
+                                digest_size=20,
+                            ).hexdigest()
+                        else:
+                            # Resultados recentes da mesma consulta vêm do catálogo de datasets
+                            st.session_state["sql_df"] = load_sql(
+                                host, user, password, database, sql_query, process_sql, refresh=refresh_query
+                            )
+                        st.success("Consulta executada com sucesso!")
+                    except Exception as e:
+                        st.error(f"Erro ao executar consulta: {e}")
+                else:
+                    st.warning("Por favor, insira uma consulta SQL")
+    
+    if sql_mode == "Analisar tabela no banco":
+        if "sql_table_key" in st.session_state:
+            sql_table_key = st.session_state["sql_table_key"]
+            table_analyzer = analyzer_registry.get(
+                get_ai_provider(provider_type), output_format.lower(), fingerprint=sql_table_key, factory=make_sql_analyzer
+            )
+            # Apenas a amostra está no cliente; a tabela fica no banco
+            df = table_analyzer.df
+            st.info(
+                f"Tabela `{table_analyzer.table}` com "
+                f"{'cerca de ' if table_analyzer.approximate else ''}{table_analyzer.row_estimate} linhas "
+                f"(exibindo a amostra; as perguntas são respondidas com consultas no banco)"
+            )
+    elif "sql_summary" in st.session_state:
+        summary = st.session_state["sql_summary"]
+        summary_key = st.session_state["sql_summary_key"]
+        df = summary.sample_frame()
+        st.info(f"Consulta lida em streaming: {summary.rows} linhas (amostra de {len(df)} linhas para análise)")
+    elif "sql_df" in st.session_state:
+        df = st.session_state["sql_df"]
+
+def show_output(kind, value):
+    """Exibe uma saída de bloco de código conforme o seu tipo."""
+    if kind == "dataframe":
+        st.dataframe(value)
+    elif kind == "figura":
+        # Figuras chegam renderizadas em memória (bytes PNG/SVG ou JSON do plotly)
+        if value.format == "plotly":
+            st.plotly_chart(value.to_plotly(), use_container_width=True)
+        elif value.format == "svg":
+            st.image(value.data.decode("utf-8"))
+        else:
+            st.image(value.data)
+    elif kind == "texto":
+        st.text(value)
+    else:
+        st.write(value)
+
+def show_block(block):
+    """Exibe as saídas de um bloco de código, o erro (se houver) e quanto ele custou."""
+    for kind, value in block.outputs:
+        show_output(kind, value)
+    if block.error:
+        st.error(f"Erro no bloco {block.index + 1}: {block.error}")
+    origin = " (cache)" if block.from_cache else ""
+    st.caption(f"Bloco {block.index + 1}: {block.duration * 1000:.0f} ms, {block.memory / 1e6:+.1f} MB{origin}")
+
+def show_result(response):
+    """Exibe um resultado de análise conforme o seu tipo."""
+    if isinstance(response, pd.DataFrame):
+        st.dataframe(response)
+    elif isinstance(response, BlockResult):
+        show_block(response)
+    elif isinstance(response, CodeRunResult):
+        for block in response.blocks:
+            show_block(block)
+    else:
+        st.write(response)
 
 # Exibe os dados se disponíveis
 if df is not None:
@@ -151,37 +342,164 @@ if df is not None:
         if user_query.strip():
             with st.spinner("Analisando dados..."):
                 try:
-                    # Inicializa nosso DataFrameAnalyzer com o provedor de IA selecionado
-                    analyzer = DataFrameAnalyzer(ai_provider, output_format.lower())
-                    analyzer.load_dataframe(df)
+                    # Cada pergunta vira um trace: carregamento do analisador, LLM e blocos de código
+                    with span("pergunta", formato=output_format.lower(), fonte=data_source):
+                        # Obtém o analisador do dataset (criado e perfilado só na primeira pergunta)
+                        if sql_table_key is not None:
+                            analyzer = analyzer_registry.get(
+                                get_ai_provider(provider_type), output_format.lower(),
+                                fingerprint=sql_table_key, factory=make_sql_analyzer
+                            )
+                        elif summary is not None:
+                            analyzer = analyzer_registry.get(
+                                get_ai_provider(provider_type), output_format.lower(),
+                                summary=summary, fingerprint=summary_key
+                            )
+                        else:
+                            analyzer = analyzer_registry.get(get_ai_provider(provider_type), output_format.lower(), df=df)
                     
-                    # Aplica system prompt personalizado se fornecido
-                    if use_custom_prompt and custom_prompt:
-                        analyzer.system_prompt = custom_prompt
+                        # Aplica system prompt personalizado se fornecido
+                        if use_custom_prompt and custom_prompt:
+                            analyzer.system_prompt = custom_prompt
                     
-                    # Processa com base no formato de saída selecionado
-                    if output_format == "JSON":
-                        response = analyzer.to_json(user_query)
-                        st.json(response)
-                    elif output_format == "Markdown":
-                        response = analyzer.to_markdown(user_query)
-                        st.markdown(response)
-                    else:  # Formato de texto padrão
-                        response = analyzer.chat(user_query)
-                        
-                        # Trata diferentes tipos de resposta
-                        if isinstance(response, pd.DataFrame):
-                            st.dataframe(response)
-                        elif isinstance(response, str) and response.endswith((".png", ".jpg", ".jpeg")):
-                            st.image(response)
-                        else:
-                            st.write(response)
+                        # Processa com base no formato de saída selecionado
+                        if output_format == "JSON":
+                            response = analyzer.to_json(user_query)
+                            st.json(response)
+                        elif output_format == "Markdown":
+                            # Exibe o relatório à medida que os tokens chegam
+                            placeholder = st.empty()
+                            response = ""
+                            for chunk in analyzer.stream_markdown(user_query):
+                                response += chunk
+                                placeholder.markdown(response + "▌")
+                            placeholder.markdown(response)
+                        else:  # Formato de texto padrão
+                            # Exibe o texto à medida que chega; blocos de código rodam assim que se fecham
+                            placeholder = st.empty()
+                            response = ""
+                            for kind, value in analyzer.stream_chat(user_query):
+                                if kind == "texto":
+                                    response += value
+                                    placeholder.markdown(response + "▌")
+                                else:
+                                    show_result(value)
+                            placeholder.markdown(response)
                         
                 except Exception as e:
                     st.error(f"Erro durante a análise: {e}")
         else:
             st.warning("Por favor, digite uma pergunta para analisar os dados")
 
+def show_debug_panel_traces(recorder, limit=10):
+    """Exibe as últimas requisições instrumentadas: etapas, tokens e memória."""
+    st.subheader("Painel de Depuração")
+    traces = recorder.recent(limit)
+    if not traces:
+        st.info("Nenhuma requisição instrumentada ainda.")
+        return
+    for trace in traces:
+        data = trace.to_dict()
+        tokens = f"{trace.prompt_tokens()} + {trace.completion_tokens()} tokens"
+        if trace.cached_tokens():
+            tokens += f" ({trace.cached_tokens() / trace.prompt_tokens():.0%} do prompt em cache)"
+        if any(usage["estimado"] for usage in trace.tokens.values()):
+            tokens += " (estimados)"
+        with st.expander(
+            f"{data['inicio']} · {trace.name} · {data['duracao_ms']:.0f} ms · {tokens} · "
+            f"pico {data['memoria']['rss_pico_mb']:.0f} MB"
+        ):
+            if trace.error:
+                st.error(trace.error)
+            st.dataframe(pd.DataFrame([
+                {
+                    "etapa": "  " * item["profundidade"] + item["nome"],
+                    "início (ms)": item["inicio_ms"],
+                    "duração (ms)": item["duracao_ms"],
+                    "atributos": ", ".join(f"{key}={value}" for key, value in item["atributos"].items()),
+                }
+                for item in data["spans"]
+            ]), use_container_width=True, hide_index=True)
+            if trace.tokens:
+                st.json(data["tokens"])
+            st.caption(
+                f"Memória residente: {data['memoria']['rss_inicio_mb']:.0f} MB no início, "
+                f"pico de {data['memoria']['rss_pico_mb']:.0f} MB, {data['memoria']['rss_fim_mb']:.0f} MB no fim"
+            )
+    col_jsonl, col_prometheus = st.columns(2)
+    col_jsonl.download_button("Exportar JSON lines", recorder.to_jsonl(), "traces.jsonl", "application/jsonl")
+    col_prometheus.download_button(
+        "Exportar métricas do Prometheus", recorder.prometheus_text(), "analise_dados.prom", "text/plain"
+    )
+
+trace_recorder = get_recorder()
+if show_debug_panel and trace_recorder is not None:
+    show_debug_panel_traces(trace_recorder)
+
+# Tokens das requisições recentes e quanto do prompt veio do cache de prompt do provedor
+if trace_recorder is not None:
+    trace_stats = trace_recorder.stats()
+    if trace_stats["tokens_prompt"]:
+        st.sidebar.caption(
+            f"Tokens recentes: {trace_stats['tokens_prompt']} de prompt "
+            f"({trace_stats['proporcao_cache']:.0%} em cache no provedor), "
+            f"{trace_stats['tokens_completion']} de resposta"
+        )
+
+# Estatísticas do cache de respostas
+if analyzer_registry.response_cache is not None:
+    cache_stats = analyzer_registry.response_cache.stats()
+    st.sidebar.caption(
+        f"Cache de respostas: {cache_stats['acertos']} acertos, "
+        f"{cache_stats['acertos_semanticos']} por similaridade, "
+        f"{cache_stats['falhas']} falhas ({cache_stats['entradas']} guardadas)"
+    )
+
+# Catálogo persistente de datasets
+dataset_store = get_dataset_store()
+if dataset_store is not None:
+    store_stats = dataset_store.stats()
+    st.sidebar.caption(
+        f"Catálogo de datasets: {store_stats['datasets']} guardados "
+        f"({store_stats['bytes_em_disco'] / 1e6:.1f} MB), {store_stats['acertos']} reaproveitados"
+    )
+    if store_stats["datasets"] and st.sidebar.button("Limpar catálogo de datasets"):
+        dataset_store.clear()
+        st.rerun()
+
+# Processos de execução do código gerado (criados e aquecidos na primeira execução do script)
+code_executor = get_code_executor()
+if code_executor is not None:
+    executor_stats = code_executor.stats()
+    st.sidebar.caption(
+        f"Execução de código: {executor_stats['processos']} processos ({executor_stats['livres']} livres, "
+        f"{executor_stats['fila']} na fila), latência média {executor_stats['latencia_media_ms']:.0f} ms "
+        f"(p95 {executor_stats['latencia_p95_ms']:.0f} ms), {executor_stats['reinicios']} reinícios"
+    )
+figure_stats = get_figure_cache().stats()
+if figure_stats["acertos"] or figure_stats["figuras"]:
+    st.sidebar.caption(f"Cache de figuras: {figure_stats['figuras']} blocos guardados, {figure_stats['acertos']} reaproveitados")
+
+# Clientes de IA reaproveitados entre reruns e sessões
+for provider_stats in get_provider_stats():
+    st.sidebar.caption(
+        f"Cliente {provider_stats['provedor']} ({provider_stats['modelo']}): criado em "
+        f"{provider_stats['criacao_ms']:.0f} ms, usado {provider_stats['usos']} vezes"
+    )
+
+# Estatísticas dos pools de conexões com o banco de dados (só existem se o MySQL já foi usado)
+if "database" in sys.modules:
+    from database import get_pool_stats, dispose_engines
+    for pool_stats in get_pool_stats():
+        st.sidebar.caption(
+            f"Pool {pool_stats['banco']}@{pool_stats['host']}: {pool_stats['em_uso']} em uso, "
+            f"{pool_stats['livres']} livres, overflow {pool_stats['overflow']}, "
+            f"espera média {pool_stats['espera_media_ms']:.1f} ms"
+        )
+    if get_pool_stats() and st.sidebar.button("Fechar conexões com o banco"):
+        dispose_engines()
+        st.rerun()
+
 # Rodapé
 st.sidebar.markdown("---")
 st.sidebar.info(
@@ -189,39 +507,3 @@ st.sidebar.info(
     "Configure o provedor de IA, a fonte de dados e o formato de saída para começar."
 )
 
-
-# Importa o processador adaptativo
-from data_processors.adaptive_processor import process_adaptive
-
-# Atualização da função para processar arquivos CSV
-def process_uploaded_csv(uploaded_file):
-    """Processa um arquivo CSV carregado."""
-    try:
-        # Usa o processador adaptativo
-        df = process_adaptive(uploaded_file.name, uploaded_file)
-        return df
-    except Exception as e:
-        st.error(f"Erro ao processar o arquivo CSV: {e}")
-        return None
-
-# Atualização da função para processar arquivos Excel
-def process_uploaded_excel(uploaded_file):
-    """Processa um arquivo Excel carregado."""
-    try:
-        # Usa o processador adaptativo
-        df = process_adaptive(uploaded_file.name, uploaded_file)
-        return df
-    except Exception as e:
-        st.error(f"Erro ao processar o arquivo Excel: {e}")
-        return None
-
-# Atualização da função para processar arquivos XML
-def process_uploaded_xml(uploaded_file):
-    """Processa um arquivo XML carregado."""
-    try:
-        # Usa o processador adaptativo
-        df = process_adaptive(uploaded_file.name, uploaded_file)
-        return df
-    except Exception as e:
-        st.error(f"Erro ao processar o arquivo XML: {e}")
-        return None
\ No newline at end of file
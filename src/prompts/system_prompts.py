@@ -3,6 +3,8 @@ Definições de System Prompts para orientar o comportamento da IA
 durante a análise de dados.
 """
 
+from langchain_core.messages import SystemMessage
+
 # System Prompt padrão para análise de dados
 DEFAULT_ANALYSIS_PROMPT = """
 Você é um assistente especializado em análise de dados, treinado para ajudar usuários
@@ -18,7 +20,7 @@ Diretrizes:
 7. Para fórmulas matemáticas, use a sintaxe LaTeX correta:
    - Envolva as fórmulas com $$ para blocos separados
    - Use $ para fórmulas inline
-   - Exemplo: $$\\text{{Média}} = \\frac{{\\sum x}}{{n}}$$
+   - Exemplo: $$\\text{Média} = \\frac{\\sum x}{n}$$
    - Não use colchetes [] para envolver as fórmulas
    - Certifique-se de que os espaços estejam corretos dentro das fórmulas
 
@@ -84,6 +86,7 @@ Ao analisar os dados e gerar resultados em JSON:
 A estrutura básica do JSON deve seguir este formato:
 {
   "resumo": "Breve descrição da análise",
+  "analise": "Análise detalhada",
   "dados_analisados": {
     "num_registros": 0,
     "num_colunas": 0,
@@ -112,4 +115,103 @@ def get_system_prompt(output_format="texto"):
     Returns:
         str: System prompt correspondente ao formato
     """
-    return FORMAT_PROMPTS.get(output_format.lower(), DEFAULT_ANALYSIS_PROMPT)
\ No newline at end of file
+    return FORMAT_PROMPTS.get(output_format.lower(), DEFAULT_ANALYSIS_PROMPT)
+
+
+# Camadas do prompt, da mais estável para a mais variável:
+#   1. system prompt + instruções fixas da tarefa (iguais em todas as chamadas)
+#   2. contexto do dataset (igual em todas as perguntas sobre o mesmo dataset)
+#   3. pergunta do usuário
+# OpenAI, DeepSeek e Ollama reaproveitam o prefixo idêntico entre chamadas
+# (cache de prompt e KV cache): nada que muda a cada pergunta pode vir antes do contexto.
+
+# Instruções das respostas em texto, com código Python executado pela aplicação
+CHAT_INSTRUCTIONS = """
+Quando solicitado a criar visualizações, gere código Python que use matplotlib (plt) ou plotly
+(guarde a figura do plotly na variável fig). A figura é capturada automaticamente; não salve arquivos.
+
+Se a resposta incluir código Python para análise ou visualização, escreva-o em blocos ```python:
+o código é executado sobre o DataFrame `df` e os resultados são exibidos.
+Todos os blocos de código rodam em sequência e compartilham as variáveis; o valor da última linha
+de cada bloco, o result_df, os prints e as figuras são exibidos.
+"""
+
+# Instruções dos relatórios em Markdown
+MARKDOWN_INSTRUCTIONS = """
+Gere um relatório em formato Markdown sobre os dados com base na consulta do usuário.
+
+O relatório deve incluir:
+1. Um título e introdução
+2. Resumo dos dados
+3. Principais insights
+4. Análise detalhada
+5. Conclusão
+
+Use formatação Markdown adequada com títulos, subtítulos, listas e tabelas.
+
+Responda em português do Brasil.
+"""
+
+# Instruções das análises estruturadas em JSON
+JSON_INSTRUCTIONS = """
+Analise os dados e forneça insights para a consulta do usuário.
+Responda somente com um objeto JSON válido, sem texto antes ou depois e sem blocos de código.
+O objeto deve ter sempre os campos "analise" (texto), "insights" (lista de textos) e "resumo" (texto).
+"""
+
+# Instruções das perguntas respondidas com consultas no banco (SQLTableAnalyzer)
+SQL_INSTRUCTIONS = """
+Você tem acesso somente de leitura a uma tabela MySQL, descrita nas informações abaixo.
+
+Para responder, escreva UMA consulta MySQL somente de leitura (SELECT ou WITH) em um bloco ```sql.
+Ela será executada diretamente no banco, e o resultado é limitado a {max_linhas} linhas:
+agregue no banco (GROUP BY, COUNT, SUM, AVG) em vez de trazer linhas brutas.
+
+Se a pergunta pedir um gráfico, inclua também um bloco ```python que use o DataFrame `df`
+(resultado da consulta) e matplotlib (plt).
+
+Explique brevemente o que a consulta calcula.
+"""
+
+TASK_INSTRUCTIONS = {
+    "texto": CHAT_INSTRUCTIONS,
+    "markdown": MARKDOWN_INSTRUCTIONS,
+    "json": JSON_INSTRUCTIONS,
+    "sql": SQL_INSTRUCTIONS,
+}
+
+# Camada do contexto do dataset: só variáveis fixas por dataset ({context}, {tabela})
+CONTEXT_TEMPLATES = {
+    "sql": "Informações sobre a tabela MySQL `{tabela}` (perfil calculado no banco e linhas de exemplo):\n{context}",
+}
+DEFAULT_CONTEXT_TEMPLATE = "Informações sobre o DataFrame:\n{context}"
+
+# Camada da pergunta: sempre a última
+QUESTION_TEMPLATE = "Pergunta do usuário: {question}"
+
+def get_prompt_layers(system_prompt, task="texto", **values):
+    """
+    Monta as mensagens do prompt em camadas estáveis para o cache de prompt.
+    
+    A mensagem de sistema (system prompt e instruções da tarefa) é idêntica em
+    todas as chamadas; a mensagem do usuário começa pelo contexto do dataset e
+    termina com a pergunta, a única parte que muda entre perguntas.
+    
+    O system prompt é texto puro (pode ser personalizado e conter chaves):
+    entra como mensagem pronta, sem passar pelo template.
+    
+    Args:
+        system_prompt (str): System prompt, em texto puro
+        task (str): Tarefa ('texto', 'markdown', 'json' ou 'sql')
+        **values: Variáveis das instruções da tarefa (ex.: max_linhas no SQL)
+        
+    Returns:
+        list: Mensagens para ChatPromptTemplate.from_messages (a de sistema
+            pronta, a do usuário como template)
+    """
+    instructions = TASK_INSTRUCTIONS.get(task, CHAT_INSTRUCTIONS).strip().format(**values)
+    context = CONTEXT_TEMPLATES.get(task, DEFAULT_CONTEXT_TEMPLATE)
+    return [
+        SystemMessage(content=system_prompt.strip() + "\n\n" + instructions),
+        ("human", context + "\n\n" + QUESTION_TEMPLATE),
+    ]
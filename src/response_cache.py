@@ -0,0 +1,276 @@
+"""
+Cache persistente de respostas do LLM, com busca opcional por similaridade
+semântica entre perguntas.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import contextlib
+import unicodedata
+
+import numpy as np
+
+from config import get_response_cache_config
+
+
+def normalize_question(question):
+    """
+    Normaliza uma pergunta para comparação (minúsculas, sem acentos,
+    espaços e pontuação final uniformizados).
+
+    Args:
+        question (str): Pergunta original
+
+    Returns:
+        str: Pergunta normalizada
+    """
+    text = unicodedata.normalize("NFKD", question.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip("?!. ")
+
+
+def get_model_name(llm):
+    """Obtém o nome do modelo de um cliente LangChain."""
+    for attr in ("model_name", "model"):
+        value = getattr(llm, attr, None)
+        if isinstance(value, str) and value:
+            return value
+    return type(llm).__name__
+
+
+def _digest(*parts):
+    hasher = hashlib.blake2b(digest_size=20)
+    for part in parts:
+        hasher.update(str(part).encode("utf-8"))
+        hasher.update(b"\x00")
+    return hasher.hexdigest()
+
+
+class ResponseCache:
+    """
+    Cache de respostas em SQLite, com TTL, limite de entradas (LRU) e busca
+    opcional por perguntas semanticamente próximas.
+
+    A chave combina a impressão digital do dataset, o formato de saída, o
+    hash do system prompt, o modelo e a pergunta normalizada.
+    """
+
+    def __init__(self, path=None, ttl_seconds=None, max_entries=None, embeddings=None,
+                 similarity_threshold=None):
+        """
+        Inicializa o cache.
+
+        Args:
+            path (str, optional): Arquivo SQLite. Padrão vem da configuração.
+            ttl_seconds (int, optional): Validade de cada resposta, em segundos
+            max_entries (int, optional): Quantidade máxima de respostas guardadas
+            embeddings: Modelo de embeddings LangChain (None desativa a busca semântica)
+            similarity_threshold (float, optional): Similaridade de cosseno mínima para um acerto semântico
+        """
+        config = get_response_cache_config()
+        self.path = path or config["path"]
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else config["ttl_seconds"]
+        self.max_entries = max_entries if max_entries is not None else config["max_entries"]
+        self.similarity_threshold = (
+            similarity_threshold if similarity_threshold is not None else config["similarity_threshold"]
+        )
+        self.embeddings = embeddings
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS respostas (
+                    chave TEXT PRIMARY KEY,
+                    escopo TEXT NOT NULL,
+                    pergunta TEXT NOT NULL,
+                    embedding BLOB,
+                    resposta TEXT NOT NULL,
+                    criado_em REAL NOT NULL,
+                    acessado_em REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_respostas_escopo ON respostas (escopo)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_respostas_acesso ON respostas (acessado_em)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """
+        Uma conexão por operação: o SQLite é local e isso evita compartilhar
+        conexões entre threads. Confirma (ou desfaz) e fecha ao sair; o
+        `with` da própria conexão do sqlite3 não a fecha.
+        """
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _embed(self, question):
+        if self.embeddings is None:
+            return None
+        try:
+            vector = np.asarray(self.embeddings.embed_query(question), dtype="float32")
+        except Exception as e:
+            print(f"Falha ao calcular embedding da pergunta: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    @staticmethod
+    def _scope(fingerprint, output_format, system_prompt, model):
+        return _digest(fingerprint, output_format, _digest(system_prompt), model)
+
+    def get(self, fingerprint, output_format, system_prompt, model, question):
+        """
+        Procura uma resposta guardada para a pergunta.
+
+        Args:
+            fingerprint (str): Impressão digital do dataset
+            output_format (str): Formato de saída
+            system_prompt (str): System prompt em uso
+            model (str): Nome do modelo
+            question (str): Pergunta do usuário
+
+        Returns:
+            str ou None: Resposta guardada
+        """
+        scope = self._scope(fingerprint, output_format, system_prompt, model)
+        normalized = normalize_question(question)
+        key = _digest(scope, normalized)
+        now = time.time()
+        min_created = now - self.ttl_seconds
+
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT resposta, criado_em FROM respostas WHERE chave = ?", (key,)
+            ).fetchone()
+            if row is not None and row[1] >= min_created:
+                conn.execute("UPDATE respostas SET acessado_em = ? WHERE chave = ?", (now, key))
+                with self._lock:
+                    self.hits += 1
+                return row[0]
+
+            if self.embeddings is not None:
+                vector = self._embed(normalized)
+                if vector is not None:
+                    rows = conn.execute(
+                        "SELECT chave, embedding, resposta FROM respostas "
+                        "WHERE escopo = ? AND embedding IS NOT NULL AND criado_em >= ?",
+                        (scope, min_created),
+                    ).fetchall()
+                    candidates = [r for r in rows if len(r[1]) == vector.nbytes]
+                    if candidates:
+                        matrix = np.frombuffer(b"".join(r[1] for r in candidates), dtype="float32")
+                        scores = matrix.reshape(len(candidates), -1) @ vector
+                        best = int(scores.argmax())
+                        if scores[best] >= self.similarity_threshold:
+                            conn.execute(
+                                "UPDATE respostas SET acessado_em = ? WHERE chave = ?",
+                                (now, candidates[best][0]),
+                            )
+                            with self._lock:
+                                self.semantic_hits += 1
+                            return candidates[best][2]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, fingerprint, output_format, system_prompt, model, question, response):
+        """
+        Guarda uma resposta e remove as expiradas ou menos usadas.
+
+        Args:
+            fingerprint (str): Impressão digital do dataset
+            output_format (str): Formato de saída
+            system_prompt (str): System prompt em uso
+            model (str): Nome do modelo
+            question (str): Pergunta do usuário
+            response (str): Resposta do LLM
+        """
+        scope = self._scope(fingerprint, output_format, system_prompt, model)
+        normalized = normalize_question(question)
+        key = _digest(scope, normalized)
+        vector = self._embed(normalized)
+        now = time.time()
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO respostas VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, scope, normalized, vector.tobytes() if vector is not None else None, response, now, now),
+            )
+            conn.execute("DELETE FROM respostas WHERE criado_em < ?", (now - self.ttl_seconds,))
+            conn.execute(
+                "DELETE FROM respostas WHERE chave IN ("
+                "SELECT chave FROM respostas ORDER BY acessado_em DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self):
+        """Remove todas as respostas guardadas."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM respostas")
+
+    def stats(self):
+        """
+        Retorna os contadores de uso do cache.
+
+        Returns:
+            dict: Acertos exatos, acertos semânticos, falhas, taxa de acerto e entradas
+        """
+        with self._connect() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM respostas").fetchone()[0]
+        with self._lock:
+            total = self.hits + self.semantic_hits + self.misses
+            return {
+                "acertos": self.hits,
+                "acertos_semanticos": self.semantic_hits,
+                "falhas": self.misses,
+                "taxa_acerto": (self.hits + self.semantic_hits) / total if total else 0.0,
+                "entradas": entries,
+            }
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """
+    Retorna o cache de respostas compartilhado pelo processo (None se desativado).
+
+    Returns:
+        ResponseCache ou None
+    """
+    global _response_cache
+    config = get_response_cache_config()
+    if not config["enabled"]:
+        return None
+
+    with _response_cache_lock:
+        if _response_cache is None:
+            embeddings = None
+            if config["embeddings"]:
+                from ai_providers import get_embeddings_provider
+                try:
+                    embeddings = get_embeddings_provider(config["embeddings"])
+                except Exception as e:
+                    print(f"Busca semântica do cache desativada: {e}")
+            _response_cache = ResponseCache(embeddings=embeddings)
+        return _response_cache
@@ -0,0 +1,441 @@
+"""
+Análise de tabelas MySQL direto no banco: o perfil das colunas vem de
+consultas de agregação e as perguntas são respondidas com SQL gerado pelo
+LLM e executado no servidor, sem carregar a tabela inteira.
+"""
+
+import re
+import random
+import hashlib
+import decimal
+from typing import Any, Iterator, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import sqlparse
+from sqlparse import tokens as T
+from sqlalchemy import text
+from langchain_core.output_parsers import StrOutputParser
+
+from config import get_sql_analyzer_config
+from database import get_sqlalchemy_engine
+from data_processors.sql_processor import process_sql, normalize_batch
+from context_builder import build_llm_context, serialize_context
+from langchain_analyzer import DataFrameAnalyzer
+from instrumentation import span
+from analyzer_registry import tag_fingerprint
+
+NUMERIC_TYPES = {"tinyint", "smallint", "mediumint", "int", "integer", "bigint", "decimal", "numeric", "float", "double", "real"}
+# Tipos em que COUNT(DISTINCT)/MIN/MAX não fazem sentido ou custam caro
+OPAQUE_TYPES = {"blob", "tinyblob", "mediumblob", "longblob", "binary", "varbinary", "json", "geometry"}
+
+# Quantidade de faixas de chave usadas na amostragem de tabelas grandes
+SAMPLE_KEY_RANGES = 10
+# Semente do sorteio das linhas de exemplo (amostra estável entre sessões)
+SAMPLE_SEED = 42
+
+_TABLE_NAME = re.compile(r"^[A-Za-z0-9_$]+$")
+_SQL_BLOCK = re.compile(r"```sql\s*\n(.*?)```", re.DOTALL | re.IGNORECASE)
+# Funções que seguram recursos além da consulta (travas de sessão, arquivos do servidor, espera)
+_FORBIDDEN_FUNCTIONS = {"SLEEP", "BENCHMARK", "GET_LOCK", "RELEASE_LOCK", "RELEASE_ALL_LOCKS", "LOAD_FILE"}
+# Leituras que travam linhas (SELECT ... FOR SHARE / LOCK IN SHARE MODE)
+_LOCKING_READS = {("FOR", "SHARE"), ("LOCK", "IN")}
+
+
+def quote_identifier(name):
+    """Coloca um identificador MySQL entre crases."""
+    return "`" + str(name).replace("`", "``") + "`"
+
+
+def validate_read_only_sql(sql):
+    """
+    Valida que o SQL gerado é uma única consulta somente de leitura.
+
+    A consulta é analisada pelo sqlparse: palavras reservadas só contam como
+    comandos onde são comandos, então funções como REPLACE() e colunas como
+    `set` continuam permitidas. A garantia final vem do banco: run_sql
+    executa a consulta em uma transação READ ONLY.
+
+    Args:
+        sql (str): Consulta gerada pelo LLM
+
+    Returns:
+        str: Consulta sem comentários e sem ';' final
+
+    Raises:
+        ValueError: Se a consulta não for um único SELECT/WITH ou contiver comandos de escrita
+    """
+    if "/*!" in sql:
+        raise ValueError("Comentários executáveis não são permitidos.")
+
+    cleaned = sqlparse.format(sql, strip_comments=True).strip().rstrip(";").strip()
+    statements = [statement for statement in sqlparse.parse(cleaned) if str(statement).strip(" \n\t;")]
+    if len(statements) != 1:
+        raise ValueError("Apenas uma consulta por vez é permitida.")
+    statement = statements[0]
+
+    tokens = [token for token in statement.flatten() if not token.is_whitespace and token.ttype not in T.Comment]
+    first = next((token for token in tokens if token.ttype is not T.Punctuation), None)
+    if (statement.get_type() not in ("SELECT", "UNKNOWN") or first is None
+            or first.normalized.upper() not in ("SELECT", "WITH")):
+        raise ValueError("Apenas consultas SELECT são permitidas.")
+
+    for position, token in enumerate(tokens):
+        word = token.normalized.upper()
+        following = tokens[position + 1] if position + 1 < len(tokens) else None
+        if token.ttype in T.DDL or (token.ttype in T.DML and word != "SELECT"):
+            raise ValueError(f"Comando não permitido em consultas somente de leitura: {word}")
+        if token.ttype in T.Keyword and word == "INTO":
+            raise ValueError("Comando não permitido em consultas somente de leitura: INTO")
+        if (token.ttype in T.Keyword and following is not None
+                and (word, following.normalized.upper()) in _LOCKING_READS):
+            raise ValueError(f"Comando não permitido em consultas somente de leitura: {word} {following.normalized.upper()}")
+        if word in _FORBIDDEN_FUNCTIONS and following is not None and following.value == "(":
+            raise ValueError(f"Função não permitida em consultas somente de leitura: {word}")
+    return cleaned
+
+
+def with_row_limit(sql, max_rows):
+    """
+    Acrescenta LIMIT a uma consulta validada que não tem LIMIT no nível de
+    fora, para que o banco não produza mais linhas do que serão lidas (sem
+    envolver a consulta em uma subconsulta, o que quebraria colunas com o
+    mesmo nome vindas de um JOIN).
+
+    Args:
+        sql (str): Consulta já validada por validate_read_only_sql
+        max_rows (int): Máximo de linhas
+
+    Returns:
+        str: Consulta com limite
+    """
+    statement = sqlparse.parse(sql)[0]
+    if any(token.ttype in T.Keyword and token.normalized.upper() == "LIMIT" for token in statement.tokens):
+        return sql
+    return f"{sql}\nLIMIT {int(max_rows)}"
+
+
+def _plain(value):
+    """Converte valores do driver (Decimal, datas) em tipos serializáveis."""
+    if value is None or value is pd.NA:
+        return None
+    if isinstance(value, float) and value != value:
+        return None
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+class SQLTableAnalyzer(DataFrameAnalyzer):
+    """
+    Analisador de uma tabela MySQL que nunca carrega a tabela inteira.
+
+    O contexto do LLM vem de consultas de agregação (COUNT, AVG, MIN/MAX,
+    distintos) e de uma amostra de linhas; as perguntas são respondidas com
+    uma consulta SELECT gerada pelo LLM e executada no banco. self.df guarda
+    apenas a amostra.
+    """
+
+    def __init__(self, llm, host, user, password, database, table, output_format="texto"):
+        """
+        Inicializa o analisador.
+
+        Args:
+            llm: Modelo de linguagem LangChain (pode ser API ou local)
+            host (str): Host do banco de dados
+            user (str): Usuário do banco de dados
+            password (str): Senha do banco de dados
+            database (str): Nome do banco de dados
+            table (str): Tabela a analisar
+            output_format: Formato de saída desejado ('texto', 'markdown', 'json')
+        """
+        if not _TABLE_NAME.match(table or ""):
+            raise ValueError(f"Nome de tabela inválido: {table!r}")
+
+        super().__init__(llm, output_format)
+        self.connection_params = (host, user, password, database)
+        self.table = table
+        self.columns = {}
+        self.row_estimate = 0
+        self.approximate = False
+        self.config = get_sql_analyzer_config()
+
+    @staticmethod
+    def table_fingerprint(host, database, table):
+        """Impressão digital de uma tabela para o registro de analisadores e o cache de respostas."""
+        return hashlib.blake2b(f"sql|{host}|{database}|{table}".encode("utf-8"), digest_size=20).hexdigest()
+
+    def _engine(self):
+        return get_sqlalchemy_engine(*self.connection_params)
+
+    def _fetch(self, sql, params=None):
+        """Executa uma consulta interna (com parâmetros) e retorna as linhas."""
+        with self._engine().connect() as conn:
+            result = conn.execute(text(sql), params or {})
+            return list(result.keys()), result.fetchall()
+
+    def _load_metadata(self):
+        """Lê colunas, tipos e a estimativa de linhas do information_schema (sem varrer a tabela)."""
+        _, rows = self._fetch(
+            "SELECT COLUMN_NAME, DATA_TYPE, COLUMN_KEY FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :tabela ORDER BY ORDINAL_POSITION",
+            {"tabela": self.table},
+        )
+        if not rows:
+            raise ValueError(f"Tabela não encontrada: {self.table}")
+        self.columns = {name: {"tipo": data_type.lower(), "chave": key} for name, data_type, key in rows}
+
+        _, rows = self._fetch(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :tabela",
+            {"tabela": self.table},
+        )
+        estimate = rows[0][0] if rows and rows[0][0] is not None else None
+        if estimate is None or estimate <= self.config["full_scan_rows"]:
+            # Tabelas pequenas (ou sem estatística) têm contagem exata
+            _, rows = self._fetch(f"SELECT COUNT(*) FROM {quote_identifier(self.table)}")
+            estimate = rows[0][0]
+        self.row_estimate = int(estimate)
+        self.approximate = self.row_estimate > self.config["full_scan_rows"]
+
+    def _sample_sql(self):
+        """
+        Monta a consulta que sorteia as linhas de exemplo.
+
+        Tabelas pequenas usam ORDER BY RAND(); tabelas grandes com chave
+        primária numérica usam faixas aleatórias da chave (buscas no índice);
+        as demais, um filtro RAND() < p com LIMIT. O sorteio tem semente fixa:
+        a mesma tabela gera a mesma amostra (e o mesmo prefixo de prompt) em
+        todas as sessões.
+        """
+        table = quote_identifier(self.table)
+        limit = self.config["sample_rows"]
+        if not self.approximate:
+            return f"SELECT * FROM {table} ORDER BY RAND({SAMPLE_SEED}) LIMIT {limit}"
+
+        keys = [name for name, info in self.columns.items() if info["chave"] == "PRI"]
+        if len(keys) == 1 and self.columns[keys[0]]["tipo"] in NUMERIC_TYPES:
+            key = quote_identifier(keys[0])
+            _, rows = self._fetch(f"SELECT MIN({key}), MAX({key}) FROM {table}")
+            low, high = rows[0]
+            if low is not None:
+                per_range = max(1, limit // SAMPLE_KEY_RANGES)
+                rng = random.Random(f"{SAMPLE_SEED}:{self.table}")
+                starts = sorted(rng.uniform(float(low), float(high)) for _ in range(SAMPLE_KEY_RANGES))
+                return " UNION ALL ".join(
+                    f"(SELECT * FROM {table} WHERE {key} >= {start!r} ORDER BY {key} LIMIT {per_range})"
+                    for start in starts
+                )
+
+        probability = min(1.0, 2 * limit / max(self.row_estimate, 1))
+        return f"SELECT * FROM {table} WHERE RAND({SAMPLE_SEED}) < {probability!r} LIMIT {limit}"
+
+    def _profile_sql(self, source):
+        """Monta uma única consulta de agregação com o perfil de todas as colunas."""
+        expressions = ["COUNT(*) AS `linhas`"]
+        for i, (name, info) in enumerate(self.columns.items()):
+            col = quote_identifier(name)
+            expressions.append(f"COUNT({col}) AS `c{i}_count`")
+            if info["tipo"] in OPAQUE_TYPES:
+                continue
+            expressions.append(f"COUNT(DISTINCT {col}) AS `c{i}_distintos`")
+            expressions.append(f"MIN({col}) AS `c{i}_min`")
+            expressions.append(f"MAX({col}) AS `c{i}_max`")
+            if info["tipo"] in NUMERIC_TYPES:
+                expressions.append(f"AVG({col}) AS `c{i}_mean`")
+                expressions.append(f"STDDEV_SAMP({col}) AS `c{i}_std`")
+        return f"SELECT {', '.join(expressions)} FROM {source}"
+
+    def _profile_columns(self, sample_sql):
+        """Calcula o perfil das colunas no banco (tabela inteira ou, se grande, a amostra)."""
+        if self.approximate:
+            source = f"({sample_sql}) AS amostra"
+        else:
+            source = quote_identifier(self.table)
+
+        keys, rows = self._fetch(self._profile_sql(source))
+        values = dict(zip(keys, rows[0]))
+        profiled_rows = values["linhas"]
+
+        profiles = {}
+        for i, name in enumerate(self.columns):
+            count = values[f"c{i}_count"]
+            profile = {"count": count, "nulos": profiled_rows - count}
+            for stat in ("distintos", "min", "max", "mean", "std"):
+                key = f"c{i}_{stat}"
+                if key in values:
+                    # Em tabelas grandes, distintos não somam entre amostra e tabela
+                    name_stat = "distintos_na_amostra" if stat == "distintos" and self.approximate else stat
+                    profile[name_stat] = _plain(values[key])
+            profiles[name] = profile
+        return profiles
+
+    def load_table(self):
+        """
+        Calcula o perfil da tabela no banco e sorteia as linhas de exemplo.
+
+        Só a amostra (SQL_ANALYZER_SAMPLE_ROWS linhas) chega ao cliente; os
+        perfis são calculados pelo banco.
+        """
+        with span("carregar_tabela", tabela=self.table):
+            self._load_metadata()
+            sample_sql = self._sample_sql()
+            self.df = process_sql(*self.connection_params, sample_sql)
+            tag_fingerprint(self.df, self.table_fingerprint(
+                self.connection_params[0], self.connection_params[3], self.table
+            ))
+
+            with span("perfil", tabela=self.table):
+                profiles = self._profile_columns(sample_sql)
+
+            info = {
+                "colunas": list(self.columns),
+                "dimensoes": (self.row_estimate, len(self.columns)),
+                "tipos_dados": {name: col["tipo"] for name, col in self.columns.items()},
+                "amostra": [
+                    {col: _plain(value) for col, value in record.items()}
+                    for record in self.df.head(5).to_dict(orient="records")
+                ],
+                "descricao": profiles,
+            }
+
+            # Exemplos estratificados e linhas atípicas vêm da amostra, dentro do orçamento de tokens
+            self.df_info = build_llm_context(self.df, info)
+            self.df_info["tabela"] = self.table
+            self.df_info["nota"] = (
+                f"Tabela MySQL `{self.table}` com {'cerca de ' if self.approximate else ''}{self.row_estimate} linhas. "
+                + ("Perfis calculados sobre uma amostra no banco. " if self.approximate else "Perfis calculados no banco. ")
+                + "Os exemplos são uma amostra aleatória; responda com consultas SQL executadas na tabela."
+            )
+            with span("serializacao") as current:
+                self.df_info_json = serialize_context(self.df_info)
+                current.set(caracteres=len(self.df_info_json))
+
+    def _sql_chain(self):
+        """Monta a cadeia que responde perguntas com uma consulta SQL."""
+        prompt = self._prompt("sql", self.system_prompt, max_linhas=self.config["max_result_rows"])
+        return prompt | self.llm | StrOutputParser()
+
+    def _sql_inputs(self, query: str):
+        return {
+            **self._prompt_inputs(query),
+            "tabela": self.table,
+        }
+
+    def run_sql(self, sql: str) -> pd.DataFrame:
+        """
+        Executa uma consulta somente de leitura na tabela, com limite de linhas e de tempo.
+
+        A consulta roda em uma transação READ ONLY, com max_execution_time
+        na sessão; as linhas são lidas com fetchmany até o limite.
+
+        Args:
+            sql: Consulta SELECT
+
+        Returns:
+            DataFrame com o resultado
+        """
+        sql = validate_read_only_sql(sql)
+        max_rows = self.config["max_result_rows"]
+        with span("consulta_sql", banco=self.connection_params[3]) as current:
+            with self._engine().connect() as conn:
+                # A transação READ ONLY faz o servidor recusar qualquer escrita que passe da validação
+                conn.exec_driver_sql("START TRANSACTION READ ONLY")
+                conn.exec_driver_sql(f"SET SESSION max_execution_time = {int(self.config['timeout_ms'])}")
+                try:
+                    result = conn.execution_options(
+                        stream_results=True, max_row_buffer=max_rows, no_parameters=True
+                    ).exec_driver_sql(with_row_limit(sql, max_rows))
+                    columns = list(result.keys())
+                    # Um LIMIT maior escrito pelo LLM é cortado aqui
+                    rows = result.fetchmany(max_rows)
+                    result.close()
+                finally:
+                    conn.rollback()
+                    conn.exec_driver_sql("SET SESSION max_execution_time = DEFAULT")
+            current.set(linhas=len(rows))
+        # Mesma conversão do process_sql (strings vazias viram nulos, DECIMAL vira float)
+        return pa.Table.from_batches([normalize_batch(rows, columns)]).to_pandas(types_mapper=pd.ArrowDtype)
+
+    def _process_result(self, result: str, query: str) -> Any:
+        """
+        Executa no banco a consulta SQL da resposta e, se houver, o código
+        Python sobre o resultado.
+
+        Args:
+            result: Resposta do LLM
+            query: Consulta original
+
+        Returns:
+            DataFrame com o resultado, CodeRunResult com as saídas dos blocos de código
+            ou a resposta em texto
+        """
+        match = _SQL_BLOCK.search(result)
+        if match is None:
+            # Resposta direta a partir do perfil da tabela
+            return result
+
+        try:
+            result_df = self.run_sql(match.group(1))
+        except Exception as e:
+            return f"Erro ao executar a consulta no banco: {str(e)}\n\nResposta original:\n{result}"
+
+        blocks = self._extract_code_blocks(result)
+        if not blocks:
+            return result_df
+
+        # Gráficos e transformações rodam sobre o resultado da consulta, não sobre a amostra
+        sample_df = self.df
+        self.df = result_df
+        try:
+            run = self._execute_code_blocks(blocks, result)
+        except Exception as e:
+            return f"Erro ao executar código: {str(e)}\n\nResposta original:\n{result}"
+        finally:
+            self.df = sample_df
+
+        return run if run.outputs or run.errors else result_df
+
+    def chat(self, query: str) -> Any:
+        """
+        Responde a uma pergunta executando no banco a consulta gerada pelo LLM.
+
+        Args:
+            query: Pergunta ou instrução do usuário
+
+        Returns:
+            DataFrame com o resultado, CodeRunResult ou texto
+        """
+        if self.df_info is None:
+            return "Nenhuma tabela carregada. Por favor, conecte-se a uma tabela primeiro."
+
+        chain = self._sql_chain()
+        result = self._cached_response("sql", query, lambda: chain.invoke(self._sql_inputs(query)))
+        return self._process_result(result, query)
+
+    def stream_chat(self, query: str) -> Iterator[Tuple[str, Any]]:
+        """
+        Versão em streaming de chat: entrega o texto à medida que é gerado e
+        executa a consulta quando a resposta termina.
+
+        Args:
+            query: Pergunta ou instrução do usuário
+
+        Yields:
+            Tuplas (tipo, valor): ("texto", pedaço da resposta) ou ("resultado", valor)
+        """
+        if self.df_info is None:
+            yield ("texto", "Nenhuma tabela carregada. Por favor, conecte-se a uma tabela primeiro.")
+            return
+
+        chain = self._sql_chain()
+        parts = []
+        for chunk in self._stream_cached_response("sql", query, lambda: chain.stream(self._sql_inputs(query))):
+            parts.append(chunk)
+            yield ("texto", chunk)
+
+        output = self._process_result("".join(parts), query)
+        if isinstance(output, pd.DataFrame) or output != "".join(parts):
+            yield ("resultado", output)
@@ -0,0 +1,80 @@
+"""
+Contagem dos tokens de cada chamada ao LLM (callback do LangChain).
+
+Fica fora de ai_providers.py para que importar a configuração dos
+provedores não carregue o LangChain: o callback só é importado quando o
+primeiro cliente é criado.
+"""
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from instrumentation import record_tokens
+
+
+class TokenUsageHandler(BaseCallbackHandler):
+    """
+    Registra os tokens de cada chamada ao LLM no trace da requisição atual.
+
+    Usa as contagens informadas pelo provedor (usage_metadata, token_usage
+    ou os contadores do Ollama), incluindo os tokens do prompt lidos do cache
+    de prompt; quando não vêm na resposta, estima com o tokenizador do
+    contexto e marca a contagem como estimada.
+    """
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self._prompts = {}  # run_id -> texto enviado (para a estimativa)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._prompts[run_id] = "\n".join(
+            str(message.content) for batch in messages for message in batch
+        )
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._prompts[run_id] = "\n".join(prompts)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._prompts.pop(run_id, None)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        prompt = self._prompts.pop(run_id, "")
+        usage = _reported_usage(response)
+        if usage is not None:
+            prompt_tokens, completion_tokens, cached_tokens = usage
+            record_tokens(self.model_name, prompt_tokens, completion_tokens, cached_tokens=cached_tokens)
+            return
+
+        # Importa aqui: o tokenizador só é necessário quando o provedor não informa as contagens
+        from context_builder import count_tokens
+        completion = "".join(
+            generation.text for generations in response.generations for generation in generations
+        )
+        record_tokens(self.model_name, count_tokens(prompt), count_tokens(completion), estimated=True)
+
+
+def _reported_usage(response):
+    """
+    Tokens (prompt, completion, prompt lido do cache) informados pelo
+    provedor em um LLMResult, ou None.
+    """
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if metadata:
+                details = metadata.get("input_token_details") or {}
+                return (
+                    metadata.get("input_tokens", 0), metadata.get("output_tokens", 0),
+                    details.get("cache_read") or 0,
+                )
+            info = generation.generation_info or {}
+            if "prompt_eval_count" in info or "eval_count" in info:
+                # Ollama: com o KV cache reaproveitado, prompt_eval_count conta só os tokens
+                # avaliados de novo, e o Ollama não informa quantos vieram do cache
+                return info.get("prompt_eval_count", 0), info.get("eval_count", 0), 0
+
+    usage = (response.llm_output or {}).get("token_usage")
+    if usage:
+        # OpenAI informa prompt_tokens_details.cached_tokens; DeepSeek, prompt_cache_hit_tokens
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or usage.get("prompt_cache_hit_tokens")
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0), cached or 0
+    return None
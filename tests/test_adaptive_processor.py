@@ -0,0 +1,43 @@
+"""Testes do caminho preguiçoso (Polars) do processador adaptativo."""
+
+import io
+
+import pytest
+
+from data_processors.adaptive_processor import process_adaptive
+
+CSV_LATIN1 = "nome,cidade,idade\nJoão,São Paulo,31\nMaria,Brasília,28\n".encode("latin1")
+
+
+@pytest.mark.parametrize("origem", ["arquivo", "upload"])
+def test_csv_em_latin1_mantem_os_acentos(tmp_path, origem):
+    caminho = tmp_path / "pessoas.csv"
+    caminho.write_bytes(CSV_LATIN1)
+    conteudo = io.BytesIO(CSV_LATIN1) if origem == "upload" else None
+
+    # Selecionar colunas força a leitura preguiçosa do Polars, qualquer que seja o tamanho
+    df = process_adaptive(str(caminho), conteudo, columns=["nome", "cidade"])
+
+    assert df["nome"].tolist() == ["João", "Maria"]
+    assert df["cidade"].tolist() == ["São Paulo", "Brasília"]
+
+
+CSV_TIPOS = (
+    "id,data,preco,ativo,nome\n"
+    "1,2024-01-05,\"1,5\",sim,Ana\n"
+    "2,2024-02-10,\"2,25\",não,Bruno\n"
+    "3,,\"10,0\",sim,\n"
+).encode("utf-8")
+
+
+def test_caminhos_pandas_e_preguicoso_tem_os_mesmos_tipos(tmp_path):
+    caminho = tmp_path / "vendas.csv"
+    caminho.write_bytes(CSV_TIPOS)
+
+    pequeno = process_adaptive(str(caminho))
+    preguicoso = process_adaptive(str(caminho), columns=["id", "data", "preco", "ativo", "nome"])
+
+    assert pequeno.dtypes.to_dict() == preguicoso.dtypes.to_dict()
+    assert str(preguicoso["data"].dtype).startswith("datetime64")
+    assert preguicoso["preco"].tolist() == [1.5, 2.25, 10.0]
+    assert preguicoso.attrs["tipos_inferidos"]["ativo"]["tipo"] == "booleano"
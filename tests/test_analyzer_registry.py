@@ -0,0 +1,30 @@
+"""Testes da impressão digital dos datasets."""
+
+import numpy as np
+import pandas as pd
+
+from analyzer_registry import dataset_fingerprint, tag_fingerprint
+
+
+def _frame():
+    return pd.DataFrame({"a": [1.0, np.nan, 3.0], "b": ["x", "y", "z"]})
+
+
+def test_frame_marcado_usa_a_impressao_do_arquivo():
+    df = tag_fingerprint(_frame(), "arquivo-1")
+    outro = tag_fingerprint(_frame(), "arquivo-1")
+    assert dataset_fingerprint(df) == dataset_fingerprint(outro)
+    assert dataset_fingerprint(df) != dataset_fingerprint(tag_fingerprint(_frame(), "arquivo-2"))
+
+
+def test_frame_derivado_nao_colide_com_o_original():
+    df = tag_fingerprint(_frame(), "arquivo-1")
+    derivado = df.fillna(0)
+    assert derivado.attrs["fingerprint"] == "arquivo-1"
+    assert dataset_fingerprint(derivado) != dataset_fingerprint(df)
+    assert dataset_fingerprint(derivado) == dataset_fingerprint(_frame().fillna(0))
+
+
+def test_frame_sem_marca_usa_o_conteudo():
+    assert dataset_fingerprint(_frame()) == dataset_fingerprint(_frame())
+    assert dataset_fingerprint(_frame()) != dataset_fingerprint(_frame().fillna(0))
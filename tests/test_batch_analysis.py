@@ -0,0 +1,79 @@
+"""Testes da análise em lote com um provedor e um cache falsos."""
+
+import asyncio
+import time
+
+from batch_analysis import run_batch
+
+
+class _Chain:
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = {}
+
+    async def ainvoke(self, inputs):
+        question = inputs["question"]
+        self.calls[question] = self.calls.get(question, 0) + 1
+        error = self.failures.get(question)
+        if error is not None and (not isinstance(error, tuple) or self.calls[question] <= error[1]):
+            raise error[0] if isinstance(error, tuple) else error
+        await asyncio.sleep(0.01)
+        return f"resposta: {question}"
+
+
+class _SlowCache:
+    """Cache que bloqueia como o SQLite com embeddings (chamada de rede)."""
+
+    delay = 0.2
+
+    def get(self, *key):
+        time.sleep(self.delay)
+        return None
+
+    def put(self, *key):
+        time.sleep(self.delay)
+
+
+class _Analyzer:
+    llm = None
+    system_prompt = None
+    fingerprint = "dataset"
+    df = None
+
+    def __init__(self, chain, cache=None):
+        self.chain = chain
+        self.response_cache = cache
+
+    def _chat_chain(self):
+        return self.chain
+
+    def _prompt_inputs(self, query):
+        return {"question": query}
+
+
+def test_cache_nao_bloqueia_o_event_loop():
+    questions = [f"pergunta {i}" for i in range(8)]
+    started = time.perf_counter()
+    results = run_batch(_Analyzer(_Chain({}), _SlowCache()), questions, concurrency=8)
+
+    assert [item["resposta"] for item in results] == [f"resposta: {q}" for q in questions]
+    # Em série seriam 16 chamadas de 0,2 s ao cache
+    assert time.perf_counter() - started < 16 * _SlowCache.delay / 2
+
+
+def test_tentativas_reportadas_sao_as_realizadas(monkeypatch):
+    monkeypatch.setenv("BATCH_BACKOFF_BASE", "0.01")
+    monkeypatch.setenv("BATCH_BACKOFF_MAX", "0.02")
+    chain = _Chain({
+        "invalida": ValueError("pergunta inválida"),
+        "instavel": (ConnectionError("conexão recusada"), 1),
+        "fora do ar": ConnectionError("conexão recusada"),
+    })
+    results = run_batch(
+        _Analyzer(chain), ["invalida", "instavel", "fora do ar"], concurrency=3, max_retries=2,
+    )
+    attempts = {item["pergunta"]: (item["tentativas"], item["erro"]) for item in results}
+
+    assert attempts["invalida"] == (1, "pergunta inválida")
+    assert attempts["instavel"] == (2, None)
+    assert attempts["fora do ar"] == (3, "conexão recusada")
@@ -0,0 +1,89 @@
+"""Testes do CodeExecutor: ida e volta dos tipos pelo Arrow, isolamento entre sessões e tempo limite."""
+
+import pandas as pd
+import pytest
+
+from code_executor import CodeExecutor, CodeSession
+
+
+@pytest.fixture(scope="module")
+def executor(tmp_path_factory):
+    executor = CodeExecutor(
+        workers=1, timeout=5, cpu_seconds=30, memory_mb=0, prewarm=False,
+        data_dir=str(tmp_path_factory.mktemp("datasets")),
+    )
+    yield executor
+    executor.shutdown()
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        "sexo": pd.Categorical(["m", "f", "f", "m", "f"]),
+        "classe": pd.Categorical(["A", "B", "A", "C", "B"], categories=["A", "B", "C"], ordered=True),
+        "sobreviveu": pd.array([True, False, None, True, False], dtype="boolean"),
+        "tarifa": [7.25, 71.28, 7.92, 53.1, 8.05],
+    })
+
+
+def _output(result):
+    assert result.error is None, result.error
+    assert len(result.outputs) == 1
+    return result.outputs[0][1]
+
+
+def test_tipos_do_dataset_chegam_ao_processo(executor, df):
+    with CodeSession(df, "tipos", executor) as session:
+        tipos = _output(session.run("str(df.dtypes.to_dict())"))
+        categorias = _output(session.run('str(df["sexo"].cat.categories.tolist())'))
+    assert "CategoricalDtype" in tipos and "BooleanDtype" in tipos
+    assert categorias == "['f', 'm']"
+
+
+def test_resultado_indexado_por_categoria_volta_ao_pai(executor, df):
+    with CodeSession(df, "categorias", executor) as session:
+        contagem = _output(session.run('df["sexo"].value_counts()'))
+        media = _output(session.run('df.groupby("classe", observed=False)["tarifa"].mean()'))
+        result_df = _output(session.run("result_df = df"))
+    assert contagem.loc["f", "count"] == 3
+    assert isinstance(media.index, pd.CategoricalIndex)
+    assert list(media.index) == ["A", "B", "C"]
+    pd.testing.assert_frame_equal(result_df, df)
+
+
+def test_alteracoes_nao_passam_para_outras_sessoes(executor, df):
+    with CodeSession(df, "isolamento", executor) as session:
+        for code in ['df["novo"] = df["tarifa"] * 2', 'df.loc[0, "tarifa"] = -1', 'df.drop(columns="sexo", inplace=True)']:
+            assert session.run(code).error is None
+    with CodeSession(df, "isolamento", executor) as session:
+        visto = _output(session.run("result_df = df"))
+    pd.testing.assert_frame_equal(visto, df)
+
+
+def test_sessao_local_nao_altera_o_dataframe(df):
+    original = df.copy()
+    with CodeSession(df, "local") as session:
+        assert session.run('df["novo"] = 1').error is None
+    pd.testing.assert_frame_equal(df, original)
+
+
+def test_colecoes_na_ultima_linha_sao_exibidas(executor, df):
+    with CodeSession(df, "colecoes", executor) as session:
+        colunas = session.run("list(df.columns)")
+        maximos = session.run('{"tarifa": df["tarifa"].max(), "n": len(df)}')
+        indice = session.run("df.columns")
+        objetos = session.run("[object]")
+    assert colunas.outputs == [("valor", ["sexo", "classe", "sobreviveu", "tarifa"])]
+    assert maximos.outputs == [("valor", {"tarifa": 71.28, "n": 5})]
+    assert _output(indice) == ["sexo", "classe", "sobreviveu", "tarifa"]
+    assert objetos.outputs == [("texto", "[<class 'object'>]")]
+
+
+def test_tempo_limite_substitui_o_processo(executor, df):
+    restarts = executor.restarts
+    with CodeSession(df, "tempo", executor) as session:
+        results = [session.run("while True: pass"), session.run("len(df)")]
+    assert "tempo" in results[0].error.lower() or "limite" in results[0].error.lower()
+    assert executor.restarts == restarts + 1
+    # O bloco seguinte roda em um processo novo, com o namespace recriado
+    assert _output(results[1]) == len(df)
@@ -0,0 +1,49 @@
+"""Testes do ColumnarBuilder: colunas esparsas, blocos e esquemas largos."""
+
+import tracemalloc
+from io import BytesIO
+
+from data_processors.columnar import ColumnarBuilder
+from data_processors.xml_processor import process_xml
+
+
+def _build(rows, chunk_rows):
+    builder = ColumnarBuilder(chunk_rows=chunk_rows)
+    for row in rows:
+        for name, value in row:
+            builder.set(name, value)
+        builder.end_row()
+    return builder.to_pandas()
+
+
+def test_colunas_que_aparecem_depois_e_faltam_em_linhas():
+    rows = [
+        [("a", "1")],
+        [("a", "2"), ("b", "x")],
+        [("b", "y")],
+        [("a", "4"), ("c", "z")],
+        [("a", "5"), ("a", "6")],
+    ]
+    df = _build(rows, chunk_rows=2)
+
+    assert list(df.columns) == ["a", "b", "c"]
+    valores = df.fillna("-")
+    assert valores["a"].tolist() == ["1", "2", "-", "4", "6"]
+    assert valores["b"].tolist() == ["-", "x", "y", "-", "-"]
+    assert valores["c"].tolist() == ["-", "-", "-", "z", "-"]
+    assert str(df["a"].dtype) == "string[pyarrow]"
+
+
+def test_esquema_largo_nao_aloca_o_bloco_por_coluna():
+    tags = "".join(f"<campo{j}>{j}</campo{j}>" for j in range(800))
+    conteudo = "<raiz>" + "".join(f"<registro>{tags}</registro>" for _ in range(5)) + "</raiz>"
+
+    tracemalloc.start()
+    df = process_xml(BytesIO(conteudo.encode("utf-8")))
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert df.shape == (5, 800)
+    assert df["campo799"].tolist() == ["799"] * 5
+    # Buffers pré-alocados com o bloco inteiro passariam de 400 MB
+    assert pico < 50e6
@@ -0,0 +1,41 @@
+"""Testes do contexto enviado ao LLM, limitado pelo orçamento de tokens."""
+
+import numpy as np
+import pandas as pd
+
+from column_profiler import profile_dataframe
+from context_builder import MIN_SAMPLE_ROWS, build_llm_context
+
+
+def _base_info(df):
+    return {
+        "colunas": list(df.columns),
+        "dimensoes": df.shape,
+        "tipos_dados": {col: str(dtype) for col, dtype in df.dtypes.items()},
+        "amostra": df.head(5).to_dict(orient="records"),
+        "descricao": profile_dataframe(df)[0],
+    }
+
+
+def _wide(columns):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(rng.random((200, columns)).round(2), columns=[f"c{i}" for i in range(columns)])
+
+
+def test_perfis_nao_tomam_o_orcamento_da_amostra():
+    df = _wide(150)
+    info = build_llm_context(df, _base_info(df), token_budget=6000, encoding_name="cl100k_base")
+
+    assert len(info["amostra"]) >= MIN_SAMPLE_ROWS
+    # Perfis completos não cabem: todas as colunas recebem o perfil resumido
+    assert len(info["descricao"]) == 150
+    assert "std" not in info["descricao"]["c0"] and "mean" in info["descricao"]["c0"]
+    assert info["orcamento_tokens"]["usado"] <= 6000
+
+
+def test_estrutura_maior_que_o_orcamento_mantem_uma_linha():
+    df = _wide(600)
+    info = build_llm_context(df, _base_info(df), token_budget=2000, encoding_name="cl100k_base")
+
+    assert len(info["amostra"]) == 1
+    assert len(info["descricao_omitida"]) == 600
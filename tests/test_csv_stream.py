@@ -0,0 +1,42 @@
+"""Testes do resumo em streaming."""
+
+import io
+
+import pandas as pd
+
+from data_processors.csv_stream import StreamingSummary, iter_csv_chunks, summarize_csv
+
+
+def _fingerprint(*chunks):
+    summary = StreamingSummary(sample_size=100)
+    for chunk in chunks:
+        summary.update(chunk)
+    return summary.fingerprint()
+
+
+def test_impressao_digital_acompanha_o_conteudo():
+    dados = pd.DataFrame({"valor": [1.5, 2.0, 3.25], "loja": ["a", "b", "a"]})
+
+    assert _fingerprint(dados) == _fingerprint(dados.copy())
+    assert _fingerprint(dados) != _fingerprint(dados.assign(valor=[1.5, 2.0, 9.0]))
+    assert _fingerprint(dados) != _fingerprint(dados, dados.head(1))
+
+
+def _csv_com_coluna_vazia_no_inicio():
+    linhas = ["a,b"] + [f"{i}," for i in range(100)] + [f"{i},texto {i}" for i in range(100, 200)]
+    return io.BytesIO("\n".join(linhas).encode("utf-8"))
+
+
+def test_coluna_vazia_no_primeiro_bloco_nao_fixa_o_tipo():
+    df = pd.concat(list(iter_csv_chunks(_csv_com_coluna_vazia_no_inicio(), chunksize=50)), ignore_index=True)
+
+    assert df["b"].notna().sum() == 100
+    assert df.loc[150, "b"] == "texto 150"
+    assert pd.api.types.is_numeric_dtype(df["a"])
+
+
+def test_resumo_conta_valores_da_coluna_vazia_no_inicio():
+    summary = summarize_csv(_csv_com_coluna_vazia_no_inicio(), chunksize=50, sample_size=10)
+
+    assert summary.describe()["b"]["count"] == 100
+    assert summary.dtypes["b"] == "object"
@@ -0,0 +1,33 @@
+"""Testes do catálogo persistente de datasets."""
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from data_processors.dataset_store import DatasetStore, sql_key
+
+
+@pytest.mark.parametrize("file_format", ["feather", "parquet"])
+def test_catalogo_devolve_os_tipos_da_primeira_leitura(tmp_path, file_format):
+    store = DatasetStore(directory=str(tmp_path), file_format=file_format, sql_ttl_seconds=60, max_bytes=0)
+    df = pd.DataFrame({
+        "sexo": pd.Categorical(["m", "f", None]),
+        "sobreviveu": pd.array([True, None, False], dtype="boolean"),
+        "idade": pd.array([22, 38, 26], dtype="int64[pyarrow]"),
+        # Textos lidos pelo Polars chegam como large_string[pyarrow]
+        "nome": pd.array(["a", None, "c"], dtype=pd.ArrowDtype(pa.large_string())),
+        "tarifa": [7.25, 71.28, 7.92],
+    })
+    assert store.put("chave", df, source_type="csv", name="titanic.csv")
+
+    lido = store.get("chave")
+
+    assert lido.attrs["fingerprint"] == "chave"
+    pd.testing.assert_frame_equal(lido, df)
+
+
+def test_chave_sql_separa_usuarios():
+    consulta = "SELECT * FROM clientes"
+    assert sql_key("db", "leitor", "loja", consulta) != sql_key("db", "admin", "loja", consulta)
+    # Espaços não mudam a consulta
+    assert sql_key("db", "leitor", "loja", consulta) == sql_key("db", "leitor", "loja", " SELECT *  FROM clientes ")
@@ -0,0 +1,34 @@
+"""Testes da leitura de planilhas Excel."""
+
+import io
+
+import openpyxl
+import pytest
+
+from data_processors.excel_processor import calamine_available, process_excel, read_excel_polars
+
+ENGINES = ["openpyxl", pytest.param("calamine", marks=pytest.mark.skipif(
+    not calamine_available(), reason="python-calamine não instalado"))]
+
+
+def _planilha(linhas):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    for linha in linhas:
+        sheet.append(linha)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_colunas_vazias_sao_descartadas_mesmo_com_cabecalho(engine):
+    linhas = [["a", "vazia", "c"], [1, None, "x"], [None, None, None], [2, "", "y"]]
+
+    df = process_excel(_planilha(linhas), engine=engine)
+    polars_df = read_excel_polars(_planilha(linhas), engine=engine)
+
+    assert list(df.columns) == ["a", "c"]
+    assert df["a"].tolist() == [1, 2]
+    assert polars_df.columns == ["a", "c"]
@@ -0,0 +1,43 @@
+"""Testes do cache persistente de respostas."""
+
+import sqlite3
+
+import pytest
+
+import response_cache
+from response_cache import ResponseCache
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    """Guarda as conexões abertas pelo cache (a referência impede que o coletor as feche)."""
+    connections = []
+    connect = sqlite3.connect
+
+    def tracking_connect(*args, **kwargs):
+        connections.append(connect(*args, **kwargs))
+        return connections[-1]
+
+    monkeypatch.setattr(response_cache.sqlite3, "connect", tracking_connect)
+    return connections
+
+
+def _is_closed(conn):
+    try:
+        conn.execute("SELECT 1")
+    except sqlite3.ProgrammingError:
+        return True
+    return False
+
+
+def test_respostas_sao_reaproveitadas_e_conexoes_fechadas(tmp_path, opened):
+    cache = ResponseCache(path=str(tmp_path / "respostas.sqlite"), ttl_seconds=60, max_entries=10, embeddings=None)
+    key = ("dataset", "texto", None, "modelo")
+
+    cache.put(*key, "Qual a média?", "42")
+    assert cache.get(*key, "qual a  média") == "42"
+    assert cache.get(*key, "Outra pergunta") is None
+    cache.stats()
+    cache.clear()
+
+    assert opened and all(_is_closed(conn) for conn in opened)
@@ -0,0 +1,42 @@
+"""Testes da validação das consultas geradas pelo LLM para a análise de tabelas no banco."""
+
+import pytest
+
+from sql_analyzer import validate_read_only_sql, with_row_limit
+
+
+@pytest.mark.parametrize("sql", [
+    'SELECT REPLACE(nome, "a", "b") FROM clientes',
+    "SELECT `set`, `do` FROM configuracoes",
+    "SELECT a.id, b.id FROM pedidos a JOIN clientes b ON a.cliente = b.id",
+    "WITH totais AS (SELECT loja, SUM(valor) AS total FROM vendas GROUP BY loja) SELECT * FROM totais",
+    "(SELECT 1) UNION (SELECT 2)",
+    "SELECT 'DROP TABLE x; --' AS texto FROM t;",
+    "SELECT sleep FROM turnos -- coluna, não a função",
+])
+def test_leituras_sao_aceitas(sql):
+    validate_read_only_sql(sql)
+
+
+@pytest.mark.parametrize("sql, motivo", [
+    ("DELETE FROM clientes", "SELECT"),
+    ("SELECT 1; DROP TABLE clientes", "uma consulta"),
+    ("WITH x AS (SELECT 1) DELETE FROM clientes", "SELECT"),
+    ("SELECT * FROM clientes FOR UPDATE", "UPDATE"),
+    ("SELECT * FROM clientes FOR SHARE", "FOR SHARE"),
+    ("SELECT * FROM clientes LOCK IN SHARE MODE", "LOCK IN"),
+    ("SELECT nome INTO OUTFILE '/tmp/x' FROM clientes", "INTO"),
+    ("SELECT SLEEP(10)", "SLEEP"),
+    ("SELECT /*! 1; DROP TABLE clientes */", "executáveis"),
+    ("SHOW TABLES", "SELECT"),
+])
+def test_escritas_e_travas_sao_recusadas(sql, motivo):
+    with pytest.raises(ValueError, match=motivo):
+        validate_read_only_sql(sql)
+
+
+def test_limite_so_e_acrescentado_sem_limit_externo():
+    assert with_row_limit("SELECT * FROM t", 100).endswith("LIMIT 100")
+    assert with_row_limit("SELECT * FROM t LIMIT 5", 100) == "SELECT * FROM t LIMIT 5"
+    # LIMIT de uma subconsulta não limita o resultado
+    assert with_row_limit("SELECT * FROM (SELECT * FROM t LIMIT 5) s JOIN u", 100).endswith("LIMIT 100")
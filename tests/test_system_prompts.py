@@ -0,0 +1,30 @@
+"""Testes das camadas do prompt: o system prompt entra como texto puro."""
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from prompts.system_prompts import get_prompt_layers, get_system_prompt
+
+
+def _messages(system_prompt, task, **values):
+    prompt = ChatPromptTemplate.from_messages(get_prompt_layers(system_prompt, task, **values))
+    return prompt.format_messages(context="{}", question="Qual a média?", tabela="vendas")
+
+
+def test_prompt_json_sem_chaves_escapadas():
+    prompt = get_system_prompt("json")
+    assert "{{" not in prompt and "}}" not in prompt
+    system, _ = _messages(prompt, "json")
+    assert '"dados_analisados": {' in system.content
+
+
+def test_prompt_personalizado_com_chaves_literais():
+    custom = 'Responda no formato {"total": n} e use $\\frac{a}{b}$.'
+    system, human = _messages(custom, "texto")
+    assert system.content.startswith(custom)
+    assert human.content.endswith("Pergunta do usuário: Qual a média?")
+
+
+def test_instrucoes_sql_recebem_o_limite_de_linhas():
+    system, human = _messages(get_system_prompt("texto"), "sql", max_linhas=500)
+    assert "limitado a 500 linhas" in system.content
+    assert "`vendas`" in human.content